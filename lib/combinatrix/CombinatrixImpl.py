@@ -3,8 +3,8 @@
 import logging
 import os
 
-from combinatrix.core import AppCore
-
+# combinatrix.core is imported by run_combinatrix, so that starting the server and
+# answering status calls do not load the dependencies needed to run the combinatrix
 # END_HEADER
 
 
@@ -66,6 +66,8 @@ class combinatrix:
             err_msg = "Combinatrix encountered the following errors:\nthe environment variable SDK_CALLBACK_URL must be set"
             raise RuntimeError(err_msg)
 
+        from combinatrix.core import AppCore
+
         combinatrix = AppCore(self.config, ctx, os.environ["SDK_CALLBACK_URL"])
         output = combinatrix.run(params)
         # END run_combinatrix
@@ -58,6 +58,7 @@ def get_config():
 config = get_config()
 
 from combinatrix.CombinatrixImpl import combinatrix  # noqa @IgnorePep8
+from combinatrix.http_session import get_session  # noqa @IgnorePep8
 
 impl_combinatrix = combinatrix(config)
 
@@ -372,7 +373,7 @@ class Application(object):
             impl_combinatrix.status, name="combinatrix.status", types=[dict]
         )
         authurl = config.get(AUTH) if config else None
-        self.auth_client = _KBaseAuth(authurl)
+        self.auth_client = _KBaseAuth(authurl, session=get_session(config or {}))
 
     def __call__(self, environ, start_response):
         # Context object, equivalent to the perl impl CallContext
@@ -0,0 +1,196 @@
+"""Size-limited on-disk cache for immutable KBase data."""
+
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+from typing import Any
+
+from combinatrix.util import resolve_path
+
+CACHE_FILE_SUFFIX = ".json"
+LOCK_FILE_NAME = ".lock"
+VERSIONED_UPA_REGEX = re.compile(r"^\d+/\d+/\d+$")
+
+
+def is_versioned_upa(ref: str) -> bool:
+    """Check whether a reference is a fully-specified (and therefore immutable) UPA.
+
+    :param ref: KBase object reference
+    :type ref: str
+    :return: True if the reference is in the form wsid/objid/version
+    :rtype: bool
+    """
+    return VERSIONED_UPA_REGEX.match(ref) is not None
+
+
+def get_cache_dir(config: dict[str, Any]) -> str | None:
+    """Retrieve the cache directory from the config.
+
+    Relative paths are resolved against the scratch directory.
+
+    :param config: combinatrix config
+    :type config: dict[str, Any]
+    :return: absolute path of the cache directory, or None if caching is not enabled
+    :rtype: str | None
+    """
+    cache_dir = config.get("cache-dir")
+    if not cache_dir or not str(cache_dir).strip():
+        return None
+    cache_dir = str(cache_dir).strip()
+    if os.path.isabs(cache_dir):
+        return cache_dir
+    return os.path.join(resolve_path(config["scratch"]), cache_dir)
+
+
+class DiskCache:
+    """Store JSON-serialisable values in a directory, evicting the least recently used entries.
+
+    Entries are written to a temporary file and then renamed into place, so readers never see
+    a partially-written entry; eviction runs under an exclusive lock on the cache directory.
+    This makes it safe for several processes to share the same cache directory.
+    """
+
+    def __init__(self: "DiskCache", cache_dir: str, max_size: int) -> None:
+        """Initialise an instance of the class.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param cache_dir: directory in which to store the cache entries; created if necessary
+        :type cache_dir: str
+        :param max_size: maximum total size of the cache entries, in bytes
+        :type max_size: int
+        """
+        self.cache_dir = os.path.abspath(cache_dir)
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self: "DiskCache", key: str) -> str:
+        """Generate the path to the file for a cache key.
+
+        The file is named by a hash of the whole key, so that different keys never share a file.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param key: cache key
+        :type key: str
+        :return: full path to the cache file
+        :rtype: str
+        """
+        file_name = hashlib.sha256(key.encode()).hexdigest() + CACHE_FILE_SUFFIX
+        return os.path.join(self.cache_dir, file_name)
+
+    def get(self: "DiskCache", key: str) -> Any | None:  # noqa: ANN401
+        """Retrieve a value from the cache.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param key: cache key
+        :type key: str
+        :return: the cached value, or None if the key is not in the cache
+        :rtype: Any | None
+        """
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as fh:
+                value = json.load(fh)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # unreadable entry; discard it
+            self.delete(key)
+            return None
+
+        # mark the entry as recently used
+        with contextlib.suppress(FileNotFoundError):
+            os.utime(path)
+        return value
+
+    def put(self: "DiskCache", key: str, value: Any) -> None:  # noqa: ANN401
+        """Add a value to the cache, evicting old entries if the cache is over its size limit.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param key: cache key
+        :type key: str
+        :param value: JSON-serialisable value
+        :type value: Any
+        """
+        self._write(key, value)
+        self.evict()
+
+    def put_many(self: "DiskCache", items: dict[str, Any]) -> None:
+        """Add several values to the cache, evicting old entries once all have been added.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param items: JSON-serialisable values, indexed by cache key
+        :type items: dict[str, Any]
+        """
+        for key, value in items.items():
+            self._write(key, value)
+        self.evict()
+
+    def _write(self: "DiskCache", key: str, value: Any) -> None:  # noqa: ANN401
+        """Atomically write a value to the file for a cache key.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param key: cache key
+        :type key: str
+        :param value: JSON-serialisable value
+        :type value: Any
+        """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                json.dump(value, fh, separators=(",", ":"))
+            os.replace(temp_path, self._path(key))
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def delete(self: "DiskCache", key: str) -> None:
+        """Remove an entry from the cache, if it exists.
+
+        :param self: class instance
+        :type self: DiskCache
+        :param key: cache key
+        :type key: str
+        """
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._path(key))
+
+    def evict(self: "DiskCache") -> None:
+        """Remove the least recently used entries until the cache is within its size limit.
+
+        :param self: class instance
+        :type self: DiskCache
+        """
+        with open(os.path.join(self.cache_dir, LOCK_FILE_NAME), "a") as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                entries = []
+                for dir_entry in os.scandir(self.cache_dir):
+                    if not dir_entry.name.endswith(CACHE_FILE_SUFFIX):
+                        continue
+                    try:
+                        stat = dir_entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+
+                total_size = sum(entry[1] for entry in entries)
+                # oldest first
+                for _, size, path in sorted(entries):
+                    if total_size <= self.max_size:
+                        break
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(path)
+                    total_size -= size
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
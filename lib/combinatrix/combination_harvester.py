@@ -1,9 +1,41 @@
 """Fetches, combines, masticates, and spits out the appropriate data structure."""
 
-from typing import Any
+import csv
+import os
+import tempfile
+from collections import deque
+from collections.abc import Iterable, Iterator
+from itertools import islice, product
+from math import prod
+from typing import TYPE_CHECKING, Any
 
-from combinatrix.constants import DL, FIELD, JOIN_LIST, REF, REQD_FIELDS, T1, T2
-from pandas import DataFrame
+import numpy as np
+from combinatrix.constants import (
+    DATASET,
+    FIELD,
+    JOIN_LIST,
+    PARTITIONED_JOIN_MIN_ROWS,
+    REF,
+    REQD_FIELDS,
+    T1,
+    T2,
+)
+from combinatrix.join_planner import plan_join_order
+from combinatrix.partitioned_join import PartitionedJoiner, match_keys
+from combinatrix.sqlite_backend import SqliteJoinStore
+from pandas import Index, Series
+
+if TYPE_CHECKING:
+    from pandas import DataFrame
+
+# name of each file of combinations written by `write_combinations`, numbered from 0
+COMBINATION_FILE_NAME = "combinations_{:05d}.csv"
+# number of combinations to convert to IDs at a time in `generate_combinations`
+COMBINATION_BATCH_SIZE = 10000
+# stands in for missing values when looking up join values
+MISSING_KEY = object()
+# combination counts above this are held as Python ints rather than in int64 arrays
+MAX_INT64 = np.iinfo(np.int64).max
 
 
 def suffix(original_str: str, ref: str) -> str:
@@ -32,32 +64,669 @@ def generate_combination_string(join: dict[str, Any]) -> str:
     )
 
 
-def combine_data(
+def get_join_tree(join_list: list[dict[str, Any]]) -> list[dict[str, Any]] | None:
+    """Arrange the joins as a tree, rooted at the first dataset in the join list.
+
+    :param join_list: list of joins, each with keys T1 and T2, each of which has fields REF and FIELD
+    :type join_list: list[dict[str, Any]]
+    :return: the joins in breadth-first order from the root, oriented so that T1 is the parent
+        and T2 the child; None if the joins do not form a tree
+    :rtype: list[dict[str, Any]] | None
+    """
+    neighbours: dict[str, list[dict[str, Any]]] = {}
+    for join in join_list:
+        neighbours.setdefault(join[T1][REF], []).append(join)
+        neighbours.setdefault(join[T2][REF], []).append({T1: join[T2], T2: join[T1]})
+
+    # a connected graph with one fewer edges than nodes is a tree
+    if len(join_list) != len(neighbours) - 1:
+        return None
+
+    root = join_list[0][T1][REF]
+    visited = {root}
+    join_tree = []
+    queue = deque([root])
+    while queue:
+        for join in neighbours[queue.popleft()]:
+            child = join[T2][REF]
+            if child not in visited:
+                visited.add(child)
+                join_tree.append(join)
+                queue.append(child)
+
+    if len(visited) != len(neighbours):
+        return None
+    return join_tree
+
+
+def get_key_index(dataframe: "DataFrame", column: str) -> Index:
+    """Build a hash index of the distinct values in a join column.
+
+    :param dataframe: dataset
+    :type dataframe: DataFrame
+    :param column: name of the join column
+    :type column: str
+    :return: distinct values in the column, including any missing values
+    :rtype: Index
+    """
+    return Index(dataframe[column].unique(), name=column)
+
+
+def find_shared_keys(left_keys: Index, right_keys: Index) -> "Series":
+    """Find the values that two join columns have in common.
+
+    The distinct values of the two columns are merged, so the same type checks apply as when
+    merging the datasets themselves; as in a merge, missing values (None or NaN) match each
+    other.
+
+    :param left_keys: distinct values in the first column, from `get_key_index`
+    :type left_keys: Index
+    :param right_keys: distinct values in the second column, from `get_key_index`
+    :type right_keys: Index
+    :raises ValueError: if the columns cannot be merged, e.g. because of incompatible types
+    :return: values in both columns
+    :rtype: Series
+    """
+    shared = left_keys.to_frame(index=False).merge(
+        right_keys.to_frame(index=False),
+        left_on=left_keys.name,
+        right_on=right_keys.name,
+        how="inner",
+    )
+    return shared[left_keys.name]
+
+
+def find_join_keys(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> tuple[list["Series"], list[str]]:
+    """Find the values shared by the columns in each join.
+
+    Each join column is indexed once, however many joins it is used in.
+
+    :param join_list: list of joins, each with keys T1 and T2, each of which has fields REF and FIELD
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: the shared values for each join, in join list order, and a list of errors for joins
+        with no values in common
+    :rtype: tuple[list[Series], list[str]]
+    """
+    key_indexes: dict[str, Index] = {}
+    shared_keys = []
+    errors = []
+    for join in join_list:
+        columns = []
+        for tx in [T1, T2]:
+            column = suffix(join[tx][FIELD], join[tx][REF])
+            if column not in key_indexes:
+                key_indexes[column] = get_key_index(dataframes[join[tx][REF]], column)
+            columns.append(column)
+
+        try:
+            shared_keys.append(find_shared_keys(*[key_indexes[column] for column in columns]))
+        except ValueError as e:
+            errors.append(generate_combination_string(join) + ": " + e.args[0])
+            continue
+
+        if not len(shared_keys[-1]):
+            errors.append(generate_combination_string(join))
+
+    return shared_keys, errors
+
+
+def find_type_error(join: dict[str, Any], dataframes: dict[str, "DataFrame"]) -> str | None:
+    """Check whether the columns in a join can be merged, as `find_join_keys` does.
+
+    Columns with the same type can always be merged; otherwise, their distinct values are
+    merged, so that the same error is reported as when joining the datasets in memory.
+
+    :param join: join, with keys T1 and T2, each of which has fields REF and FIELD
+    :type join: dict[str, Any]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: error for the join if the columns cannot be merged, or None if they can
+    :rtype: str | None
+    """
+    columns = [(join[tx][REF], suffix(join[tx][FIELD], join[tx][REF])) for tx in [T1, T2]]
+    if len({dataframes[ref][column].dtype for ref, column in columns}) == 1:
+        return None
+    try:
+        find_shared_keys(*[get_key_index(dataframes[ref], column) for ref, column in columns])
+    except ValueError as e:
+        return generate_combination_string(join) + ": " + e.args[0]
+    return None
+
+
+def semi_join(left: "DataFrame", left_on: str, keys: "Series") -> "DataFrame":
+    """Select the rows of a dataframe with a value in `keys`.
+
+    As in a pandas merge, missing values (None or NaN) match each other.
+
+    :param left: dataframe to select rows from
+    :type left: DataFrame
+    :param left_on: column in `left` to match on
+    :type left_on: str
+    :param keys: values to match against
+    :type keys: Series
+    :return: rows of `left` with a match in `keys`
+    :rtype: DataFrame
+    """
+    return left[match_keys(left[left_on], keys)]
+
+
+def semi_join_matched_ids(
+    join_tree: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> dict[str, set[Any]]:
+    """Find the IDs of the rows in each dataset that take part in the combined dataset.
+
+    :param join_tree: joins in breadth-first order, from `get_join_tree`
+    :type join_tree: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: IDs of the matched rows, indexed by KBase ref
+    :rtype: dict[str, set[Any]]
+    """
+    reduced = reduce_join_tree(join_tree, dataframes)
+    return {ref: set(reduced[ref][suffix("id", ref)].dropna()) for ref in dataframes}
+
+
+def reduce_join_tree(
+    join_tree: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> dict[str, "DataFrame"]:
+    """Remove the rows of each dataset that do not take part in the combined dataset.
+
+    Uses the Yannakakis algorithm: a pass of semi-joins from the leaves of the join tree to
+    the root removes the rows of each dataset that have no match in the datasets below it,
+    and a pass from the root back to the leaves removes those with no match above it. The
+    rows that remain are exactly those in the combined dataset, which is never built, so
+    memory use stays linear in the size of the datasets.
+
+    :param join_tree: joins in breadth-first order, from `get_join_tree`
+    :type join_tree: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: remaining rows of each dataset, with the original index, indexed by KBase ref
+    :rtype: dict[str, DataFrame]
+    """
+    reduced = dict(dataframes)
+    # leaves to root: remove parent rows without a match in the child
+    for join in reversed(join_tree):
+        parent, child = join[T1][REF], join[T2][REF]
+        reduced[parent] = semi_join(
+            reduced[parent],
+            suffix(join[T1][FIELD], parent),
+            reduced[child][suffix(join[T2][FIELD], child)],
+        )
+
+    # root to leaves: remove child rows without a match in the (reduced) parent
+    for join in join_tree:
+        parent, child = join[T1][REF], join[T2][REF]
+        reduced[child] = semi_join(
+            reduced[child],
+            suffix(join[T2][FIELD], child),
+            reduced[parent][suffix(join[T1][FIELD], parent)],
+        )
+
+    return reduced
+
+
+def merge_all(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> "DataFrame":
+    """Build the combined dataset by merging the datasets in the order given in the join list.
+
+    :param join_list: list of joins, ordered so that the T1 dataset of each join is the first
+        dataset in the join list or has already been merged
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: combined dataset
+    :rtype: DataFrame
+    """
+    # initialise the megamerged dataframe with the first dataset on the join list
+    df_merged = dataframes[join_list[0][T1][REF]]
+    for join in join_list:
+        # merge dataframes into the megamerged version
+        df_merged = df_merged.merge(
+            dataframes[join[T2][REF]],
+            left_on=suffix(join[T1][FIELD], join[T1][REF]),
+            right_on=suffix(join[T2][FIELD], join[T2][REF]),
+            how="inner",
+            validate="m:m",
+        )
+    return df_merged
+
+
+def merge_matched_ids(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> dict[str, set[Any]]:
+    """Find the IDs of the rows in each dataset that take part in the combined dataset.
+
+    The combined dataset is built by merging the datasets in the order given in the join list.
+
+    :param join_list: list of joins, ordered so that the T1 dataset of each join is the first
+        dataset in the join list or has already been merged
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: IDs of the matched rows, indexed by KBase ref
+    :rtype: dict[str, set[Any]]
+    """
+    df_merged = merge_all(join_list, dataframes)
+
+    # extract the matched IDs from each dataframe
+    return {ref: set(df_merged[suffix("id", ref)].dropna()) for ref in dataframes}
+
+
+def to_exact_weights(*weights: np.ndarray) -> tuple[np.ndarray, ...]:
+    """Convert arrays of weights to arrays of Python ints, which cannot overflow.
+
+    :param weights: arrays of non-negative weights
+    :type weights: np.ndarray
+    :return: the arrays, with object dtype
+    :rtype: tuple[np.ndarray, ...]
+    """
+    return tuple(w if w.dtype == object else w.astype(object) for w in weights)
+
+
+def multiply_weights(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """Multiply two arrays of weights, using Python ints if the products could overflow int64.
+
+    :param left: non-negative weights
+    :type left: np.ndarray
+    :param right: non-negative weights
+    :type right: np.ndarray
+    :return: product of the weights
+    :rtype: np.ndarray
+    """
+    if (
+        left.dtype == object
+        or right.dtype == object
+        or int(left.max(initial=0)) * int(right.max(initial=0)) > MAX_INT64
+    ):
+        left, right = to_exact_weights(left, right)
+    return left * right
+
+
+def sum_weights(weights: np.ndarray) -> int:
+    """Add up an array of weights, using Python ints if the sum could overflow int64.
+
+    :param weights: non-negative weights
+    :type weights: np.ndarray
+    :return: sum of the weights
+    :rtype: int
+    """
+    if weights.dtype != object and int(weights.max(initial=0)) * len(weights) > MAX_INT64:
+        (weights,) = to_exact_weights(weights)
+    return int(weights.sum())
+
+
+def sum_weights_by_key(keys: "Series", weights: np.ndarray) -> tuple["Series", int]:
+    """Add up the weights of the rows with each key value.
+
+    :param keys: join column
+    :type keys: Series
+    :param weights: non-negative weight of each row
+    :type weights: np.ndarray
+    :return: total weight for each (non-missing) key value, and the total weight of the rows
+        with a missing value
+    :rtype: tuple[Series, int]
+    """
+    if weights.dtype != object and int(weights.max(initial=0)) * len(weights) > MAX_INT64:
+        (weights,) = to_exact_weights(weights)
+    missing = keys.isna().to_numpy()
+    key_weights = (
+        Series(weights[~missing], index=keys.index[~missing]).groupby(keys[~missing]).sum()
+    )
+    return key_weights, sum_weights(weights[missing])
+
+
+def count_join_matches(left_keys: "Series", right_keys: "Series") -> int:
+    """Count the pairs of rows that match in a join between two columns.
+
+    :param left_keys: join column from the first dataset
+    :type left_keys: Series
+    :param right_keys: join column from the second dataset
+    :type right_keys: Series
+    :return: number of rows in the merged dataset
+    :rtype: int
+    """
+    ones = np.ones(len(right_keys), dtype=np.int64)
+    return sum_weights(lookup_weights(left_keys, *sum_weights_by_key(right_keys, ones)))
+
+
+def lookup_weights(keys: "Series", key_weights: "Series", missing_weight: int) -> np.ndarray:
+    """Find the weight for the key value in each row.
+
+    :param keys: join column
+    :type keys: Series
+    :param key_weights: weights for each (non-missing) key value, from `sum_weights_by_key`
+    :type key_weights: Series
+    :param missing_weight: weight for rows with a missing value
+    :type missing_weight: int
+    :return: weight of each row; 0 if the key value is not in `key_weights`. The weights are
+        Python ints if `key_weights` or `missing_weight` do not fit in int64.
+    :rtype: np.ndarray
+    """
+    exact = key_weights.dtype == object or missing_weight > MAX_INT64
+    weights = key_weights.to_numpy(dtype=object if exact else np.int64)
+    positions = key_weights.index.get_indexer(keys)
+    found = positions >= 0
+    row_weights = np.zeros(len(keys), dtype=weights.dtype)
+    row_weights[found] = weights[positions[found]]
+    row_weights[keys.isna().to_numpy()] = missing_weight
+    return row_weights
+
+
+def count_tree_combinations(
+    join_tree: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> int:
+    """Count the rows in the combined dataset without building it.
+
+    Working from the leaves of the join tree to the root, each row is given a weight equal to
+    the number of combinations of rows from the datasets below it that it is part of: the
+    product, over each child dataset, of the total weight of the child rows that it matches.
+    The sum of the weights of the rows in the root dataset is the number of combinations.
+
+    The weights are held in int64 arrays while they fit, and as Python ints once they could
+    overflow, so the count is exact however large it is.
+
+    :param join_tree: joins in breadth-first order, from `get_join_tree`
+    :type join_tree: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: number of rows in the combined dataset
+    :rtype: int
+    """
+    weights = {ref: np.ones(len(dataframes[ref]), dtype=np.int64) for ref in dataframes}
+    for join in reversed(join_tree):
+        parent, child = join[T1][REF], join[T2][REF]
+        child_weights = sum_weights_by_key(
+            dataframes[child][suffix(join[T2][FIELD], child)], weights[child]
+        )
+        weights[parent] = multiply_weights(
+            weights[parent],
+            lookup_weights(dataframes[parent][suffix(join[T1][FIELD], parent)], *child_weights),
+        )
+
+    return sum_weights(weights[join_tree[0][T1][REF]])
+
+
+def combine_data(  # noqa: PLR0913
     join_params: dict[str, Any],
     combined_data: dict[str, Any],
+    memory_budget: int | None = None,
+    scratch_dir: str | None = None,
+    n_workers: int = 1,
+    data_size: int | None = None,
 ) -> dict[str, Any]:
     """Combine datasets from the different sources together and check for intersections.
 
+    If the joins form a tree, the matched IDs are found by semi-joins; otherwise, they contain
+    cycles, and the matched IDs are found by the generic join.
+
+    If both `memory_budget` and `data_size` are given and the datasets are larger than the
+    budget, the matching rows are found in an on-disk SQLite database in `scratch_dir` instead
+    of in memory. Only this step runs on disk: the datasets are still loaded in memory, so this
+    is opt-in. Otherwise, if
+    `n_workers` is more than 1, the joins form a tree, and the datasets have at least
+    PARTITIONED_JOIN_MIN_ROWS rows between them, the semi-joins are split into partitions and
+    run in `n_workers` processes.
+
     :param join_params: join parameters
     :type join_params: dict[str, Any]
     :param combined_data: dict containing standardised data for each dataset, indexed by KBase ref
     :type combined_data: dict[str, Any]
+    :param memory_budget: maximum size of the join columns to join in memory, in bytes;
+        defaults to None (no limit)
+    :type memory_budget: int | None
+    :param scratch_dir: directory for the on-disk database; defaults to None, in which case the
+        system temporary directory is used
+    :type scratch_dir: str | None
+    :param n_workers: number of processes to run the joins in; defaults to 1
+    :type n_workers: int
+    :param data_size: size of the datasets, in bytes, e.g. the total size of the objects from
+        the preflight check; defaults to None (unknown), in which case the joins run in memory
+    :type data_size: int | None
     :raises RuntimeError: if required fields are missing
     :raises RuntimeError: if there are no intersections between datasets
+    :return: IDs of the items in each dataset that are in the combined dataset, indexed by KBase ref
+    :rtype: dict[str, Any]
     """
-    ## Matrix: list of {"row_id": x, "col_id": y, "value": z}
-    ## Sampleset: list of {"sample_id": x, "field_2": y, "field_3": z, ...}
+    ## Matrix: Dataset with columns "id", "column_id", "row_id", "value"
+    ## Sampleset: Dataset with columns "id", "name", "field_2", "field_3", ...
     ##
 
-    dataframes: dict[str, DataFrame] = {}
+    dataframes = load_dataframes(join_params, combined_data)
+    if memory_budget is not None and data_size is not None and data_size > memory_budget:
+        return combine_data_on_disk(
+            join_params[JOIN_LIST], dataframes, scratch_dir or tempfile.gettempdir()
+        )
+    if (
+        n_workers > 1
+        and get_join_tree(join_params[JOIN_LIST]) is not None
+        and sum(len(dataframe) for dataframe in dataframes.values()) >= PARTITIONED_JOIN_MIN_ROWS
+    ):
+        return combine_data_partitioned(join_params[JOIN_LIST], dataframes, n_workers)
+
+    # ensure that each pair of datasets has values in common
+    shared_keys, all_err_list = find_join_keys(join_params[JOIN_LIST], dataframes)
+    if all_err_list:
+        raise RuntimeError(format_no_matches_error(all_err_list))
+
+    # drop the rows without a match in the dataset that they are directly joined to
+    for join, keys in zip(join_params[JOIN_LIST], shared_keys, strict=True):
+        for tx in [T1, T2]:
+            ref = join[tx][REF]
+            dataframes[ref] = semi_join(dataframes[ref], suffix(join[tx][FIELD], ref), keys)
+
+    join_tree = get_join_tree(join_params[JOIN_LIST])
+    if join_tree is None:
+        return generic_join_matched_ids(join_params[JOIN_LIST], dataframes)
+    return semi_join_matched_ids(join_tree, dataframes)
+
+
+def format_no_matches_error(err_list: list[str]) -> str:
+    """Generate the error message for joins between datasets with no values in common.
+
+    :param err_list: descriptions of the joins, from `generate_combination_string`
+    :type err_list: list[str]
+    :return: error message
+    :rtype: str
+    """
+    return "No matching values found between the following datasets:\n" + "\n".join(err_list)
+
+
+def combine_data_on_disk(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"], scratch_dir: str
+) -> dict[str, set[Any]]:
+    """Find the IDs of the rows that take part in the combined dataset, using an on-disk database.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :param scratch_dir: directory in which to create the database
+    :type scratch_dir: str
+    :raises RuntimeError: if there are no intersections between datasets
+    :return: IDs of the matched rows, indexed by KBase ref
+    :rtype: dict[str, set[Any]]
+    """
+    with SqliteJoinStore(scratch_dir) as store:
+        return find_matched_ids_in_store(join_list, dataframes, store)
+
+
+def combine_data_partitioned(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"], n_workers: int
+) -> dict[str, set[Any]]:
+    """Find the IDs of the rows that take part in the combined dataset, using a process pool.
+
+    The joins must form a tree.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :param n_workers: number of worker processes
+    :type n_workers: int
+    :raises RuntimeError: if there are no intersections between datasets
+    :return: IDs of the matched rows, indexed by KBase ref
+    :rtype: dict[str, set[Any]]
+    """
+    with PartitionedJoiner(n_workers) as joiner:
+        return find_matched_ids_in_store(join_list, dataframes, joiner)
+
+
+def find_store_join_error(
+    join: dict[str, Any],
+    dataframes: dict[str, "DataFrame"],
+    store: SqliteJoinStore | PartitionedJoiner,
+) -> str | None:
+    """Check that the columns in a join can be merged and have values in common.
+
+    :param join: join, with keys T1 and T2, each of which has fields REF and FIELD
+    :type join: dict[str, Any]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :param store: join store holding the join columns
+    :type store: SqliteJoinStore | PartitionedJoiner
+    :return: error for the join, in the same form as from `find_join_keys`, or None if the
+        columns have values in common
+    :rtype: str | None
+    """
+    type_error = find_type_error(join, dataframes)
+    if type_error is not None:
+        return type_error
+    if not store.has_match(
+        *[(join[tx][REF], suffix(join[tx][FIELD], join[tx][REF])) for tx in [T1, T2]]
+    ):
+        return generate_combination_string(join)
+    return None
+
+
+def find_matched_ids_in_store(
+    join_list: list[dict[str, Any]],
+    dataframes: dict[str, "DataFrame"],
+    store: SqliteJoinStore | PartitionedJoiner,
+) -> dict[str, set[Any]]:
+    """Find the IDs of the rows that take part in the combined dataset, using a join store.
+
+    The join columns are added to the store, where the same steps are run as in
+    `combine_data`: the joins are checked for columns that cannot be merged and for values in
+    common, and then the matched rows are found by semi-joins if the joins form a tree, or by
+    joining all the datasets otherwise. Joining all the datasets is only supported by
+    `SqliteJoinStore`.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :param store: join store, with no tables
+    :type store: SqliteJoinStore | PartitionedJoiner
+    :raises RuntimeError: if there are no intersections between datasets
+    :return: IDs of the matched rows, indexed by KBase ref
+    :rtype: dict[str, set[Any]]
+    """
+
+    def column(dataset: dict[str, Any]) -> tuple[str, str]:
+        return dataset[REF], suffix(dataset[FIELD], dataset[REF])
+
+    for ref, dataframe in dataframes.items():
+        store.add_table(
+            ref,
+            {name: dataframe[name] for name in dataframe.columns if name != suffix("id", ref)},
+        )
+
+    all_err_list = [
+        err
+        for err in (find_store_join_error(join, dataframes, store) for join in join_list)
+        if err is not None
+    ]
+    if all_err_list:
+        raise RuntimeError(format_no_matches_error(all_err_list))
+
+    join_tree = get_join_tree(join_list)
+    if join_tree is None:
+        # drop the rows without a match in the datasets that they are directly joined to, so
+        # that fewer rows go into the join of all the datasets
+        for join in join_list:
+            store.semi_join(column(join[T1]), column(join[T2]))
+            store.semi_join(column(join[T2]), column(join[T1]))
+        positions = store.get_joined_positions(
+            [(column(join[T1]), column(join[T2])) for join in join_list]
+        )
+    else:
+        # remove the rows without a match in the subtree below, then those without a
+        # match in the dataset above
+        for join in reversed(join_tree):
+            store.semi_join(column(join[T1]), column(join[T2]))
+        for join in join_tree:
+            store.semi_join(column(join[T2]), column(join[T1]))
+        positions = {ref: store.get_positions(ref) for ref in dataframes}
+
+    return {
+        ref: set(dataframes[ref][suffix("id", ref)].iloc[positions[ref]].dropna())
+        for ref in dataframes
+    }
+
+
+def count_combinations(
+    join_params: dict[str, Any],
+    combined_data: dict[str, Any],
+) -> dict[str, Any]:
+    """Count the rows produced by each join and by combining all the datasets.
+
+    The total is calculated without building the combined dataset: if the joins form a tree,
+    in time linear in the size of the datasets; otherwise, with the generic join.
+
+    :param join_params: join parameters
+    :type join_params: dict[str, Any]
+    :param combined_data: dict containing standardised data for each dataset, indexed by KBase ref
+    :type combined_data: dict[str, Any]
+    :raises RuntimeError: if required fields are missing
+    :return: dict with keys `joins`, the number of pairs of matching rows for each join in the
+        join list, and `total`, the number of rows in the combined dataset
+    :rtype: dict[str, Any]
+    """
+    dataframes = load_dataframes(join_params, combined_data)
+    join_counts = [
+        count_join_matches(
+            dataframes[join[T1][REF]][suffix(join[T1][FIELD], join[T1][REF])],
+            dataframes[join[T2][REF]][suffix(join[T2][FIELD], join[T2][REF])],
+        )
+        for join in join_params[JOIN_LIST]
+    ]
+
+    join_tree = get_join_tree(join_params[JOIN_LIST])
+    if join_tree is None:
+        total = count_generic_join(join_params[JOIN_LIST], dataframes)
+    else:
+        total = count_tree_combinations(join_tree, dataframes)
+
+    return {"joins": join_counts, "total": total}
+
+
+def load_dataframes(
+    join_params: dict[str, Any],
+    combined_data: dict[str, Any],
+) -> dict[str, "DataFrame"]:
+    """Check that the datasets have the fields required for the joins and load those fields.
+
+    :param join_params: join parameters
+    :type join_params: dict[str, Any]
+    :param combined_data: dict containing standardised data for each dataset, indexed by KBase ref
+    :type combined_data: dict[str, Any]
+    :raises RuntimeError: if required fields are missing
+    :return: dataframes containing the `id` column and the required fields, with suffixed
+        column names, indexed by KBase ref
+    :rtype: dict[str, DataFrame]
+    """
     reqd_fields_by_ref = join_params[REQD_FIELDS]
     all_err_list = []
     for ref in reqd_fields_by_ref:
-        if ref not in dataframes:
-            dataframes[ref] = DataFrame(combined_data[ref][DL])
         # make sure all fields are present
         missing_fields = [
-            f for f in reqd_fields_by_ref[ref] if f not in dataframes[ref].columns
+            f for f in reqd_fields_by_ref[ref] if f not in combined_data[ref][DATASET]
         ]
         if missing_fields:
             all_err_list.append(
@@ -68,49 +737,568 @@ def combine_data(
         err_msg = "Errors in dataset field specifications:\n" + "\n".join(all_err_list)
         raise RuntimeError(err_msg)
 
-    # add a suffix to all the columns so we can track their origins
-    for ref in dataframes:
-        renamed_cols = dataframes[ref].rename(columns=lambda x: suffix(x, ref))
-        dataframes[ref] = renamed_cols
+    # only the IDs and the join fields are needed; the columns are shared with the dataset,
+    # and renamed with a suffix so we can track their origins
+    dataframes: dict[str, DataFrame] = {}
+    for ref, reqd_fields in reqd_fields_by_ref.items():
+        fieldnames = ["id", *[field for field in sorted(reqd_fields) if field != "id"]]
+        dataframes[ref] = (
+            combined_data[ref][DATASET]
+            .to_dataframe(fieldnames)
+            .rename(columns={field: suffix(field, ref) for field in fieldnames}, copy=False)
+        )
+    return dataframes
 
-    # initialise the megamerged dataframe with the first dataset on the join list
-    df_merged = dataframes[join_params[JOIN_LIST][0][T1][REF]]
-    # join each pair of datasets to ensure there is an overlap,
-    # and keep a cumulative joined dataset
-    for join in join_params[JOIN_LIST]:
-        try:
-            temp_df = dataframes[join[T1][REF]].merge(
-                dataframes[join[T2][REF]],
-                left_on=suffix(join[T1][FIELD], join[T1][REF]),
-                right_on=suffix(join[T2][FIELD], join[T2][REF]),
-                how="inner",
-                validate="many_to_many",
+
+def get_dataset_order(join_list: list[dict[str, Any]]) -> list[str]:
+    """List the datasets in the order in which they appear in the join list.
+
+    :param join_list: list of joins, ordered so that each join after the first includes a
+        dataset from an earlier join
+    :type join_list: list[dict[str, Any]]
+    :return: KBase refs of the datasets
+    :rtype: list[str]
+    """
+    dataset_order = [join_list[0][T1][REF]]
+    for join in join_list:
+        for tx in [T1, T2]:
+            if join[tx][REF] not in dataset_order:
+                dataset_order.append(join[tx][REF])
+    return dataset_order
+
+
+def get_join_values(keys: "Series") -> list[Any]:
+    """Convert a join column into a list of hashable values for looking up matching rows.
+
+    Missing values (None and NaN) are replaced by a single placeholder, as they all match
+    each other when datasets are merged.
+
+    :param keys: join column
+    :type keys: Series
+    :return: join values
+    :rtype: list[Any]
+    """
+    return [
+        MISSING_KEY if missing else value
+        for value, missing in zip(keys.tolist(), keys.isna().tolist(), strict=True)
+    ]
+
+
+def get_combination_steps(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> list[tuple[int, list[Any], int, list[Any], dict[Any, list[int]] | None]]:
+    """Prepare the lookups for adding each join to a combination of rows.
+
+    Each join is oriented so that the parent dataset is already in the combination. If the
+    child dataset is added by the join, its rows are indexed by join value.
+
+    :param join_list: list of joins, ordered so that each join after the first includes a
+        dataset from an earlier join
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :raises ValueError: if a join does not include a dataset from an earlier join
+    :return: for each join, the position of the parent dataset in the dataset order, the parent
+        join values, the position of the child dataset, the child join values, and the index of
+        child row positions by join value (None if the child dataset is already present)
+    :rtype: list[tuple[int, list[Any], int, list[Any], dict[Any, list[int]] | None]]
+    """
+    dataset_order = get_dataset_order(join_list)
+    seen = {dataset_order[0]}
+    steps = []
+    for join in join_list:
+        parent_tx, child_tx = (T1, T2) if join[T1][REF] in seen else (T2, T1)
+        parent, child = join[parent_tx][REF], join[child_tx][REF]
+        if parent not in seen:
+            err_msg = (
+                "Each join must include a dataset from an earlier join: "
+                + generate_combination_string(join)
             )
-            if not len(temp_df):
-                all_err_list.append(generate_combination_string(join))
-
-            # merge dataframes into the megamerged version
-            df_merged = df_merged.merge(
-                dataframes[join[T2][REF]],
-                left_on=suffix(join[T1][FIELD], join[T1][REF]),
-                right_on=suffix(join[T2][FIELD], join[T2][REF]),
-                how="inner",
-                validate="m:m",
+            raise ValueError(err_msg)
+
+        child_values = get_join_values(dataframes[child][suffix(join[child_tx][FIELD], child)])
+        index = None
+        if child not in seen:
+            seen.add(child)
+            index = {}
+            for position, value in enumerate(child_values):
+                index.setdefault(value, []).append(position)
+        steps.append(
+            (
+                dataset_order.index(parent),
+                get_join_values(dataframes[parent][suffix(join[parent_tx][FIELD], parent)]),
+                dataset_order.index(child),
+                child_values,
+                index,
             )
+        )
+    return steps
 
-        except ValueError as e:
-            all_err_list.append(generate_combination_string(join) + ": " + e.args[0])
 
-    if all_err_list:
-        err_msg = (
-            "No matching values found between the following datasets:\n"
-            + "\n".join(all_err_list)
+def iter_combination_rows(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> Iterator[tuple[int, ...]]:
+    """Generate the combinations of rows that make up the combined dataset.
+
+    Each join is applied in turn: the rows of the dataset that the join adds are looked up in
+    a hash index of its join column; if both datasets are already in the combination, the
+    join values are compared instead. Combinations are generated depth-first, so only one is
+    held in memory at a time.
+
+    :param join_list: list of joins, ordered so that each join after the first includes a
+        dataset from an earlier join
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :raises ValueError: if a join does not include a dataset from an earlier join
+    :return: iterator over tuples of row positions, one per dataset, in the order given by
+        `get_dataset_order`
+    :rtype: Iterator[tuple[int, ...]]
+    """
+    steps = get_combination_steps(join_list, dataframes)
+    dataset_order = get_dataset_order(join_list)
+    combination = [0] * len(dataset_order)
+
+    def extend(step_ix: int) -> Iterator[tuple[int, ...]]:
+        if step_ix == len(steps):
+            yield tuple(combination)
+            return
+        parent_ix, parent_values, child_ix, child_values, index = steps[step_ix]
+        value = parent_values[combination[parent_ix]]
+        if index is None:
+            # both datasets are already in the combination
+            if child_values[combination[child_ix]] == value:
+                yield from extend(step_ix + 1)
+            return
+        for position in index.get(value, ()):
+            combination[child_ix] = position
+            yield from extend(step_ix + 1)
+
+    for position in range(len(dataframes[dataset_order[0]])):
+        combination[0] = position
+        yield from extend(0)
+
+
+def get_join_variables(join_list: list[dict[str, Any]]) -> list[list[tuple[str, str]]]:
+    """Group the join fields into variables.
+
+    Fields that are joined to each other, directly or through other joins, must all have the
+    same value in a combination, so they form a single variable.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :return: the (KBase ref, field) pairs in each variable, in the order in which they appear
+        in the join list
+    :rtype: list[list[tuple[str, str]]]
+    """
+    variable_of: dict[tuple[str, str], list[tuple[str, str]]] = {}
+    for join in join_list:
+        left, right = (join[T1][REF], join[T1][FIELD]), (join[T2][REF], join[T2][FIELD])
+        for field in [left, right]:
+            if field not in variable_of:
+                variable_of[field] = [field]
+        if variable_of[left] is not variable_of[right]:
+            # merge the variable of the right field into that of the left field
+            merged = variable_of[left]
+            for field in variable_of[right]:
+                merged.append(field)
+                variable_of[field] = merged
+
+    # variable_of is ordered by the first appearance of each field
+    variables: dict[int, list[tuple[str, str]]] = {}
+    for field, variable in variable_of.items():
+        variables.setdefault(id(variable), []).append(field)
+    return list(variables.values())
+
+
+def build_join_trie(columns: list[list[Any]], positions: Iterable[int]) -> dict[Any, Any]:
+    """Index the rows of a dataset by the values of a series of join columns.
+
+    :param columns: join values of each row, one list per column
+    :type columns: list[list[Any]]
+    :param positions: positions of the rows to index
+    :type positions: Iterable[int]
+    :return: nested dicts, one level per column, with the positions of the rows with each
+        combination of values at the lowest level
+    :rtype: dict[Any, Any]
+    """
+    trie: dict[Any, Any] = {}
+    for position in positions:
+        node = trie
+        for column in columns[:-1]:
+            node = node.setdefault(column[position], {})
+        node.setdefault(columns[-1][position], []).append(position)
+    return trie
+
+
+def get_generic_join_variables(join_list: list[dict[str, Any]]) -> list[list[tuple[str, str]]]:
+    """List the join variables in the order in which the generic join binds them.
+
+    Variables shared by more datasets are bound first.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :return: the (KBase ref, field) pairs in each variable, as returned by `get_join_variables`
+    :rtype: list[list[tuple[str, str]]]
+    """
+    variables = get_join_variables(join_list)
+    variables.sort(key=lambda variable: -len({ref for ref, _ in variable}))
+    return variables
+
+
+def prepare_generic_join(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> tuple[list[list[int]], list[dict[Any, Any]]]:
+    """Index each dataset by its join variables, ready for the generic join.
+
+    The variables are bound in the order given by `get_generic_join_variables`. If a dataset
+    has several fields in the same variable, only the rows in which those fields have the same
+    value are indexed.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: for each level of the join, the positions in the dataset order of the datasets
+        with a field in the variable bound at that level; and the join trie of each dataset,
+        in the dataset order
+    :rtype: tuple[list[list[int]], list[dict[Any, Any]]]
+    """
+    dataset_order = get_dataset_order(join_list)
+    variables = get_generic_join_variables(join_list)
+
+    levels = [
+        sorted({dataset_order.index(ref) for ref, _ in variable}) for variable in variables
+    ]
+    tries = []
+    for ref in dataset_order:
+        columns = []
+        positions: Iterable[int] = range(len(dataframes[ref]))
+        for variable in variables:
+            fields = [
+                get_join_values(dataframes[ref][suffix(field, ref)])
+                for variable_ref, field in variable
+                if variable_ref == ref
+            ]
+            if not fields:
+                continue
+            columns.append(fields[0])
+            for other in fields[1:]:
+                positions = [pos for pos in positions if other[pos] == fields[0][pos]]
+        tries.append(build_join_trie(columns, positions))
+    return levels, tries
+
+
+def iter_generic_join(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> Iterator[list[list[int]]]:
+    """Find the combinations of join values shared by all the datasets.
+
+    This is the generic join algorithm, which is worst-case optimal for any join graph,
+    including cyclic ones: the join variables are bound one at a time, and the values of each
+    are found by intersecting those of every dataset that has a field in it, iterating over
+    the smallest set of values and looking the others up in hash tries.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: iterator over the combinations of join values; for each, the positions of the
+        rows of each dataset with those values, in the order given by `get_dataset_order`
+    :rtype: Iterator[list[list[int]]]
+    """
+    levels, tries = prepare_generic_join(join_list, dataframes)
+
+    def bind(level: int, nodes: list[Any]) -> Iterator[list[list[int]]]:
+        if level == len(levels):
+            yield nodes
+            return
+        datasets = levels[level]
+        smallest = min(datasets, key=lambda ix: len(nodes[ix]))
+        for value in nodes[smallest]:
+            next_nodes = list(nodes)
+            for ix in datasets:
+                next_nodes[ix] = nodes[ix].get(value)
+                if next_nodes[ix] is None:
+                    break
+            else:
+                yield from bind(level + 1, next_nodes)
+
+    yield from bind(0, tries)
+
+
+def iter_generic_join_rows(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> Iterator[tuple[int, ...]]:
+    """Generate the combinations of rows that make up the combined dataset with the generic join.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: iterator over tuples of row positions, one per dataset, in the order given by
+        `get_dataset_order`
+    :rtype: Iterator[tuple[int, ...]]
+    """
+    for positions in iter_generic_join(join_list, dataframes):
+        yield from product(*positions)
+
+
+def generic_join_matched_ids(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> dict[str, set[Any]]:
+    """Find the IDs of the rows in each dataset that take part in the combined dataset.
+
+    The combinations of join values are found by the generic join; the combined dataset itself
+    is never built.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: IDs of the matched rows, indexed by KBase ref
+    :rtype: dict[str, set[Any]]
+    """
+    dataset_order = get_dataset_order(join_list)
+    matched: list[set[int]] = [set() for _ in dataset_order]
+    for positions in iter_generic_join(join_list, dataframes):
+        for matched_positions, dataset_positions in zip(matched, positions, strict=True):
+            matched_positions.update(dataset_positions)
+
+    return {
+        ref: set(
+            dataframes[ref][suffix("id", ref)].iloc[sorted(matched_positions)].dropna()
         )
-        raise RuntimeError(err_msg)
+        for ref, matched_positions in zip(dataset_order, matched, strict=True)
+    }
+
+
+def count_generic_join(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> int:
+    """Count the rows in the combined dataset with the generic join, without building it.
+
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: number of rows
+    :rtype: int
+    """
+    return sum(
+        prod(len(dataset_positions) for dataset_positions in positions)
+        for positions in iter_generic_join(join_list, dataframes)
+    )
+
 
-    matched_ids = {}
-    for ref in dataframes:
-        # extract the matched IDs from each dataframe
-        matched_ids[ref] = set(df_merged[suffix("id", ref)].dropna())
+def collect_key_statistics(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> dict[str, dict[str, Any]]:
+    """Collect the statistics used to plan the joins.
 
-    return matched_ids
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: for each dataset, indexed by KBase ref, the number of rows (`rows`) and, for each
+        join field (`fields`), the number of distinct values (`distinct`) and the largest
+        number of rows with the same value (`max_group`); missing values count as one value
+    :rtype: dict[str, dict[str, Any]]
+    """
+    statistics = {}
+    for join in join_list:
+        for tx in [T1, T2]:
+            ref, field = join[tx][REF], join[tx][FIELD]
+            ref_stats = statistics.setdefault(ref, {"rows": len(dataframes[ref]), "fields": {}})
+            if field not in ref_stats["fields"]:
+                counts = dataframes[ref][suffix(field, ref)].value_counts(dropna=False)
+                ref_stats["fields"][field] = {
+                    "distinct": len(counts),
+                    "max_group": int(counts.max()) if len(counts) else 0,
+                }
+    return statistics
+
+
+def get_join_plan(
+    join_list: list[dict[str, Any]], dataframes: dict[str, "DataFrame"]
+) -> dict[str, Any]:
+    """Plan the order in which combinations are generated.
+
+    If the joins form a tree, the order is chosen by `plan_join_order`, using statistics on the
+    datasets with the rows that do not take part in the combined dataset removed. Otherwise,
+    the combinations are generated by the generic join, which does not add the datasets one
+    at a time, so the plan only gives the order in which the join variables are bound.
+
+    :param join_list: list of joins, ordered so that each join after the first includes a
+        dataset from an earlier join
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :return: the plan: if the joins form a tree, as returned by `estimate_plan`; otherwise, a
+        dict with the key `variables`, the join variables from `get_generic_join_variables`
+    :rtype: dict[str, Any]
+    """
+    join_tree = get_join_tree(join_list)
+    if join_tree is None:
+        return {"variables": get_generic_join_variables(join_list)}
+    reduced = reduce_join_tree(join_tree, dataframes)
+    return plan_join_order(join_tree, collect_key_statistics(join_tree, reduced))
+
+
+def plan_combinations(
+    join_params: dict[str, Any],
+    combined_data: dict[str, Any],
+) -> dict[str, Any]:
+    """Plan the order in which the combinations of items are generated.
+
+    :param join_params: join parameters
+    :type join_params: dict[str, Any]
+    :param combined_data: dict containing standardised data for each dataset, indexed by KBase ref
+    :type combined_data: dict[str, Any]
+    :raises RuntimeError: if required fields are missing
+    :return: the plan, as returned by `get_join_plan`
+    :rtype: dict[str, Any]
+    """
+    return get_join_plan(join_params[JOIN_LIST], load_dataframes(join_params, combined_data))
+
+
+def iter_combination_batches(
+    join_list: list[dict[str, Any]],
+    dataframes: dict[str, "DataFrame"],
+    batch_size: int,
+    plan: dict[str, Any] | None = None,
+) -> Iterator[np.ndarray]:
+    """Generate the combinations of rows that make up the combined dataset, in batches.
+
+    If the joins form a tree, the rows that do not take part in the combined dataset are
+    removed first, and the combinations are generated in the order given by the join plan;
+    otherwise, they are generated by the generic join.
+
+    :param join_list: list of joins, ordered so that each join after the first includes a
+        dataset from an earlier join
+    :type join_list: list[dict[str, Any]]
+    :param dataframes: datasets, with suffixed column names, indexed by KBase ref
+    :type dataframes: dict[str, DataFrame]
+    :param batch_size: maximum number of combinations per batch
+    :type batch_size: int
+    :param plan: join plan, from `get_join_plan`; created if not supplied; only used if the
+        joins form a tree
+    :type plan: dict[str, Any] | None
+    :return: iterator over arrays with one row per combination, holding the row positions
+        of each dataset in the order given by `get_dataset_order`
+    :rtype: Iterator[np.ndarray]
+    """
+    dataset_order = get_dataset_order(join_list)
+    join_tree = get_join_tree(join_list)
+    if join_tree is None:
+        combinations = iter_generic_join_rows(join_list, dataframes)
+        planned_columns = list(range(len(dataset_order)))
+    else:
+        if plan is None:
+            plan = get_join_plan(join_list, dataframes)
+        dataframes = reduce_join_tree(join_tree, dataframes)
+        combinations = iter_combination_rows(plan["joins"], dataframes)
+        planned_order = get_dataset_order(plan["joins"])
+        planned_columns = [planned_order.index(ref) for ref in dataset_order]
+    # positions of the remaining rows in the original datasets
+    row_positions = [dataframes[ref].index.to_numpy() for ref in dataset_order]
+
+    while chunk := list(islice(combinations, batch_size)):
+        planned = np.array(chunk, dtype=np.int64)
+        yield np.column_stack(
+            [
+                positions[planned[:, column]]
+                for positions, column in zip(row_positions, planned_columns, strict=True)
+            ]
+        )
+
+
+def generate_combinations(
+    join_params: dict[str, Any],
+    combined_data: dict[str, Any],
+) -> Iterator[tuple[Any, ...]]:
+    """Generate the combinations of items that make up the combined dataset.
+
+    :param join_params: join parameters
+    :type join_params: dict[str, Any]
+    :param combined_data: dict containing standardised data for each dataset, indexed by KBase ref
+    :type combined_data: dict[str, Any]
+    :raises RuntimeError: if required fields are missing
+    :return: iterator over tuples of IDs, one per dataset, in the order given by
+        `get_dataset_order`
+    :rtype: Iterator[tuple[Any, ...]]
+    """
+    dataframes = load_dataframes(join_params, combined_data)
+    ids = [
+        dataframes[ref][suffix("id", ref)].to_numpy()
+        for ref in get_dataset_order(join_params[JOIN_LIST])
+    ]
+    for batch in iter_combination_batches(
+        join_params[JOIN_LIST], dataframes, COMBINATION_BATCH_SIZE
+    ):
+        yield from zip(
+            *[column[batch[:, ix]].tolist() for ix, column in enumerate(ids)], strict=True
+        )
+
+
+def write_combinations(  # noqa: PLR0913
+    join_params: dict[str, Any],
+    combined_data: dict[str, Any],
+    output_dir: str,
+    chunk_rows: int,
+    plan: dict[str, Any] | None = None,
+    max_rows: int | None = None,
+) -> list[str]:
+    """Write the combined dataset to a series of CSV files.
+
+    Each file holds at most `chunk_rows` combinations and has a header row. Each combination
+    is written as the ID of its item in each dataset, in the order given by `get_dataset_order`;
+    the columns are named `id` suffixed by the dataset ref, and the IDs are in the same form as
+    in the dataset CSV files, which hold the other fields.
+
+    If `max_rows` is set, only the first `max_rows` combinations are written; generation stops
+    as soon as they have been, so the rest of the combined dataset is never built.
+
+    :param join_params: join parameters
+    :type join_params: dict[str, Any]
+    :param combined_data: dict containing standardised data for each dataset, indexed by KBase ref
+    :type combined_data: dict[str, Any]
+    :param output_dir: directory to save the files in
+    :type output_dir: str
+    :param chunk_rows: maximum number of combinations per file
+    :type chunk_rows: int
+    :param plan: join plan, from `plan_combinations`; created if not supplied
+    :type plan: dict[str, Any] | None
+    :param max_rows: maximum number of combinations to write; defaults to None (no limit)
+    :type max_rows: int | None
+    :raises RuntimeError: if required fields are missing
+    :return: names of the files written, in order
+    :rtype: list[str]
+    """
+    if max_rows is not None and max_rows <= 0:
+        return []
+
+    dataset_order = get_dataset_order(join_params[JOIN_LIST])
+    datasets = [combined_data[ref][DATASET] for ref in dataset_order]
+    header = [suffix("id", ref) for ref in dataset_order]
+
+    file_names = []
+    rows_written = 0
+    for batch in iter_combination_batches(
+        join_params[JOIN_LIST], load_dataframes(join_params, combined_data), chunk_rows, plan
+    ):
+        positions = batch if max_rows is None else batch[: max_rows - rows_written]
+        columns = [
+            dataset.format_ids(dataset["id"][positions[:, ix]])
+            for ix, dataset in enumerate(datasets)
+        ]
+        file_name = COMBINATION_FILE_NAME.format(len(file_names))
+        with open(os.path.join(output_dir, file_name), "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(header)
+            writer.writerows(zip(*columns, strict=True))
+        file_names.append(file_name)
+        rows_written += len(positions)
+        if max_rows is not None and rows_written >= max_rows:
+            break
+    return file_names
@@ -2,6 +2,7 @@
 
 ALL = "all"
 DATA = "data"
+DATASET = "dataset"
 DL = "dict_list"
 DISPLAY = "display"
 FIELD = "field"
@@ -10,6 +11,7 @@ INFO = "infostruct"
 INTERSECT = "intersection"
 JOIN_LIST = "join_list"
 KEYS = "keys"
+PLAN = "plan"
 REF = "ref"
 REFS = "refs"
 REQD_FIELDS = "required_fields"
@@ -17,8 +19,40 @@ T1 = "t1"
 T2 = "t2"
 XTRA = "extras"
 
-MAX_CONNECTIONS_PER_NODE = 2
-MAX_REFS = 3
+MB = 1024 * 1024
+
+MAX_REFS = 20
+# a dataset in a tree of MAX_REFS datasets can be joined to all of the others
+MAX_CONNECTIONS_PER_NODE = MAX_REFS - 1
+
+# joins are only split across processes if the datasets have at least this many rows in total;
+# below this, starting the processes takes longer than the joins
+PARTITIONED_JOIN_MIN_ROWS = 1000000
+
+# defaults for the optional settings in deploy.cfg
+DEFAULT_SAMPLE_FETCH_WORKERS = 4
+DEFAULT_SAMPLE_BATCH_SIZE = 1000
+DEFAULT_HTTP_POOL_SIZE = 10
+DEFAULT_HTTP_MAX_RETRIES = 3
+DEFAULT_OBJECT_CACHE_MAX_MB = 2048
+DEFAULT_SAMPLE_CACHE_MAX_MB = 512
+DEFAULT_MAX_OBJECT_SIZE_MB = 1024
+DEFAULT_CHUNKED_FETCH_THRESHOLD_MB = 256
+DEFAULT_COMBINATION_CHUNK_ROWS = 100000
+DEFAULT_MAX_COMBINATION_ROWS = 1000000
+# 0 turns the on-disk join off
+DEFAULT_JOIN_MEMORY_BUDGET_MB = 0
+DEFAULT_JOIN_WORKERS = 1
+
+# plans for fetching workspace objects
+# fetch all objects in a single request
+PLAN_IN_MEMORY = "in_memory"
+# fetch objects one at a time, only fetching the next when the previous has been processed
+PLAN_CHUNKED = "chunked"
+
+HTTP_RETRY_BACKOFF_FACTOR = 0.5
+# timeout for requests to KBase services, in seconds; the same as the KBase SDK clients
+HTTP_TIMEOUT = 30 * 60
 
 BASE_ERROR_MESSAGE = "Combinatrix encountered the following errors"
 PARAM_ERROR_MESSAGE = f"{BASE_ERROR_MESSAGE} in the input parameters:\n"
@@ -1,40 +1,45 @@
 """Convert data from various input formats to delimiter-separated data."""
 
-import csv
 import json
+import logging
 import os
-from copy import deepcopy
 from typing import Any
 
-from combinatrix.constants import DATA, DL, FN, KEYS
+import numpy as np
+from combinatrix.constants import DATA, DATASET, DL, FN, KEYS
+from combinatrix.dataset import Dataset, MatrixDataset, to_column
 from combinatrix.util import get_data_type, get_upa, resort_fieldnames
 
+logger = logging.getLogger(__name__)
 
-def convert_data(fetched_data: dict[str, Any]) -> dict[str, Any]:
-    """Convert data into a format that can be used in `combine_data`.
 
-    :param fetched_data: data from the workspace, indexed by ref
-    :type fetched_data: dict[str, Any]
-    :raises RuntimeError: if there are errors in converting the data
-    :return: fetched_data with converted data integrated into it
-    :rtype: dict[str, Any]
+def get_converter_name(data_type: str) -> str | None:
+    """Find the converter for a KBase data type.
+
+    :param data_type: KBase data type, e.g. KBaseMatrices.AmpliconMatrix-10.0
+    :type data_type: str
+    :return: name of the converter in CONVERTERS, or None if there is not exactly one match
+    :rtype: str | None
     """
-    errors = []
-    for ref in fetched_data:
-        try:
-            fetched_data[ref] = {
-                **fetched_data[ref],
-                **convert_ws_object(fetched_data[ref]),
-            }
-        except (ValueError, RuntimeError) as e:
-            errors.append(e.args[0])
+    matching_converters = [k for k in CONVERTERS if k in data_type]
+    if len(matching_converters) != 1:
+        return None
+    return matching_converters[0]
+
 
-    if errors:
-        errors = ["Errors running data conversion for the Combinatrix:", *errors]
-        big_error_message = "\n".join(errors)
-        raise RuntimeError(big_error_message)
+def get_included_paths(data_type: str) -> list[str] | None:
+    """Retrieve the paths within a workspace object that are needed to convert it.
 
-    return fetched_data
+    :param data_type: KBase data type, e.g. KBaseMatrices.AmpliconMatrix-10.0
+    :type data_type: str
+    :return: list of paths for the workspace `included` parameter, or None if the whole
+        object is required
+    :rtype: list[str] | None
+    """
+    conv = get_converter_name(data_type)
+    if conv is None:
+        return None
+    return CONVERTERS[conv]["included"]
 
 
 def convert_ws_object(object_data: dict[str, Any]) -> dict[str, Any]:
@@ -46,28 +51,69 @@ def convert_ws_object(object_data: dict[str, Any]) -> dict[str, Any]:
     :return: amended object_data structure with info in tabular form
     :rtype: dict[str, dict[str, Any]]
     """
-    converters = {
-        "SampleSet": convert_samples,
-        "Matrix": convert_matrix,
-    }
-
     object_data_type = get_data_type(object_data)
-    matching_converters = [k for k in converters if k in object_data_type]
-    if len(matching_converters) != 1:
+    conv = get_converter_name(object_data_type)
+    if conv is None:
         err_msg = f"{get_upa(object_data)}: no dedicated converter found for {object_data_type}"
         raise RuntimeError(err_msg)
 
-    conv = matching_converters[0]
     # run the converter
-    return converters[conv](object_data)
+    return CONVERTERS[conv]["converter"](object_data)
+
+
+def add_sample_metadata(
+    columns: dict[str, list[Any]],
+    row: int,
+    n_rows: int,
+    metadata: dict[str, dict[str, Any]],
+    unrecognised: dict[str, int],
+) -> None:
+    """Add the metadata for a sample to the dataset columns.
+
+    Metadata values in the form {"value": x} are saved as x; those in the form
+    {"value": x, "units": y} are saved as "x y". Any other value is saved as JSON and
+    the fields that it contains are recorded in `unrecognised`.
+
+    :param columns: dataset columns, indexed by field name; updated in place
+    :type columns: dict[str, list[Any]]
+    :param row: index of the sample in the dataset
+    :type row: int
+    :param n_rows: number of samples in the dataset
+    :type n_rows: int
+    :param metadata: sample metadata, indexed by metadata key
+    :type metadata: dict[str, dict[str, Any]]
+    :param unrecognised: number of values seen with each unrecognised set of fields;
+        updated in place
+    :type unrecognised: dict[str, int]
+    """
+    for key, node_value in metadata.items():
+        n_fields = len(node_value)
+        if n_fields == 1 and "value" in node_value:
+            value = node_value["value"]
+        elif n_fields == 2 and "value" in node_value and "units" in node_value:  # noqa: PLR2004
+            value = f"{node_value['value']} {node_value['units']}"
+        else:
+            fields = ", ".join(node_value)
+            unrecognised[fields] = unrecognised.get(fields, 0) + 1
+            value = json.dumps(node_value, indent=0)
+
+        column = columns.get(key)
+        if column is None:
+            column = columns[key] = [None] * n_rows
+        column[row] = value
 
 
 def convert_samples(object_data: dict[str, Any]) -> dict[str, Any]:
     """Parse sample data and flatten it out for combinatrixing.
 
-    :param sample_list: the `sample_data` value
-    :type sample_list: list[dict[str, Any]]
-    :return: dict containing the fieldnames and a list of samples data dicts
+    Each sample is read once, and its fields and metadata are written straight into the
+    columns of the dataset; the sample data itself is not copied or altered.
+
+    :param object_data: the workspace data for a SampleSet, with the samples in `sample_data`
+    :type object_data: dict[str, Any]
+    :raises ValueError: if the sample data is missing or a sample does not have exactly one
+        node tree with the same ID as the sample name
+    :return: dict containing the metadata keys and the samples data as a Dataset
     :rtype: dict[str, Any]
     """
     sample_data = object_data.get(DATA, {}).get("sample_data")
@@ -75,15 +121,22 @@ def convert_samples(object_data: dict[str, Any]) -> dict[str, Any]:
         err_msg = f"{get_upa(object_data)}: no 'data.sample_data' field found"
         raise ValueError(err_msg)
 
+    n_samples = len(sample_data)
     keys = {
-        "all": set(),
         "user": set(),
         "controlled": set(),
     }
-    parsed_samples = []
-    for sample in sample_data:
-        sample_data = deepcopy(sample)
-        del sample_data["node_tree"]
+    # values for each field, indexed by field name; fields missing from a sample are None
+    columns: dict[str, list[Any]] = {}
+    unrecognised: dict[str, int] = {}
+    for row, sample in enumerate(sample_data):
+        for field, value in sample.items():
+            if field == "node_tree":
+                continue
+            column = columns.get(field)
+            if column is None:
+                column = columns[field] = [None] * n_samples
+            column[row] = value
 
         # move the interesting data from under 'node_tree' up
         sample_name = sample["name"]
@@ -95,50 +148,42 @@ def convert_samples(object_data: dict[str, Any]) -> dict[str, Any]:
             raise ValueError(err_msg)
 
         snt = sample_node_trees[0]
-        sample_data["type"] = snt["type"]
+        columns.setdefault("type", [None] * n_samples)[row] = snt["type"]
 
         # the data is in `snt` under the keys
         # "meta_controlled" and "meta_user"
         for key_type in ["user", "controlled"]:
-            m_key = f"meta_{key_type}"
-            if m_key in snt and snt.get(m_key, []):
-                keys[key_type].update(snt.get(m_key).keys())
-                for key in snt.get(m_key, []):
-                    node_value = snt[m_key][key]
-                    value = None
-                    # check if it's in value/units form
-                    if set(node_value.keys()) == {"value", "units"}:
-                        value = f"{node_value['value']} {node_value['units']}"
-                    elif set(node_value.keys()) == {"value"}:
-                        value = node_value["value"]
-                    else:
-                        print(
-                            f"unrecognised configuration: keys: {', '.join(node_value.keys())}"
-                        )
-                        value = json.dumps(node_value, indent=0)
-                    sample_data[key] = value
-
-        parsed_samples.append(sample_data)
-        keys["all"].update(sample_data.keys())
+            metadata = snt.get(f"meta_{key_type}")
+            if metadata:
+                keys[key_type].update(metadata)
+                add_sample_metadata(columns, row, n_samples, metadata, unrecognised)
+
+    if unrecognised:
+        logger.warning(
+            "%s: metadata values in an unrecognised format were saved as JSON: %s",
+            get_upa(object_data),
+            "; ".join(
+                f"keys {fields} ({count} value{'s' if count > 1 else ''})"
+                for fields, count in unrecognised.items()
+            ),
+        )
 
     return {
-        KEYS: {
-            "controlled": keys["controlled"],
-            "user": keys["user"],
-        },
-        FN: keys["all"],
-        DL: parsed_samples,
+        KEYS: keys,
+        DATASET: Dataset(columns),
     }
 
 
 def convert_matrix(object_data: dict[str, Any]) -> dict[str, Any]:
-    """Convert matrix data (as a dataframe-type rows/cols/values dump) into a list of lists.
+    """Convert matrix data (as a dataframe-type rows/cols/values dump) into long form.
 
     :param object_data: source, a dictionary with keys 'row_ids', 'col_ids', and 'values'
     :type object_data: dict[str, Any]
-    :raises ValueError: if any of the required keys are not found
-    :return: the dataset reorganised as a list of dicts (with an 'id' field added), a set of fieldnames.
-    :rtype: list[list[Any]]
+    :raises ValueError: if any of the required keys are not found, or the dimensions of
+        'values' do not match 'row_ids' and 'col_ids'
+    :return: dict containing the data reorganised as a MatrixDataset with one row per matrix
+        cell and the columns 'column_id', 'row_id', 'value', and 'id', an integer key
+    :rtype: dict[str, Any]
     """
     matrix_data = object_data.get(DATA, {}).get(DATA)
     if not matrix_data:
@@ -155,27 +200,44 @@ def convert_matrix(object_data: dict[str, Any]) -> dict[str, Any]:
         )
         raise ValueError(err_msg)
 
-    matrix_as_dicts = []
-    # Iterate through the data and create dictionaries
-    for i, column_id in enumerate(matrix_data["col_ids"]):
-        for j, row_id in enumerate(matrix_data["row_ids"]):
-            # Access the corresponding value from the nested list
-            value = matrix_data["values"][j][i]
-            # add in a generated ID
-            entry = {
-                "id": f"{column_id}___{row_id}___{value}",
-                "column_id": column_id,
-                "row_id": row_id,
-                "value": value,
-            }
-            matrix_as_dicts.append(entry)
+    # object arrays keep the original values (and their formatting in the generated IDs)
+    values = np.array(matrix_data["values"], dtype=object)
+    if values.shape != (len(matrix_data["row_ids"]), len(matrix_data["col_ids"])):
+        err_msg = (
+            f"{get_upa(object_data)}: 'data.data.values' does not match the dimensions "
+            "given by 'data.data.row_ids' and 'data.data.col_ids'"
+        )
+        raise ValueError(err_msg)
 
+    # flatten the matrix column by column
+    n_rows, n_cols = values.shape
     return {
-        FN: {"id", "column_id", "row_id", "value"},
-        DL: matrix_as_dicts,
+        DATASET: MatrixDataset(
+            {
+                # cells are keyed by their position in the flattened matrix
+                "id": np.arange(n_rows * n_cols),
+                "column_id": np.repeat(to_column(matrix_data["col_ids"]), n_rows),
+                "row_id": np.tile(to_column(matrix_data["row_ids"]), n_cols),
+                "value": values.T.ravel().tolist(),
+            }
+        ),
     }
 
 
+# converters for each supported data type, with the paths in the workspace object that each
+# converter reads; only these paths are fetched from the workspace
+CONVERTERS = {
+    "SampleSet": {
+        "converter": convert_samples,
+        "included": ["/samples"],
+    },
+    "Matrix": {
+        "converter": convert_matrix,
+        "included": ["/data/row_ids", "/data/col_ids", "/data/values"],
+    },
+}
+
+
 def convert_list_of_dicts_to_list_of_lists(
     dict_list: list[dict[str, Any]], fieldnames: set[str] | list[str]
 ) -> list[list[Any]]:
@@ -215,32 +277,26 @@ def json_to_csv(json_file: str) -> None:
     # Define the CSV file name (same as JSON but with .csv extension)
     csv_file = json_file.rsplit(".", 1)[0] + ".csv"
 
-    return save_as_csv(data, csv_file)
+    return save_as_csv({DATASET: Dataset.from_records(data[DL], data[FN])}, csv_file)
 
 
 def save_as_csv(data: dict[str, Any], csv_file: str) -> str:
-    """Save a (possibly unparsed) workspace object to a CSV file.
+    """Save a converted workspace object to a CSV file.
 
-    :param data: workspace object
+    :param data: converted workspace object, containing a Dataset
     :type data: dict[str, Any]
     :param csv_file: full path of the CSV file
     :type csv_file: str
-    :raises ValueError: if the WS object is not in a known format
+    :raises ValueError: if the dataset is empty
     :return: full path of the new file
     :rtype: str
     """
-    if not data[DL] or not data[FN]:
-        err_msg = "Must supply both a list of dictionaries and fieldnames for conversion to CSV"
+    dataset: Dataset = data[DATASET]
+    if not len(dataset) or not dataset.fieldnames:
+        err_msg = "Must supply a dataset with at least one row and one field for conversion to CSV"
         raise ValueError(err_msg)
 
-    fieldnames = resort_fieldnames(data[FN])
-
     path_to_file = csv_file if os.path.isabs(csv_file) else os.path.abspath(csv_file)
-
-    # Write the data to a CSV file
-    with open(path_to_file, "w", newline="") as file:
-        writer = csv.DictWriter(file, fieldnames=fieldnames, restval=None)
-        writer.writeheader()
-        writer.writerows(data[DL])
+    dataset.write_csv(path_to_file)
 
     return path_to_file
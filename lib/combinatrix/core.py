@@ -1,30 +1,49 @@
 """Fetches, combines, masticates, and spits out the appropriate data structure."""
 import datetime
+import logging
 import os
 import time
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from combinatrix.combination_harvester import combine_data
 from combinatrix.constants import (
+    DATASET,
+    DEFAULT_COMBINATION_CHUNK_ROWS,
+    DEFAULT_JOIN_MEMORY_BUDGET_MB,
+    DEFAULT_JOIN_WORKERS,
+    DEFAULT_MAX_COMBINATION_ROWS,
     INFO,
     JOIN_LIST,
     KEYS,
+    MB,
+    PLAN,
+    PLAN_CHUNKED,
     REF,
     REFS,
 )
-from combinatrix.converter import (
-    convert_data,
-    save_as_csv,
-)
-from combinatrix.fetcher import DataFetcher
+from combinatrix.join_planner import format_join_plan
 from combinatrix.param_checker import check_params
-from combinatrix.renderer import render_template
-from combinatrix.util import create_output_dir, get_data_type, log_this, remove_special_chars
-from installed_clients.KBaseReportClient import KBaseReport
+from combinatrix.util import (
+    create_output_dir,
+    get_config_int,
+    get_data_type,
+    get_upa,
+    iter_in_background,
+    log_this,
+    remove_special_chars,
+    resolve_path,
+)
+
+# The modules for each stage of a run pull in heavy dependencies (pandas, numpy, requests,
+# jinja2, and the workspace client), so they are imported by the stage that needs them rather
+# than when the job starts.
+if TYPE_CHECKING:
+    from combinatrix.fetcher import DataFetcher
 
 J2_SUFFIX = ".j2"
 REPORT_FILE_NAME = "report.html"
 
+logger = logging.getLogger(__name__)
+
 class AppCore:
     """Class for fetching and combining datasets."""
 
@@ -49,6 +68,103 @@ class AppCore:
         self.context = context
         self.callback_url = callback_url
 
+    def fetch_and_convert(
+        self: "AppCore",
+        fetcher: "DataFetcher",
+        preflight: dict[str, Any],
+        output_dir: str,
+        timing: dict[str, str],
+    ) -> dict[str, Any]:
+        """Fetch, convert, and save each dataset to a CSV file.
+
+        Each dataset is converted and saved as soon as it has been fetched, while the remaining
+        datasets are still being fetched in the background. If the datasets are to be fetched
+        in chunks, only one dataset is fetched ahead of the one being processed.
+
+        The following timings are added to `timing`: `fetch_objs`, the time until the last
+        dataset arrived; `convert` and `save_csv`, the total time spent converting and saving
+        datasets. As the stages overlap, these may add up to more than the elapsed time.
+
+        :param self: class instance
+        :type self: AppCore
+        :param fetcher: data fetcher
+        :type fetcher: DataFetcher
+        :param preflight: output of `DataFetcher.preflight` for the datasets to fetch
+        :type preflight: dict[str, Any]
+        :param output_dir: directory to save the CSV files in
+        :type output_dir: str
+        :param timing: timings for the different stages of the run; updated in place
+        :type timing: dict[str, str]
+        :raises RuntimeError: if there are errors in converting the data
+        :return: converted data, indexed by UPA, in the same order as the preflight info
+        :rtype: dict[str, Any]
+        """
+        from combinatrix.converter import convert_ws_object, save_as_csv
+
+        ref_list = list(preflight[INFO])
+        objects = iter_in_background(
+            fetcher.iter_objects_by_ref(ref_list, preflight),
+            max_pending=1 if preflight[PLAN] == PLAN_CHUNKED else 0,
+        )
+
+        start_time = time.time()
+        stage_time = {"fetch_objs": 0.0, "convert": 0.0, "save_csv": 0.0}
+        converted = {}
+        errors = {}
+        for ref, object_data in objects:
+            stage_time["fetch_objs"] = time.time() - start_time
+
+            convert_start = time.time()
+            try:
+                converted[ref] = {**object_data, **convert_ws_object(object_data)}
+            except (ValueError, RuntimeError) as e:
+                errors[ref] = e.args[0]
+                continue
+            finally:
+                stage_time["convert"] += time.time() - convert_start
+
+            save_start = time.time()
+            csv_file_name = f"{remove_special_chars(get_upa(converted[ref]))}.csv"
+            save_as_csv(converted[ref], os.path.join(output_dir, csv_file_name))
+            converted[ref]["csv_file"] = csv_file_name
+            stage_time["save_csv"] += time.time() - save_start
+
+        timing.update({stage: f"{t:.2f} seconds" for stage, t in stage_time.items()})
+
+        if errors:
+            big_error_message = "\n".join(
+                [
+                    "Errors running data conversion for the Combinatrix:",
+                    *[errors[ref] for ref in ref_list if ref in errors],
+                ]
+            )
+            raise RuntimeError(big_error_message)
+
+        return {get_upa(converted[ref]): converted[ref] for ref in ref_list}
+
+    def get_max_combination_rows(self: "AppCore", total: int) -> int:
+        """Get the maximum number of combinations to save, warning if the total is over it.
+
+        The combined dataset can be far larger than the datasets, so only so much of it is saved.
+
+        :param total: number of combinations in the combined dataset
+        :type total: int
+        :return: maximum number of combinations to save
+        :rtype: int
+        """
+        max_rows = get_config_int(
+            self.config, "max-combination-rows", DEFAULT_MAX_COMBINATION_ROWS, minimum=0
+        )
+        if total > max_rows:
+            logger.warning(
+                "the combined dataset has %d combinations, more than the maximum of %d; "
+                "only the first %d are saved",
+                total,
+                max_rows,
+                max_rows,
+            )
+        return max_rows
+
     def run(
         self: "AppCore",
         params: dict[str, Any],
@@ -62,49 +178,112 @@ class AppCore:
         :return: KBase report name and reference
         :rtype: dict[str, Any]
         """
+        from combinatrix.fetcher import DataFetcher
+        from combinatrix.http_session import get_session
+        from installed_clients.KBaseReportClient import KBaseReport
+
         fetcher = DataFetcher(self.config, self.context)
-        reporter = KBaseReport(self.callback_url)
+        reporter = KBaseReport(self.callback_url, session=get_session(self.config))
 
         timing = {}
         # Start timer for parameter validation
         start_time = time.time()
         join_params = check_params(params)
-        # End timer and print duration
+        # End timer and log duration
         timing["check_params"] = f"{time.time() - start_time:.2f} seconds"
-        print(f"Check params: {timing["check_params"]}")
+        logger.info("check params: %s", timing["check_params"])
 
-        # Start timer for data fetching
+        # Start timer for checking the datasets and planning the fetch
         start_time = time.time()
-        fetched_data = fetcher.fetch_objects_by_ref(sorted(join_params[REFS]))
-        # End timer and print duration
-        timing["fetch_objs"] = f"{time.time() - start_time:.2f} seconds"
-        print(f"fetch objects: {timing["fetch_objs"]}")
+        preflight = fetcher.preflight(sorted(join_params[REFS]))
+        # End timer and log duration
+        timing["preflight"] = f"{time.time() - start_time:.2f} seconds"
+        logger.info("preflight: %s; fetch plan: %s", timing["preflight"], preflight[PLAN])
+
+        output_dir = create_output_dir(self.config)
 
-        # Start timer for data conversion
+        # Start timer for the fetch, convert, and save stages, which run concurrently
         start_time = time.time()
-        standardised_data = convert_data(fetched_data)
-        # End timer and print duration
-        timing["convert"] = f"{time.time() - start_time:.2f} seconds"
-        print(f"convert data: {timing["convert"]}")
+        standardised_data = self.fetch_and_convert(fetcher, preflight, output_dir, timing)
+        # End timer and log durations
+        timing["fetch_convert_save"] = f"{time.time() - start_time:.2f} seconds"
+        logger.info("fetch objects: %s", timing["fetch_objs"])
+        logger.info("convert data: %s", timing["convert"])
+        logger.info("save CSV files: %s", timing["save_csv"])
+        logger.info("fetch, convert, and save data: %s", timing["fetch_convert_save"])
+
+        from combinatrix.combination_harvester import (
+            combine_data,
+            count_combinations,
+            get_dataset_order,
+            plan_combinations,
+            write_combinations,
+        )
 
         # Start timer for data combining
         start_time = time.time()
-        resultset = combine_data(join_params, standardised_data)
-        # End timer and print duration
+        resultset = combine_data(
+            join_params,
+            standardised_data,
+            # 0 turns the on-disk join off
+            memory_budget=get_config_int(
+                self.config, "join-memory-budget-mb", DEFAULT_JOIN_MEMORY_BUDGET_MB, minimum=0
+            )
+            * MB
+            or None,
+            scratch_dir=resolve_path(self.config["scratch"]),
+            # there is no benefit to having more processes than CPUs
+            n_workers=min(
+                get_config_int(self.config, "join-workers", DEFAULT_JOIN_WORKERS),
+                os.cpu_count() or 1,
+            ),
+            data_size=sum(info["size"] for info in preflight[INFO].values()),
+        )
+        # End timer and log duration
         timing["combine"] = f"{time.time() - start_time:.2f} seconds"
-        print(f"combine data: {timing["combine"]}")
+        logger.info("combine data: %s", timing["combine"])
 
-        output_dir = create_output_dir(self.config)
+        start_time = time.time()
+        combinations = count_combinations(join_params, standardised_data)
+        timing["count"] = f"{time.time() - start_time:.2f} seconds"
+        logger.info(
+            "count combinations: %s; total: %d", timing["count"], combinations["total"]
+        )
 
-        for ref in standardised_data:
-            csv_file_name = f"{remove_special_chars(ref)}.csv"
-            outfile = os.path.join(output_dir, csv_file_name)
-            save_as_csv(standardised_data[ref], outfile)
-            standardised_data[ref]["csv_file"] = csv_file_name
+        start_time = time.time()
+        join_plan = plan_combinations(join_params, standardised_data)
+        timing["plan"] = f"{time.time() - start_time:.2f} seconds"
+        logger.info("plan joins: %s\n%s", timing["plan"], format_join_plan(join_plan))
+
+        max_rows = self.get_max_combination_rows(combinations["total"])
+
+        start_time = time.time()
+        combination_files = write_combinations(
+            join_params,
+            standardised_data,
+            output_dir,
+            get_config_int(
+                self.config, "combination-chunk-rows", DEFAULT_COMBINATION_CHUNK_ROWS
+            ),
+            join_plan,
+            max_rows,
+        )
+        timing["save_combinations"] = f"{time.time() - start_time:.2f} seconds"
+        logger.info("save combinations: %s", timing["save_combinations"])
 
         # export data for displaying in datatables
         template_data = {
             "join_params": join_params[JOIN_LIST],
+            # number of rows produced by each join and by combining all the datasets
+            "combinations": combinations,
+            # order in which the combinations were generated, with the estimated size of each step
+            "join_plan": join_plan,
+            # CSV files holding the combined dataset
+            "combination_files": combination_files,
+            # number of combinations in the files; less than the total if it is over the limit
+            "saved_combinations": min(combinations["total"], max_rows),
+            # order of the datasets in the combined dataset
+            "dataset_order": get_dataset_order(join_params[JOIN_LIST]),
             "object_data": {
                 ref: {
                     "info": standardised_data[ref][INFO],
@@ -120,8 +299,8 @@ class AppCore:
                             else None
                         ),
                     },
-                    # set
-                    "combined": list(resultset[ref]),
+                    # IDs of the items that take part in the combined dataset
+                    "combined": standardised_data[ref][DATASET].format_ids(resultset[ref]),
                 }
                 for ref in standardised_data
             },
@@ -137,6 +316,8 @@ class AppCore:
                 **{ref: standardised_data[ref]["csv_file"] for ref in standardised_data},
             }
 
+        from combinatrix.renderer import render_template
+
         template_output_path = os.path.join(output_dir, REPORT_FILE_NAME)
         render_template(template_output_path, template_data)
 
@@ -0,0 +1,269 @@
+"""Columnar storage for the tabular datasets produced by the converters."""
+
+import csv
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+import numpy as np
+from combinatrix.util import resort_fieldnames
+from pandas import DataFrame
+
+# python types that can be stored in a typed (non-object) numpy array without losing information
+TYPED_COLUMN_DTYPES = {
+    bool: np.bool_,
+    int: np.int64,
+    float: np.float64,
+}
+
+
+def to_column(values: Iterable[Any]) -> np.ndarray:
+    """Convert a sequence of values to a one-dimensional numpy array.
+
+    Columns where every value is a bool, every value is an int, or every value is a float are
+    stored in a typed array; anything else, including columns with missing (None) values, is
+    stored in an object array so that the values are unchanged.
+
+    :param values: values in the column
+    :type values: Iterable[Any]
+    :return: column array
+    :rtype: np.ndarray
+    """
+    if isinstance(values, np.ndarray) and values.ndim == 1:
+        return values
+
+    values = list(values)
+    value_types = set(map(type, values))
+    if len(value_types) == 1:
+        dtype = TYPED_COLUMN_DTYPES.get(value_types.pop())
+        if dtype is not None:
+            try:
+                return np.array(values, dtype=dtype)
+            except OverflowError:
+                # ints too large for int64
+                pass
+
+    # fromiter stores each value as-is, even if it is itself a list
+    return np.fromiter(values, dtype=object, count=len(values))
+
+
+class Dataset:
+    """Table of data stored column by column, with each column held in a numpy array.
+
+    Columns are kept in the order in which they should be displayed, i.e. with `id` and `name`
+    first and the remaining columns in alphabetical order.
+    """
+
+    def __init__(self: "Dataset", columns: dict[str, Iterable[Any]]) -> None:
+        """Initialise an instance of the class.
+
+        :param self: class instance
+        :type self: Dataset
+        :param columns: column values, indexed by column name
+        :type columns: dict[str, Iterable[Any]]
+        :raises ValueError: if the columns are not all the same length
+        """
+        converted = {name: to_column(values) for name, values in columns.items()}
+        self.columns = {name: converted[name] for name in resort_fieldnames(converted)}
+
+        column_lengths = {len(column) for column in self.columns.values()}
+        if len(column_lengths) > 1:
+            err_msg = "All columns in a dataset must be the same length"
+            raise ValueError(err_msg)
+        self.n_rows = column_lengths.pop() if column_lengths else 0
+
+    @classmethod
+    def from_records(
+        cls: type["Dataset"],
+        records: list[dict[str, Any]],
+        fieldnames: Iterable[str] | None = None,
+    ) -> "Dataset":
+        """Create a dataset from a list of dicts.
+
+        Fields that are missing from a record are given the value None.
+
+        :param records: data, one dict per row
+        :type records: list[dict[str, Any]]
+        :param fieldnames: all fieldnames present in the records; if not supplied, the
+            fieldnames are collected from the records
+        :type fieldnames: Iterable[str] | None
+        :return: new dataset
+        :rtype: Dataset
+        """
+        if fieldnames is None:
+            fieldnames = {field for record in records for field in record}
+        return cls({field: [record.get(field) for record in records] for field in fieldnames})
+
+    @property
+    def fieldnames(self: "Dataset") -> list[str]:
+        """Names of the columns in the dataset, in display order.
+
+        :param self: class instance
+        :type self: Dataset
+        :return: column names
+        :rtype: list[str]
+        """
+        return list(self.columns)
+
+    def __len__(self: "Dataset") -> int:
+        """Number of rows in the dataset.
+
+        :param self: class instance
+        :type self: Dataset
+        :return: number of rows
+        :rtype: int
+        """
+        return self.n_rows
+
+    def __contains__(self: "Dataset", column_name: object) -> bool:
+        """Check whether the dataset has a column.
+
+        :param self: class instance
+        :type self: Dataset
+        :param column_name: name of the column
+        :type column_name: object
+        :return: True if the column exists
+        :rtype: bool
+        """
+        return column_name in self.columns
+
+    def __getitem__(self: "Dataset", column_name: str) -> np.ndarray:
+        """Retrieve a column.
+
+        :param self: class instance
+        :type self: Dataset
+        :param column_name: name of the column
+        :type column_name: str
+        :return: column values
+        :rtype: np.ndarray
+        """
+        return self.columns[column_name]
+
+    def __eq__(self: "Dataset", other: object) -> bool:
+        """Check whether two datasets are of the same type and have the same columns and values.
+
+        :param self: class instance
+        :type self: Dataset
+        :param other: object to compare against
+        :type other: object
+        :return: True if the datasets are equal
+        :rtype: bool
+        """
+        if not isinstance(other, Dataset):
+            return NotImplemented
+        return type(self) is type(other) and self.fieldnames == other.fieldnames and all(
+            self.columns[name].tolist() == other.columns[name].tolist() for name in self.columns
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self: "Dataset") -> str:
+        """Summarise the dataset.
+
+        :param self: class instance
+        :type self: Dataset
+        :return: string representation
+        :rtype: str
+        """
+        return f"Dataset({self.n_rows} rows; columns: {', '.join(self.fieldnames)})"
+
+    def format_ids(self: "Dataset", keys: Iterable[Any]) -> list[Any]:
+        """Convert values from the `id` column into the IDs shown in CSV files and the report.
+
+        :param self: class instance
+        :type self: Dataset
+        :param keys: values from the `id` column
+        :type keys: Iterable[Any]
+        :return: IDs for display
+        :rtype: list[Any]
+        """
+        # tolist converts numpy scalars back to the equivalent python types
+        return keys.tolist() if isinstance(keys, np.ndarray) else list(keys)
+
+    def iter_rows(self: "Dataset") -> Iterator[tuple[Any, ...]]:
+        """Iterate over the rows of the dataset, with values in column order.
+
+        The `id` column contains the IDs for display, as generated by `format_ids`.
+
+        :param self: class instance
+        :type self: Dataset
+        :return: iterator over tuples of the values in each row
+        :rtype: Iterator[tuple[Any, ...]]
+        """
+        return zip(
+            *[
+                self.format_ids(column) if name == "id" else column.tolist()
+                for name, column in self.columns.items()
+            ],
+            strict=True,
+        )
+
+    def to_records(self: "Dataset") -> list[dict[str, Any]]:
+        """Convert the dataset into a list of dicts, one per row.
+
+        :param self: class instance
+        :type self: Dataset
+        :return: dataset as a list of dicts
+        :rtype: list[dict[str, Any]]
+        """
+        return [dict(zip(self.columns, row, strict=True)) for row in self.iter_rows()]
+
+    def to_dataframe(
+        self: "Dataset", fieldnames: Iterable[str] | None = None
+    ) -> DataFrame:
+        """Create a pandas DataFrame from the dataset, without copying the column arrays.
+
+        :param self: class instance
+        :type self: Dataset
+        :param fieldnames: columns to include in the dataframe; defaults to all columns
+        :type fieldnames: Iterable[str] | None
+        :return: dataframe with the requested columns
+        :rtype: DataFrame
+        """
+        if fieldnames is None:
+            return DataFrame(self.columns, copy=False)
+        return DataFrame({name: self.columns[name] for name in fieldnames}, copy=False)
+
+    def write_csv(self: "Dataset", path_to_file: str) -> None:
+        """Write the dataset to a CSV file, with a header row.
+
+        Missing (None) values are written as empty strings.
+
+        :param self: class instance
+        :type self: Dataset
+        :param path_to_file: full path of the CSV file
+        :type path_to_file: str
+        """
+        with open(path_to_file, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(self.fieldnames)
+            writer.writerows(self.iter_rows())
+
+
+class MatrixDataset(Dataset):
+    """Dataset holding the cells of a matrix, one row per cell.
+
+    Cells are identified by an integer surrogate key, their position in the dataset, which is
+    stored in the `id` column. IDs in the form `{column_id}___{row_id}___{value}` are only
+    generated when the cells are displayed.
+    """
+
+    def format_ids(self: "MatrixDataset", keys: Iterable[Any]) -> list[str]:
+        """Convert surrogate keys into IDs in the form `{column_id}___{row_id}___{value}`.
+
+        :param self: class instance
+        :type self: MatrixDataset
+        :param keys: surrogate keys of the cells
+        :type keys: Iterable[Any]
+        :return: IDs for display
+        :rtype: list[str]
+        """
+        positions = np.asarray(keys if isinstance(keys, np.ndarray) else list(keys), dtype=np.int64)
+        return [
+            f"{column_id}___{row_id}___{value}"
+            for column_id, row_id, value in zip(
+                self["column_id"][positions].tolist(),
+                self["row_id"][positions].tolist(),
+                self["value"][positions].tolist(),
+                strict=True,
+            )
+        ]
@@ -1,15 +1,79 @@
 """Fetch data from various locations."""
 
+import itertools
 import json
+import os
 import uuid
+from collections.abc import Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Any
 
+import ijson
 import requests
-from combinatrix.constants import DATA
-from combinatrix.util import get_data_type, get_upa
+from combinatrix.cache import DiskCache, get_cache_dir, is_versioned_upa
+from combinatrix.constants import (
+    DATA,
+    DEFAULT_CHUNKED_FETCH_THRESHOLD_MB,
+    DEFAULT_MAX_OBJECT_SIZE_MB,
+    DEFAULT_OBJECT_CACHE_MAX_MB,
+    DEFAULT_SAMPLE_BATCH_SIZE,
+    DEFAULT_SAMPLE_CACHE_MAX_MB,
+    DEFAULT_SAMPLE_FETCH_WORKERS,
+    HTTP_TIMEOUT,
+    INFO,
+    MB,
+    PLAN,
+    PLAN_CHUNKED,
+    PLAN_IN_MEMORY,
+)
+from combinatrix.converter import get_converter_name, get_included_paths
+from combinatrix.http_session import get_session
+from combinatrix.util import get_config_int, get_data_type, get_upa, split_into_batches
 from installed_clients.WorkspaceClient import Workspace
 
 
+def get_object_cache_key(ref: str, included: list[str] | None) -> str:
+    """Generate the object cache key for a workspace object, or a subset of its paths.
+
+    :param ref: versioned KBase UPA
+    :type ref: str
+    :param included: paths fetched from the object, or None for the whole object
+    :type included: list[str] | None
+    :return: object cache key
+    :rtype: str
+    """
+    if not included:
+        return ref
+    return f"{ref}:{','.join(included)}"
+
+
+def get_sample_key(sample: dict[str, Any]) -> str:
+    """Generate a key that uniquely identifies a version of a sample.
+
+    :param sample: dict containing the sample ID and version
+    :type sample: dict[str, Any]
+    :return: sample key
+    :rtype: str
+    """
+    return f"{sample['id']}/{sample['version']}"
+
+
+def get_sample_cache_key(user_id: str, sample: dict[str, Any]) -> str:
+    """Generate the sample cache key for a version of a sample retrieved by a user.
+
+    Access to samples is controlled by the SampleService, so a cached sample is only returned
+    to the user who retrieved it.
+
+    :param user_id: KBase user ID
+    :type user_id: str
+    :param sample: dict containing the sample ID and version
+    :type sample: dict[str, Any]
+    :return: sample cache key
+    :rtype: str
+    """
+    return f"{user_id}:{get_sample_key(sample)}"
+
+
 class DataFetcher:
     """Class for fetching data from various places."""
 
@@ -29,11 +93,49 @@ class DataFetcher:
 
         self.workspace_url = f"{kbase_endpoint}/ws"
         self.sample_service_url = f"{kbase_endpoint}/sampleservice"
+        # pooled HTTP session shared by all clients in this process
+        self.session = get_session(config)
+        # maximum number of SampleService requests to run at the same time
+        self.sample_fetch_workers = get_config_int(
+            config, "sample-fetch-workers", DEFAULT_SAMPLE_FETCH_WORKERS
+        )
+        # maximum number of samples to request from the SampleService in one go
+        self.sample_batch_size = get_config_int(
+            config, "sample-batch-size", DEFAULT_SAMPLE_BATCH_SIZE
+        )
+        # objects larger than this are refused
+        self.max_object_size = (
+            get_config_int(config, "max-object-size-mb", DEFAULT_MAX_OBJECT_SIZE_MB) * MB
+        )
+        # if the objects add up to more than this, they are fetched one at a time
+        self.chunked_fetch_threshold = (
+            get_config_int(
+                config, "chunked-fetch-threshold-mb", DEFAULT_CHUNKED_FETCH_THRESHOLD_MB
+            )
+            * MB
+        )
+        # caches for workspace objects and samples; only enabled if a cache directory is set
+        self.object_cache = None
+        self.sample_cache = None
+        # the SampleService checks access to each sample, so cached samples are only returned
+        # to the user who retrieved them; the sample cache is not used if the user is unknown
+        self.user_id = context.get("user_id")
+        cache_dir = get_cache_dir(config)
+        if cache_dir:
+            self.object_cache = DiskCache(
+                os.path.join(cache_dir, "objects"),
+                get_config_int(config, "object-cache-max-mb", DEFAULT_OBJECT_CACHE_MAX_MB) * MB,
+            )
+        if cache_dir and self.user_id:
+            self.sample_cache = DiskCache(
+                os.path.join(cache_dir, "samples"),
+                get_config_int(config, "sample-cache-max-mb", DEFAULT_SAMPLE_CACHE_MAX_MB) * MB,
+            )
 
-    def fetch_samples(
+    def fetch_sample_batch(
         self: "DataFetcher", sample_list: list[dict[str, Any]]
     ) -> list[dict[str, Any]]:
-        """Retrieve sample data from the sample service.
+        """Retrieve a single batch of samples from the sample service in one request.
 
         :param self: class instance
         :type self: DataFetcher
@@ -58,8 +160,11 @@ class DataFetcher:
             "version": "1.1",
         }
 
-        resp = requests.post(
-            url=self.sample_service_url, headers=headers, data=json.dumps(payload)
+        resp = self.session.post(
+            url=self.sample_service_url,
+            headers=headers,
+            data=json.dumps(payload),
+            timeout=HTTP_TIMEOUT,
         )
         resp_json = resp.json()
         if resp_json.get("error"):
@@ -67,46 +172,360 @@ class DataFetcher:
             raise RuntimeError(err_msg)
         return resp_json["result"][0]
 
-    def fetch_objects_by_ref(
-        self: "DataFetcher", ref_list: list[str]
-    ) -> dict[str, Any]:
-        """Retrieve a list of objects.
+    def iter_ws_objects(
+        self: "DataFetcher", params: dict[str, Any]
+    ) -> Iterator[dict[str, Any] | None]:
+        """Retrieve objects from the workspace, yielding each one as soon as it has been decoded.
+
+        The response body is parsed incrementally from the network stream, rather than being read
+        into memory in full and then decoded, so the raw JSON for a large object is never held in
+        memory alongside its parsed form.
+
+        :param self: class instance
+        :type self: DataFetcher
+        :param params: parameters for `Workspace.get_objects2`
+        :type params: dict[str, Any]
+        :raises RuntimeError: if the workspace returns an error or an unexpected response
+        :yield: objects (or None, for objects that could not be retrieved), in the same order as
+            `params["objects"]`
+        :rtype: Iterator[dict[str, Any] | None]
+        """
+        headers = {"Authorization": self.token, "Content-Type": "application/json"}
+        payload = {
+            "method": "Workspace.get_objects2",
+            "id": str(uuid.uuid4()),
+            "params": [params],
+            "version": "1.1",
+        }
+
+        n_results = 0
+        with self.session.post(
+            url=self.workspace_url,
+            headers=headers,
+            data=json.dumps(payload),
+            stream=True,
+            timeout=HTTP_TIMEOUT,
+        ) as resp:
+            if not resp.ok:
+                # error responses are small enough to parse in one go
+                try:
+                    error = resp.json().get("error")
+                except ValueError:
+                    error = None
+                err_msg = f"Error from Workspace - {error or resp.text}"
+                raise RuntimeError(err_msg)
+
+            # undo any content encoding (e.g. gzip) before parsing
+            resp.raw.decode_content = True
+            try:
+                for result in ijson.items(resp.raw, "result.item.data.item", use_float=True):
+                    n_results += 1
+                    yield result
+            except ijson.JSONError as e:
+                err_msg = f"Error from Workspace - could not parse response: {e}"
+                raise RuntimeError(err_msg) from e
+
+        if n_results != len(params["objects"]):
+            err_msg = (
+                "Error from Workspace - expected "
+                f"{len(params['objects'])} objects, got {n_results}"
+            )
+            raise RuntimeError(err_msg)
+
+    def iter_objects_by_ref(
+        self: "DataFetcher", ref_list: list[str], preflight: dict[str, Any] | None = None
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Retrieve a list of objects, yielding each one as soon as it is complete.
+
+        SampleSets are yielded once their samples have been retrieved; the samples are fetched
+        in the background while the other objects are being fetched and processed.
 
         :param self: class instance
         :type self: DataFetcher
         :param ref_list: list of KBase UPAs to fetch
         :type ref_list: list[str]
-        :raises ValueError: if any of the results are not found
-        :return: _description_
+        :param preflight: output of `preflight` for `ref_list`; generated if not supplied
+        :type preflight: dict[str, Any] | None
+        :raises ValueError: if any of the objects are not found or cannot be processed
+        :raises RuntimeError: if the sample data for any SampleSets could not be retrieved
+        :yield: tuples of the input ref and the object, in the order that they become available
+        :rtype: Iterator[tuple[str, dict[str, Any]]]
+        """
+        with ThreadPoolExecutor(max_workers=self.sample_fetch_workers) as executor:
+            requested = {}
+            pending = {}
+            for ref, item in self.iter_ws_objects_by_ref(ref_list, preflight):
+                if "SampleSet" in get_data_type(item):
+                    pending[ref] = (item, self.request_samples(executor, item, requested))
+                else:
+                    yield ref, item
+
+            errors = {}
+            # only wait on the batches still running: `wait` returns at once if any of the
+            # futures that it is given have already finished
+            running = {
+                future
+                for _, sample_refs in pending.values()
+                for future, _ in sample_refs
+                if not future.done()
+            }
+            while pending:
+                if running:
+                    _, running = wait(running, return_when=FIRST_COMPLETED)
+                for ref in [r for r in pending if all(f.done() for f, _ in pending[r][1])]:
+                    item, sample_refs = pending.pop(ref)
+                    try:
+                        self.add_sample_data(item, sample_refs)
+                    except (RuntimeError, requests.RequestException) as e:
+                        errors[ref] = f"{get_upa(item)}: {e}"
+                        continue
+                    yield ref, item
+
+        if errors:
+            err_msg = "\n".join(
+                ["Errors retrieving sample data:", *[errors[r] for r in ref_list if r in errors]]
+            )
+            raise RuntimeError(err_msg)
+
+    def preflight(self: "DataFetcher", ref_list: list[str]) -> dict[str, Any]:
+        """Check that a list of objects can be processed, and plan how to fetch them.
+
+        Only the object info is retrieved, so problems are found before any data is transferred.
+        Objects that do not exist, that the user cannot access, that have no converter, or that
+        are larger than `max_object_size` are rejected. If the total size of the objects is
+        larger than `chunked_fetch_threshold`, the objects are fetched one at a time.
+
+        :param self: class instance
+        :type self: DataFetcher
+        :param ref_list: list of KBase UPAs to fetch
+        :type ref_list: list[str]
+        :raises ValueError: if any of the objects are not found or cannot be processed
+        :return: dict with keys INFO, the object info indexed by ref, and PLAN, the fetch plan
         :rtype: dict[str, Any]
         """
-        ws_client = Workspace(self.workspace_url, token=self.token)
+        ws_client = Workspace(self.workspace_url, token=self.token, session=self.session)
 
-        # fetch the data sources from the workspace
         # results are in the same order as the input
-        results = ws_client.get_objects2(
+        infos = ws_client.get_object_info3(
             {
                 "objects": [{"ref": ref} for ref in ref_list],
                 "ignoreErrors": 1,
                 "infostruct": 1,
-                "skip_external_system_updates": 1,
             }
-        )[DATA]
+        )["infostructs"]
 
         # check for missing results
-        if not all(results):
-            not_found = [
-                item[0] for item in zip(ref_list, results, strict=True) if not item[1]
-            ]
+        if not all(infos):
+            not_found = [item[0] for item in zip(ref_list, infos, strict=True) if not item[1]]
+            err_msg = f"The following KBase objects could not be retrieved: {', '.join(not_found)}"
+            raise ValueError(err_msg)
+
+        infos = dict(zip(ref_list, infos, strict=True))
+        errors = []
+        for info in infos.values():
+            upa = get_upa({INFO: info})
+            if get_converter_name(info["type"]) is None:
+                errors.append(f"{upa}: no dedicated converter found for {info['type']}")
+            if info["size"] > self.max_object_size:
+                errors.append(
+                    f"{upa}: object size ({info['size'] / MB:.1f} MB) is larger than the "
+                    f"maximum of {self.max_object_size // MB} MB"
+                )
+        if errors:
+            err_msg = "\n".join(
+                ["The following KBase objects cannot be processed by the Combinatrix:", *errors]
+            )
+            raise ValueError(err_msg)
+
+        total_size = sum(info["size"] for info in infos.values())
+        plan = PLAN_CHUNKED if total_size > self.chunked_fetch_threshold else PLAN_IN_MEMORY
+        return {INFO: infos, PLAN: plan}
+
+    def iter_ws_objects_by_ref(
+        self: "DataFetcher", ref_list: list[str], preflight: dict[str, Any] | None = None
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Retrieve a list of objects from the workspace or the object cache.
+
+        Only the parts of each object that the appropriate converter uses are fetched from the
+        workspace.
+
+        :param self: class instance
+        :type self: DataFetcher
+        :param ref_list: list of KBase UPAs to fetch
+        :type ref_list: list[str]
+        :param preflight: output of `preflight` for `ref_list`; generated if not supplied
+        :type preflight: dict[str, Any] | None
+        :raises ValueError: if any of the objects are not found or cannot be processed
+        :yield: tuples of the input ref and the object; cached objects come first
+        :rtype: Iterator[tuple[str, dict[str, Any]]]
+        """
+        if preflight is None:
+            preflight = self.preflight(ref_list)
+        infos = preflight[INFO]
+        included = {ref: get_included_paths(infos[ref]["type"]) for ref in ref_list}
+
+        cached = self.fetch_cached_objects(infos, included) if self.object_cache else {}
+        yield from cached.items()
+
+        refs_to_fetch = [ref for ref in ref_list if ref not in cached]
+        if not refs_to_fetch:
+            return
+
+        objects = [
+            {"ref": ref, "included": included[ref]} if included[ref] else {"ref": ref}
+            for ref in refs_to_fetch
+        ]
+        # fetch the data sources from the workspace, either all at once or one at a time
+        batches = [objects] if preflight[PLAN] == PLAN_IN_MEMORY else [[obj] for obj in objects]
+        results = itertools.chain.from_iterable(
+            self.iter_ws_objects(
+                {
+                    "objects": batch,
+                    "ignoreErrors": 1,
+                    "infostruct": 1,
+                    "skip_external_system_updates": 1,
+                }
+            )
+            for batch in batches
+        )
+
+        # objects can be deleted or made private after the preflight check
+        not_found = []
+        # `results` comes first so that it runs to completion, closing the response and checking
+        # the number of results
+        for result, ref in zip(results, refs_to_fetch, strict=True):
+            if not result:
+                not_found.append(ref)
+                continue
+            if self.object_cache and is_versioned_upa(ref):
+                self.object_cache.put(get_object_cache_key(ref, included[ref]), result[DATA])
+            yield ref, result
+
+        if not_found:
             err_msg = f"The following KBase objects could not be retrieved: {', '.join(not_found)}"
             raise ValueError(err_msg)
 
-        output = {}
-        for item in results:
-            # check for any samplesets that need to be populated
-            if "SampleSet" in get_data_type(item):
-                item[DATA]["sample_data"] = self.fetch_samples(item[DATA]["samples"])
-            # store in a dict indexed by UPA
-            output[get_upa(item)] = item  # {INFO: item[INFO], DATA: item[DATA]}
+    def fetch_cached_objects(
+        self: "DataFetcher", infos: dict[str, Any], included: dict[str, list[str] | None]
+    ) -> dict[str, Any]:
+        """Retrieve objects from the object cache.
+
+        Only objects with a fully-specified UPA are cached. The object info comes from the
+        workspace, rather than the cache, as retrieving it confirms that the user has
+        permission to view the object.
+
+        :param self: class instance
+        :type self: DataFetcher
+        :param infos: object info for each of the objects to fetch, indexed by ref
+        :type infos: dict[str, Any]
+        :param included: paths to fetch from each object (None for the whole object), by ref
+        :type included: dict[str, list[str] | None]
+        :return: cached objects, indexed by the input ref
+        :rtype: dict[str, Any]
+        """
+        cached = {}
+        for ref, info in infos.items():
+            if not is_versioned_upa(ref):
+                continue
+            data = self.object_cache.get(get_object_cache_key(ref, included[ref]))
+            if data is not None:
+                cached[ref] = {INFO: info, DATA: data}
+        return cached
+
+    def request_samples(
+        self: "DataFetcher",
+        executor: ThreadPoolExecutor,
+        sampleset: dict[str, Any],
+        requested: dict[str, tuple[Future, int]],
+    ) -> list[tuple[Future, int]]:
+        """Start fetching the samples in a SampleSet.
+
+        Sample versions are immutable, so each sample is only requested once, however many
+        SampleSets it appears in, and samples that the user has already retrieved, and that are
+        in the sample cache, are not requested at all.
+        The remaining samples are split into batches of at most `sample_batch_size` samples,
+        which are submitted to `executor`.
+
+        :param self: class instance
+        :type self: DataFetcher
+        :param executor: executor for running SampleService requests
+        :type executor: ThreadPoolExecutor
+        :param sampleset: SampleSet workspace object
+        :type sampleset: dict[str, Any]
+        :param requested: future for the batch containing each sample already requested, and
+            the position of the sample in the batch, indexed by sample key; updated in place
+        :type requested: dict[str, tuple[Future, int]]
+        :return: batch future and position for each sample in the SampleSet
+        :rtype: list[tuple[Future, int]]
+        """
+        to_fetch = []
+        for sample in sampleset[DATA]["samples"]:
+            key = get_sample_key(sample)
+            if key in requested:
+                continue
+            sample_data = (
+                self.sample_cache.get(get_sample_cache_key(self.user_id, sample))
+                if self.sample_cache
+                else None
+            )
+            if sample_data is None:
+                to_fetch.append(sample)
+                continue
+            future = Future()
+            future.set_result([sample_data])
+            requested[key] = (future, 0)
+
+        for batch in split_into_batches(to_fetch, self.sample_batch_size):
+            future = executor.submit(self.fetch_and_cache_sample_batch, batch)
+            for position, sample in enumerate(batch):
+                requested[get_sample_key(sample)] = (future, position)
+
+        return [requested[get_sample_key(sample)] for sample in sampleset[DATA]["samples"]]
+
+    def fetch_and_cache_sample_batch(
+        self: "DataFetcher", sample_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Retrieve a batch of samples from the sample service and add them to the sample cache.
 
-        return output
+        :param self: class instance
+        :type self: DataFetcher
+        :param sample_list: list of dicts containing sample IDs and version
+        :type sample_list: list[dict[str, Any]]
+        :raises RuntimeError: if there are any issues with fetching from the Sample Service
+        :return: list containing data from the Sample Service
+        :rtype: list[dict[str, Any]]
+        """
+        sample_data = self.fetch_sample_batch(sample_list)
+        # results are in the same order as the request
+        if len(sample_data) != len(sample_list):
+            err_msg = (
+                f"Error from SampleService - expected {len(sample_list)} samples, "
+                f"got {len(sample_data)}"
+            )
+            raise RuntimeError(err_msg)
+
+        if self.sample_cache:
+            self.sample_cache.put_many(
+                {
+                    get_sample_cache_key(self.user_id, sample): data
+                    for sample, data in zip(sample_list, sample_data, strict=True)
+                }
+            )
+        return sample_data
+
+    def add_sample_data(
+        self: "DataFetcher", sampleset: dict[str, Any], sample_refs: list[tuple[Future, int]]
+    ) -> None:
+        """Add the results of the sample requests for a SampleSet to the SampleSet.
+
+        :param self: class instance
+        :type self: DataFetcher
+        :param sampleset: SampleSet workspace object
+        :type sampleset: dict[str, Any]
+        :param sample_refs: batch future and position for each sample in the SampleSet
+        :type sample_refs: list[tuple[Future, int]]
+        :raises RuntimeError: if any of the samples could not be retrieved
+        """
+        sampleset[DATA]["sample_data"] = [
+            future.result()[position] for future, position in sample_refs
+        ]
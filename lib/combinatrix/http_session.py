@@ -0,0 +1,85 @@
+"""Shared, pooled HTTP session for all requests to KBase services."""
+
+import os
+import threading
+from typing import Any
+
+import requests
+from combinatrix.constants import (
+    DEFAULT_HTTP_MAX_RETRIES,
+    DEFAULT_HTTP_POOL_SIZE,
+    HTTP_RETRY_BACKOFF_FACTOR,
+)
+from combinatrix.util import get_config_int
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+_session: requests.Session | None = None
+# PID of the process that created `_session`; sessions must not be shared across forks
+_session_pid: int | None = None
+_session_lock = threading.Lock()
+
+
+def create_session(config: dict[str, Any]) -> requests.Session:
+    """Create a new HTTP session with a keep-alive connection pool and retry policy.
+
+    Only connection errors are retried, with an exponential backoff. KBase services use JSON-RPC
+    over POST, and some calls, such as saving objects or creating reports, are not idempotent;
+    a request that reached the server is never sent again, even after a gateway error (502, 503,
+    504) or a timeout, as the call may already have taken effect.
+
+    :param config: combinatrix config
+    :type config: dict[str, Any]
+    :return: configured session
+    :rtype: requests.Session
+    """
+    pool_size = get_config_int(config, "http-pool-size", DEFAULT_HTTP_POOL_SIZE)
+    max_retries = get_config_int(
+        config, "http-max-retries", DEFAULT_HTTP_MAX_RETRIES, minimum=0
+    )
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,
+        status=0,
+        backoff_factor=HTTP_RETRY_BACKOFF_FACTOR,
+        # hand the final response back so that JSON-RPC errors can be parsed as usual
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(config: dict[str, Any]) -> requests.Session:
+    """Retrieve the process-wide HTTP session, creating it on first use.
+
+    The session holds no credentials, so it can be shared between requests made on behalf of
+    different users; each client supplies its own auth headers.
+
+    :param config: combinatrix config, used if the session has to be created
+    :type config: dict[str, Any]
+    :return: shared session
+    :rtype: requests.Session
+    """
+    global _session, _session_pid  # noqa: PLW0603
+
+    with _session_lock:
+        if _session is None or _session_pid != os.getpid():
+            _session = create_session(config)
+            _session_pid = os.getpid()
+        return _session
+
+
+def reset_session() -> None:
+    """Close the process-wide HTTP session; a new one will be created on the next request."""
+    global _session, _session_pid  # noqa: PLW0603
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
@@ -0,0 +1,128 @@
+"""Undirected graph of the joins between datasets, with the few algorithms the param checker needs."""
+
+from collections import deque
+from collections.abc import Hashable, Iterator
+
+
+class JoinGraph:
+    """Undirected graph without parallel edges or self-loops.
+
+    Nodes and the neighbours of each node are kept in the order in which they were added, and
+    all traversals follow that order, so results are deterministic and ties are broken in
+    favour of the earliest-discovered node.
+    """
+
+    def __init__(self: "JoinGraph") -> None:
+        """Initialise an instance of the class.
+
+        :param self: class instance
+        :type self: JoinGraph
+        """
+        # the keys of each dict of neighbours are used as an ordered set
+        self.adjacency: dict[Hashable, dict[Hashable, None]] = {}
+
+    def add_edge(self: "JoinGraph", u: Hashable, v: Hashable) -> None:
+        """Add an edge between two nodes, adding the nodes if they are not already present.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :param u: node
+        :type u: Hashable
+        :param v: node
+        :type v: Hashable
+        """
+        self.adjacency.setdefault(u, {})[v] = None
+        self.adjacency.setdefault(v, {})[u] = None
+
+    @property
+    def nodes(self: "JoinGraph") -> list[Hashable]:
+        """The nodes of the graph, in the order in which they were added.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :return: nodes
+        :rtype: list[Hashable]
+        """
+        return list(self.adjacency)
+
+    @property
+    def edges(self: "JoinGraph") -> list[tuple[Hashable, Hashable]]:
+        """The edges of the graph, each listed once.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :return: edges
+        :rtype: list[tuple[Hashable, Hashable]]
+        """
+        seen = set()
+        edges = []
+        for u, neighbours in self.adjacency.items():
+            seen.add(u)
+            edges.extend((u, v) for v in neighbours if v not in seen)
+        return edges
+
+    def degree(self: "JoinGraph") -> Iterator[tuple[Hashable, int]]:
+        """Generate the number of neighbours of each node.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :return: iterator over (node, degree) pairs
+        :rtype: Iterator[tuple[Hashable, int]]
+        """
+        for node, neighbours in self.adjacency.items():
+            yield node, len(neighbours)
+
+    def shortest_paths(self: "JoinGraph", source: Hashable) -> dict[Hashable, list[Hashable]]:
+        """Find the shortest path from a node to each node that can be reached from it.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :param source: starting node
+        :type source: Hashable
+        :return: paths, each starting with `source`, indexed by the end node, in breadth-first
+            order
+        :rtype: dict[Hashable, list[Hashable]]
+        """
+        paths = {source: [source]}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for neighbour in self.adjacency[node]:
+                if neighbour not in paths:
+                    paths[neighbour] = [*paths[node], neighbour]
+                    queue.append(neighbour)
+        return paths
+
+    def shortest_path_lengths(self: "JoinGraph", source: Hashable) -> dict[Hashable, int]:
+        """Find the length of the shortest path from a node to each node that can be reached from it.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :param source: starting node
+        :type source: Hashable
+        :return: number of edges in each path, indexed by the end node, in breadth-first order
+        :rtype: dict[Hashable, int]
+        """
+        lengths = {source: 0}
+        queue = deque([source])
+        while queue:
+            node = queue.popleft()
+            for neighbour in self.adjacency[node]:
+                if neighbour not in lengths:
+                    lengths[neighbour] = lengths[node] + 1
+                    queue.append(neighbour)
+        return lengths
+
+    def is_connected(self: "JoinGraph") -> bool:
+        """Check whether every node can be reached from every other node.
+
+        :param self: class instance
+        :type self: JoinGraph
+        :raises ValueError: if the graph has no nodes
+        :return: True if the graph is connected
+        :rtype: bool
+        """
+        if not self.adjacency:
+            err_msg = "Connectivity is undefined for a graph without nodes"
+            raise ValueError(err_msg)
+        return len(self.shortest_path_lengths(next(iter(self.adjacency)))) == len(self.adjacency)
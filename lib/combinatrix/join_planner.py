@@ -0,0 +1,140 @@
+"""Choose the order in which to join datasets, using statistics on their join keys."""
+
+from typing import Any
+
+from combinatrix.constants import FIELD, REF, T1, T2
+
+
+def estimate_join_rows(
+    rows: int, parent_stats: dict[str, int], child_rows: int, child_stats: dict[str, int]
+) -> int:
+    """Estimate the number of rows produced by adding a dataset to a partial combination.
+
+    The usual estimate is used: each distinct join value on the side with more of them matches
+    the rows of the other side with that value. It is capped by the largest group of rows with
+    the same join value in the dataset being added.
+
+    :param rows: number of rows in the partial combination
+    :type rows: int
+    :param parent_stats: statistics on the join key in the partial combination
+    :type parent_stats: dict[str, int]
+    :param child_rows: number of rows in the dataset being added
+    :type child_rows: int
+    :param child_stats: statistics on the join key in the dataset being added
+    :type child_stats: dict[str, int]
+    :return: estimated number of rows
+    :rtype: int
+    """
+    distinct = max(min(parent_stats["distinct"], rows), child_stats["distinct"])
+    if not distinct:
+        return 0
+    return min(round(rows * child_rows / distinct), rows * child_stats["max_group"])
+
+
+def estimate_plan(
+    joins: list[dict[str, Any]], statistics: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """Estimate the size of each partial combination when the joins are added in a given order.
+
+    :param joins: joins in the order in which they are added; each join after the first must
+        include a dataset from an earlier join
+    :type joins: list[dict[str, Any]]
+    :param statistics: statistics for each dataset, from `collect_key_statistics`
+    :type statistics: dict[str, dict[str, Any]]
+    :return: the plan, with keys `root` (the dataset that combinations start from), `rows`
+        (its number of rows), `joins` (each join, oriented so that T1 is the dataset already in
+        the combination, with the estimated number of rows after it is added as
+        `estimated_rows`), and `cost` (the sum of the estimated sizes)
+    :rtype: dict[str, Any]
+    """
+    root = joins[0][T1][REF]
+    rows = statistics[root]["rows"]
+    seen = {root}
+    plan = {"root": root, "rows": rows, "joins": [], "cost": rows}
+    for join in joins:
+        parent_tx, child_tx = (T1, T2) if join[T1][REF] in seen else (T2, T1)
+        parent, child = join[parent_tx][REF], join[child_tx][REF]
+        parent_stats = statistics[parent]["fields"][join[parent_tx][FIELD]]
+        child_stats = statistics[child]["fields"][join[child_tx][FIELD]]
+        if child in seen:
+            # both datasets are already in the combination, so the join only removes rows
+            rows = min(rows, round(rows / max(parent_stats["distinct"], child_stats["distinct"], 1)))
+        else:
+            seen.add(child)
+            rows = estimate_join_rows(rows, parent_stats, statistics[child]["rows"], child_stats)
+        plan["joins"].append({T1: join[parent_tx], T2: join[child_tx], "estimated_rows": rows})
+        plan["cost"] += rows
+    return plan
+
+
+def plan_join_order(
+    join_tree: list[dict[str, Any]], statistics: dict[str, dict[str, Any]]
+) -> dict[str, Any]:
+    """Choose the dataset to start from and the order in which to add the others.
+
+    Every dataset is tried as the starting point; from each, the join added at each step is the
+    one with the smallest estimated result. The plan with the smallest total of the estimated
+    sizes of the partial combinations is chosen.
+
+    :param join_tree: joins that form a tree
+    :type join_tree: list[dict[str, Any]]
+    :param statistics: statistics for each dataset, from `collect_key_statistics`
+    :type statistics: dict[str, dict[str, Any]]
+    :return: the plan, as returned by `estimate_plan`
+    :rtype: dict[str, Any]
+    """
+    neighbours: dict[str, list[dict[str, Any]]] = {}
+    for join in join_tree:
+        neighbours.setdefault(join[T1][REF], []).append({T1: join[T1], T2: join[T2]})
+        neighbours.setdefault(join[T2][REF], []).append({T1: join[T2], T2: join[T1]})
+
+    plans = []
+    for root in neighbours:
+        seen = {root}
+        rows = statistics[root]["rows"]
+        frontier = list(neighbours[root])
+        joins = []
+        while frontier:
+            estimates = [
+                estimate_join_rows(
+                    rows,
+                    statistics[join[T1][REF]]["fields"][join[T1][FIELD]],
+                    statistics[join[T2][REF]]["rows"],
+                    statistics[join[T2][REF]]["fields"][join[T2][FIELD]],
+                )
+                for join in frontier
+            ]
+            ix = estimates.index(min(estimates))
+            join = frontier.pop(ix)
+            rows = estimates[ix]
+            seen.add(join[T2][REF])
+            joins.append(join)
+            frontier = [j for j in frontier if j[T2][REF] not in seen]
+            frontier.extend(j for j in neighbours[join[T2][REF]] if j[T2][REF] not in seen)
+        plans.append(estimate_plan(joins, statistics))
+
+    return min(plans, key=lambda plan: plan["cost"])
+
+
+def format_join_plan(plan: dict[str, Any]) -> str:
+    """Describe a join plan, for logging.
+
+    :param plan: the plan, as returned by `estimate_plan`, or for joins that contain cycles, a
+        dict with the key `variables`, the join variables in the order in which they are bound
+    :type plan: dict[str, Any]
+    :return: description of the plan
+    :rtype: str
+    """
+    if "variables" in plan:
+        variables = "; ".join(
+            " = ".join(f"{ref} '{field}'" for ref, field in variable)
+            for variable in plan["variables"]
+        )
+        return f"generic join (variable order: {variables})"
+    lines = [f"start from {plan["root"]}: {plan["rows"]} rows"]
+    lines.extend(
+        f"join {join[T1][REF]} '{join[T1][FIELD]}' to {join[T2][REF]} '{join[T2][FIELD]}': "
+        f"~{join["estimated_rows"]} rows"
+        for join in plan["joins"]
+    )
+    return "\n".join(lines)
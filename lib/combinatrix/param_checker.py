@@ -1,9 +1,9 @@
 """Check and coerce the parameter list for the combinatrix."""
 
 import re
+from collections import deque
 from typing import Any
 
-import networkx as nx
 from combinatrix.constants import (
     FIELD,
     JOIN_LIST,
@@ -16,8 +16,8 @@ from combinatrix.constants import (
     T1,
     T2,
 )
+from combinatrix.join_graph import JoinGraph
 from combinatrix.util import MULTISPACE_REGEX
-from networkx import Graph
 
 
 def validate_params(params: dict[str, Any], max_refs: int = MAX_REFS) -> dict[str, Any]:
@@ -119,7 +119,7 @@ def validate_params(params: dict[str, Any], max_refs: int = MAX_REFS) -> dict[st
 
 def construct_graph(
     join_list: list[dict[str, Any]], max_connections: int = MAX_CONNECTIONS_PER_NODE
-) -> Graph:
+) -> JoinGraph:
     """Generate a graph from the list of joins.
 
     :param join_list: list of dictionaries specifying the join information
@@ -128,9 +128,9 @@ def construct_graph(
     :type max_connections: int
     :raises RuntimeError: if any aspect of the join list is invalid
     :return: graph of the joins in the join_list
-    :rtype: Graph
+    :rtype: JoinGraph
     """
-    join_graph = nx.Graph()
+    join_graph = JoinGraph()
     # keep a tally of how many refs each ref is connected to
     ref_counts = {}
 
@@ -163,38 +163,41 @@ def find_longest_path_in_graph(
 ) -> list[str]:
     """Find the longest path in a graph and return it as a list of nodes.
 
+    If the graph is a tree, this is the longest path through it; if it contains cycles, it is
+    the longest of the shortest paths found from a far node.
+
     :param join_list: list of dictionaries specifying the join information
     :type join_list: list[dict[str, Any]]
     :param max_connections: maximum number of connections between one dataset and another
     :type max_connections: int
-    :raises RuntimeError: if the graph is cyclic or does not produce a tree
+    :raises RuntimeError: if the graph does not connect all the datasets
     :return: node sequence in the longest path
     :rtype: list[str]
     """
     join_graph = construct_graph(join_list, max_connections)
 
-    # check that all edges are connected to at least one other edge
-    # and that the graph forms a tree without cycles
-    if not nx.is_connected(join_graph) or not nx.is_tree(join_graph):
+    # check that all edges are connected to at least one other edge;
+    # cycles are allowed, as they are evaluated by the generic join
+    if not join_graph.is_connected():
         err_msg = "Error: the joins specified do not create a single dataset"
         raise RuntimeError(err_msg)
 
-    # The graph is a tree; proceed with finding the longest path
+    discovered_refs = [
+        ref for item in join_list for key in [T1, T2] for ref in [item[key][REF]]
+    ]
+
+    # start from a leaf if there is one
     leaves = [node for node, degree in join_graph.degree() if degree == 1]
+    start = leaves[0] if leaves else discovered_refs[0]
     farthest_leaf, _ = max(
-        nx.single_source_shortest_path_length(join_graph, leaves[0]).items(),
+        join_graph.shortest_path_lengths(start).items(),
         key=lambda x: x[1],
     )
-    longest_path = max(
-        nx.single_source_shortest_path(join_graph, farthest_leaf).values(), key=len
-    )
+    longest_path = max(join_graph.shortest_paths(farthest_leaf).values(), key=len)
 
     # the longest path can go in either direction, so order it according to which
     # of the end nodes appear first in discovered_refs
     # Check if last item of longest_path appears before the first item
-    discovered_refs = [
-        ref for item in join_list for key in [T1, T2] for ref in [item[key][REF]]
-    ]
     if discovered_refs.index(longest_path[-1]) < discovered_refs.index(longest_path[0]):
         # Reverse longest_path
         longest_path.reverse()
@@ -208,6 +211,12 @@ def sort_params(
 ) -> list[dict[str, Any]]:
     """Sort the join parameters into an appropriate order.
 
+    The joins may form any connected graph. They are listed in breadth-first order, starting
+    from one end of the longest path through the graph, and each join is ordered so that T1 is
+    the dataset nearer the start; every join after the first therefore includes a dataset from
+    an earlier join. A join between two datasets that are already joined, which closes a cycle,
+    is listed once both datasets have been reached.
+
     :param join_list: list of dictionaries specifying the join information
     :type join_list: list[dict[str, Any]]
     :param max_connections: maximum number of connections between one dataset and another
@@ -217,20 +226,26 @@ def sort_params(
     """
     longest_path = find_longest_path_in_graph(join_list, max_connections)
 
-    # Create a mapping from node to its position in the path for easy lookup
-    node_positions = {node: i for i, node in enumerate(longest_path)}
+    # index the joins by each of the refs that they connect, with that ref as T1
+    joins_by_ref: dict[str, list[tuple[int, dict[str, Any]]]] = {}
+    for ix, join in enumerate(join_list):
+        joins_by_ref.setdefault(join[T1][REF], []).append((ix, {T1: join[T1], T2: join[T2]}))
+        joins_by_ref.setdefault(join[T2][REF], []).append((ix, {T1: join[T2], T2: join[T1]}))
 
-    # Sort and order join_list based on the node positions in the path
     sorted_and_ordered_params = []
-    for join in join_list:
-        t1, t2 = join[T1], join[T2]
-        # Order refs within each join pair according to their position in the path
-        if node_positions[join[T1][REF]] > node_positions[join[T2][REF]]:
-            t1, t2 = t2, t1  # Swap to correct order
-        sorted_and_ordered_params.append({T1: t1, T2: t2})
-
-    # Sort the pairs themselves based on the position of the first ref in each pair
-    sorted_and_ordered_params.sort(key=lambda join: node_positions[join[T1][REF]])
+    listed = set()
+    visited = {longest_path[0]}
+    queue = deque([longest_path[0]])
+    while queue:
+        ref = queue.popleft()
+        for ix, join in joins_by_ref[ref]:
+            if ix in listed:
+                continue
+            if join[T2][REF] not in visited:
+                visited.add(join[T2][REF])
+                queue.append(join[T2][REF])
+            listed.add(ix)
+            sorted_and_ordered_params.append(join)
 
     return sorted_and_ordered_params
 
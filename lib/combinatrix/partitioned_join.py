@@ -0,0 +1,319 @@
+"""Semi-joins between datasets, split into partitions by join value and run in parallel."""
+
+import ctypes
+import multiprocessing
+from collections.abc import Callable
+from types import TracebackType
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+from pandas import Series
+
+if TYPE_CHECKING:
+    from multiprocessing.pool import Pool
+
+# worker processes are forked so that they share the join columns without copying them
+MP_CONTEXT = multiprocessing.get_context("fork")
+
+# state inherited by each worker process; see `init_worker`
+_worker_state: dict[str, Any] = {}
+
+
+def match_keys(keys: Series, values: Series) -> np.ndarray:
+    """Find which keys have a match in a set of values.
+
+    As in a pandas merge, missing values (None or NaN) match each other.
+
+    :param keys: values to look up
+    :type keys: Series
+    :param values: values to match against
+    :type values: Series
+    :return: boolean array, True for each key with a match in `values`
+    :rtype: np.ndarray
+    """
+    matches = keys.isin(values).to_numpy()
+    if values.isna().any():
+        matches |= keys.isna().to_numpy()
+    return matches
+
+
+def get_partitions(keys: Series, n_partitions: int) -> np.ndarray:
+    """Assign each key to a partition according to its hash.
+
+    Equal keys, including ints and floats with the same value, are assigned to the same
+    partition; all missing values are assigned to partition 0.
+
+    :param keys: join column
+    :type keys: Series
+    :param n_partitions: number of partitions
+    :type n_partitions: int
+    :return: partition number of each key
+    :rtype: np.ndarray
+    """
+    hashes = np.fromiter(map(hash, keys.tolist()), dtype=np.int64, count=len(keys))
+    partitions = hashes % n_partitions
+    partitions[keys.isna().to_numpy()] = 0
+    return partitions
+
+
+def index_partitions(partitions: np.ndarray, n_partitions: int) -> tuple[np.ndarray, np.ndarray]:
+    """Group the rows of a join column by partition.
+
+    :param partitions: partition number of each row, from `get_partitions`
+    :type partitions: np.ndarray
+    :param n_partitions: number of partitions
+    :type n_partitions: int
+    :return: row positions sorted by partition, and ascending within each partition; and the
+        offset of the first row of each partition in that array, followed by the number of rows,
+        so that the rows of partition `p` are between offsets `p` and `p + 1`
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    rows = np.argsort(partitions, kind="stable")
+    offsets = np.searchsorted(partitions[rows], np.arange(n_partitions + 1))
+    return rows, offsets
+
+
+def init_worker(state: dict[str, Any]) -> None:
+    """Make the join columns, partition indexes, and row masks available to a worker process.
+
+    Worker processes are forked, so `state` is inherited rather than copied; the row masks
+    are held in shared memory so that changes made by the workers are seen by all processes.
+
+    :param state: join columns, partition indexes, and row masks
+    :type state: dict[str, Any]
+    """
+    _worker_state.update(state)
+
+
+def get_partition_rows(table: str, column: str, partition: int) -> np.ndarray:
+    """Find the remaining rows of a table that are in a partition.
+
+    :param table: name of the table
+    :type table: str
+    :param column: name of the join column
+    :type column: str
+    :param partition: partition number
+    :type partition: int
+    :return: row positions, in ascending order
+    :rtype: np.ndarray
+    """
+    rows, offsets = _worker_state["partition_rows"][table, column]
+    rows = rows[offsets[partition] : offsets[partition + 1]]
+    return rows[_worker_state["masks"][table][rows]]
+
+
+def match_partition(
+    left: tuple[str, str], right: tuple[str, str], partition: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Match the remaining rows of two tables in one partition.
+
+    :param left: table and column name
+    :type left: tuple[str, str]
+    :param right: table and column name
+    :type right: tuple[str, str]
+    :param partition: partition number
+    :type partition: int
+    :return: positions of the rows of the left table in the partition, and whether each has a
+        match in the right table
+    :rtype: tuple[np.ndarray, np.ndarray]
+    """
+    left_rows = get_partition_rows(*left, partition)
+    right_rows = get_partition_rows(*right, partition)
+    left_keys = Series(_worker_state["columns"][left][left_rows], copy=False)
+    right_keys = Series(_worker_state["columns"][right][right_rows], copy=False)
+    return left_rows, match_keys(left_keys, right_keys)
+
+
+def has_match_in_partition(left: tuple[str, str], right: tuple[str, str], partition: int) -> bool:
+    """Check whether any remaining rows of two tables match in one partition.
+
+    :param left: table and column name
+    :type left: tuple[str, str]
+    :param right: table and column name
+    :type right: tuple[str, str]
+    :param partition: partition number
+    :type partition: int
+    :return: True if at least one pair of rows matches
+    :rtype: bool
+    """
+    return bool(match_partition(left, right, partition)[1].any())
+
+
+def semi_join_partition(left: tuple[str, str], right: tuple[str, str], partition: int) -> None:
+    """Remove the rows of the left table in one partition without a match in the right table.
+
+    :param left: table and column name of the table to remove rows from
+    :type left: tuple[str, str]
+    :param right: table and column name of the table to match against
+    :type right: tuple[str, str]
+    :param partition: partition number
+    :type partition: int
+    """
+    left_rows, matches = match_partition(left, right, partition)
+    # partitions do not overlap, so no other process writes to these rows
+    _worker_state["masks"][left[0]][left_rows[~matches]] = False
+
+
+class PartitionedJoiner:
+    """Join columns split into partitions by the hash of their values, to be joined in parallel.
+
+    Matching values always fall in the same partition, so each partition of a join can be
+    processed independently by a pool of worker processes. The worker processes are forked
+    once all the tables have been added, so the join columns are shared with them without
+    being copied; the rows remaining in each table are tracked in shared memory.
+    """
+
+    def __init__(self: "PartitionedJoiner", n_workers: int) -> None:
+        """Initialise an instance of the class.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param n_workers: number of worker processes, and of partitions
+        :type n_workers: int
+        """
+        self.n_workers = n_workers
+        self.columns: dict[tuple[str, str], np.ndarray] = {}
+        self.partition_rows: dict[tuple[str, str], tuple[np.ndarray, np.ndarray]] = {}
+        self.masks: dict[str, np.ndarray] = {}
+        self.pool: "Pool | None" = None
+
+    def __enter__(self: "PartitionedJoiner") -> "PartitionedJoiner":
+        """Use the joiner as a context manager.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :return: the joiner
+        :rtype: PartitionedJoiner
+        """
+        return self
+
+    def __exit__(
+        self: "PartitionedJoiner",
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the joiner on leaving the context.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param exc_type: type of the exception raised in the context, if any
+        :type exc_type: type[BaseException] | None
+        :param exc_value: exception raised in the context, if any
+        :type exc_value: BaseException | None
+        :param traceback: traceback of the exception raised in the context, if any
+        :type traceback: TracebackType | None
+        """
+        self.close()
+
+    def close(self: "PartitionedJoiner") -> None:
+        """Stop the worker processes.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+    def add_table(self: "PartitionedJoiner", table: str, columns: dict[str, Series]) -> None:
+        """Add the join columns of a dataset and group their rows by partition.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param table: name of the table
+        :type table: str
+        :param columns: column values, indexed by column name; all columns must be the same length
+        :type columns: dict[str, Series]
+        :raises RuntimeError: if the worker processes have already been started
+        """
+        if self.pool is not None:
+            err_msg = "Tables cannot be added once the join has started"
+            raise RuntimeError(err_msg)
+
+        n_rows = len(next(iter(columns.values())))
+        self.masks[table] = np.frombuffer(MP_CONTEXT.RawArray(ctypes.c_bool, n_rows), dtype=np.bool_)
+        self.masks[table][:] = True
+        for name, values in columns.items():
+            self.columns[table, name] = values.to_numpy()
+            self.partition_rows[table, name] = index_partitions(
+                get_partitions(values, self.n_workers), self.n_workers
+            )
+
+    def run(
+        self: "PartitionedJoiner",
+        func: Callable[[tuple[str, str], tuple[str, str], int], Any],
+        left: tuple[str, str],
+        right: tuple[str, str],
+    ) -> list[Any]:
+        """Run a function on every partition of a pair of join columns.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param func: function to run, with arguments `left`, `right`, and the partition number
+        :type func: Callable[[tuple[str, str], tuple[str, str], int], Any]
+        :param left: table and column name
+        :type left: tuple[str, str]
+        :param right: table and column name
+        :type right: tuple[str, str]
+        :return: result for each partition
+        :rtype: list[Any]
+        """
+        if self.pool is None:
+            self.pool = MP_CONTEXT.Pool(
+                self.n_workers,
+                initializer=init_worker,
+                initargs=(
+                    {
+                        "columns": self.columns,
+                        "partition_rows": self.partition_rows,
+                        "masks": self.masks,
+                    },
+                ),
+            )
+        return self.pool.starmap(
+            func, [(left, right, partition) for partition in range(self.n_workers)]
+        )
+
+    def has_match(
+        self: "PartitionedJoiner", left: tuple[str, str], right: tuple[str, str]
+    ) -> bool:
+        """Check whether any remaining rows of two tables match on a pair of columns.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param left: table and column name
+        :type left: tuple[str, str]
+        :param right: table and column name
+        :type right: tuple[str, str]
+        :return: True if at least one pair of rows matches
+        :rtype: bool
+        """
+        return any(self.run(has_match_in_partition, left, right))
+
+    def semi_join(
+        self: "PartitionedJoiner", left: tuple[str, str], right: tuple[str, str]
+    ) -> None:
+        """Remove the rows of the left table without a match in the right table.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param left: table and column name of the table to remove rows from
+        :type left: tuple[str, str]
+        :param right: table and column name of the table to match against
+        :type right: tuple[str, str]
+        """
+        self.run(semi_join_partition, left, right)
+
+    def get_positions(self: "PartitionedJoiner", table: str) -> np.ndarray:
+        """Retrieve the positions of the rows remaining in a table.
+
+        :param self: class instance
+        :type self: PartitionedJoiner
+        :param table: name of the table
+        :type table: str
+        :return: row positions, in ascending order
+        :rtype: np.ndarray
+        """
+        return np.flatnonzero(self.masks[table])
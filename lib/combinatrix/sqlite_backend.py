@@ -0,0 +1,233 @@
+"""On-disk storage for the join columns of datasets too large to join in memory."""
+
+import contextlib
+import os
+import sqlite3
+import tempfile
+from collections.abc import Iterable
+from itertools import islice
+from types import TracebackType
+from typing import Any
+
+import numpy as np
+
+DATABASE_FILE_SUFFIX = ".sqlite"
+# number of rows to insert per statement, or to read per batch
+INSERT_BATCH_SIZE = 10000
+# maximum size of the SQLite page cache, in kibibytes
+PAGE_CACHE_KIB = 64 * 1024
+# name of the column holding the position of each row in its dataset
+POSITION = "pos"
+
+
+def quote_identifier(name: str) -> str:
+    """Quote a table or column name for use in an SQL statement.
+
+    All names in the SQL statements below are quoted with this function; values are always
+    passed as parameters.
+
+    :param name: table or column name
+    :type name: str
+    :return: quoted name
+    :rtype: str
+    """
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SqliteJoinStore:
+    """Join columns stored in a temporary SQLite database, to be joined without loading them.
+
+    Each dataset is stored in a table with a `pos` column holding the position of each row in
+    the dataset, followed by the join columns. Missing values (None and NaN) are stored as NULL
+    and are compared with `IS`, so that they match each other as they do in a pandas merge.
+
+    The database file is deleted when the store is closed.
+    """
+
+    def __init__(self: "SqliteJoinStore", scratch_dir: str) -> None:
+        """Initialise an instance of the class.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param scratch_dir: directory in which to create the database file
+        :type scratch_dir: str
+        """
+        os.makedirs(scratch_dir, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=scratch_dir, suffix=DATABASE_FILE_SUFFIX)
+        os.close(fd)
+        self.connection = sqlite3.connect(self.path)
+        # the database is discarded after use, so there is no need to guard against crashes
+        self.connection.execute("PRAGMA journal_mode = OFF")
+        self.connection.execute("PRAGMA synchronous = OFF")
+        self.connection.execute(f"PRAGMA cache_size = -{PAGE_CACHE_KIB}")
+        self.connection.execute("PRAGMA temp_store = FILE")
+
+    def __enter__(self: "SqliteJoinStore") -> "SqliteJoinStore":
+        """Use the store as a context manager.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :return: the store
+        :rtype: SqliteJoinStore
+        """
+        return self
+
+    def __exit__(
+        self: "SqliteJoinStore",
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Close the store on leaving the context.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param exc_type: type of the exception raised in the context, if any
+        :type exc_type: type[BaseException] | None
+        :param exc_value: exception raised in the context, if any
+        :type exc_value: BaseException | None
+        :param traceback: traceback of the exception raised in the context, if any
+        :type traceback: TracebackType | None
+        """
+        self.close()
+
+    def close(self: "SqliteJoinStore") -> None:
+        """Close the database connection and delete the database file.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        """
+        self.connection.close()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self.path)
+
+    def add_table(self: "SqliteJoinStore", table: str, columns: dict[str, Iterable[Any]]) -> None:
+        """Store the join columns of a dataset and index each of them.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param table: name of the table
+        :type table: str
+        :param columns: column values, indexed by column name; all columns must be the same length
+        :type columns: dict[str, Iterable[Any]]
+        """
+        column_names = [POSITION, *columns]
+        self.connection.execute(
+            f"CREATE TABLE {quote_identifier(table)} ({POSITION} INTEGER PRIMARY KEY, "
+            + ", ".join(quote_identifier(name) for name in columns)
+            + ")"
+        )
+        insert = (
+            f"INSERT INTO {quote_identifier(table)} VALUES ("  # noqa: S608
+            + ", ".join("?" * len(column_names))
+            + ")"
+        )
+        rows = enumerate(zip(*columns.values(), strict=True))
+        while batch := [(pos, *values) for pos, values in islice(rows, INSERT_BATCH_SIZE)]:
+            self.connection.executemany(insert, batch)
+
+        for ix, name in enumerate(columns):
+            self.connection.execute(
+                f"CREATE INDEX {quote_identifier(f'{table}__index_{ix}')} "
+                f"ON {quote_identifier(table)} ({quote_identifier(name)})"
+            )
+        self.connection.commit()
+
+    def has_match(
+        self: "SqliteJoinStore", left: tuple[str, str], right: tuple[str, str]
+    ) -> bool:
+        """Check whether any rows of two tables match on a pair of columns.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param left: table and column name
+        :type left: tuple[str, str]
+        :param right: table and column name
+        :type right: tuple[str, str]
+        :return: True if at least one pair of rows matches
+        :rtype: bool
+        """
+        cursor = self.connection.execute(
+            f"SELECT 1 FROM {quote_identifier(left[0])} AS l "  # noqa: S608
+            f"JOIN {quote_identifier(right[0])} AS r "
+            f"ON l.{quote_identifier(left[1])} IS r.{quote_identifier(right[1])} LIMIT 1"
+        )
+        return cursor.fetchone() is not None
+
+    def semi_join(
+        self: "SqliteJoinStore", left: tuple[str, str], right: tuple[str, str]
+    ) -> None:
+        """Delete the rows of the left table without a match in the right table.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param left: table and column name of the table to remove rows from
+        :type left: tuple[str, str]
+        :param right: table and column name of the table to match against
+        :type right: tuple[str, str]
+        """
+        left_table, right_table = quote_identifier(left[0]), quote_identifier(right[0])
+        self.connection.execute(
+            f"DELETE FROM {left_table} WHERE NOT EXISTS (SELECT 1 FROM {right_table} "  # noqa: S608
+            f"WHERE {right_table}.{quote_identifier(right[1])} "
+            f"IS {left_table}.{quote_identifier(left[1])})"
+        )
+        self.connection.commit()
+
+    def get_positions(self: "SqliteJoinStore", table: str) -> np.ndarray:
+        """Retrieve the positions of the rows remaining in a table.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param table: name of the table
+        :type table: str
+        :return: row positions, in ascending order
+        :rtype: np.ndarray
+        """
+        cursor = self.connection.execute(
+            f"SELECT {POSITION} FROM {quote_identifier(table)} ORDER BY {POSITION}"  # noqa: S608
+        )
+        return np.fromiter((row[0] for row in cursor), dtype=np.int64)
+
+    def get_joined_positions(
+        self: "SqliteJoinStore",
+        conditions: list[tuple[tuple[str, str], tuple[str, str]]],
+    ) -> dict[str, np.ndarray]:
+        """Retrieve the positions of the rows of each table that are part of a join of all the tables.
+
+        The join is run once, and its rows are read in batches, marking the position of each
+        table's row in a mask for that table.
+
+        :param self: class instance
+        :type self: SqliteJoinStore
+        :param conditions: pairs of (table, column) that must match; every table in the join must
+            appear in at least one condition
+        :type conditions: list[tuple[tuple[str, str], tuple[str, str]]]
+        :return: row positions, in ascending order, indexed by table name
+        :rtype: dict[str, np.ndarray]
+        """
+        tables = list(dict.fromkeys(t for condition in conditions for t, _ in condition))
+        masks = {}
+        for table in tables:
+            (size,) = self.connection.execute(
+                f"SELECT COALESCE(MAX({POSITION}), -1) + 1 FROM {quote_identifier(table)}"  # noqa: S608
+            ).fetchone()
+            masks[table] = np.zeros(size, dtype=bool)
+
+        where = " AND ".join(
+            f"{quote_identifier(left[0])}.{quote_identifier(left[1])} "
+            f"IS {quote_identifier(right[0])}.{quote_identifier(right[1])}"
+            for left, right in conditions
+        )
+        cursor = self.connection.execute(
+            "SELECT "  # noqa: S608
+            + ", ".join(f"{quote_identifier(t)}.{POSITION}" for t in tables)
+            + " FROM "
+            + ", ".join(quote_identifier(t) for t in tables)
+            + f" WHERE {where}"
+        )
+        while batch := cursor.fetchmany(INSERT_BATCH_SIZE):
+            positions = np.array(batch, dtype=np.int64)
+            for ix, table in enumerate(tables):
+                masks[table][positions[:, ix]] = True
+        return {table: np.flatnonzero(mask) for table, mask in masks.items()}
@@ -2,13 +2,18 @@
 
 import json
 import os
+import queue
 import re
+import threading
+from collections.abc import Iterable, Iterator
 from typing import Any
 
 from combinatrix.constants import INFO
 
 SPECIAL_CHAR_REGEX = re.compile(r"\W+")
 MULTISPACE_REGEX = re.compile(r"\s+")
+# how often a background thread waiting to pass on a result checks whether it should stop
+QUEUE_POLL_INTERVAL = 0.1
 
 
 def get_info(ws_output: dict[str, Any]) -> dict[str, Any]:
@@ -50,6 +55,112 @@ def get_data_type(ws_output: dict[str, Any]) -> str:
     return infostruct["type"]
 
 
+def get_config_int(
+    config: dict[str, Any], key: str, default: int, minimum: int = 1
+) -> int:
+    """Retrieve an integer setting from the config, falling back to a default value.
+
+    :param config: combinatrix config
+    :type config: dict[str, Any]
+    :param key: name of the setting
+    :type key: str
+    :param default: value to use if the setting is absent or empty
+    :type default: int
+    :param minimum: smallest permitted value for the setting, defaults to 1
+    :type minimum: int
+    :raises ValueError: if the setting is present but is not an integer of at least `minimum`
+    :return: value of the setting
+    :rtype: int
+    """
+    value = config.get(key)
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    try:
+        int_value = int(value)
+    except (TypeError, ValueError):
+        int_value = minimum - 1
+    if int_value < minimum:
+        requirement = "a positive integer" if minimum == 1 else f"an integer >= {minimum}"
+        err_msg = f"Config setting '{key}' must be {requirement}; got '{value}'"
+        raise ValueError(err_msg)
+    return int_value
+
+
+def split_into_batches(items: list[Any], batch_size: int) -> list[list[Any]]:
+    """Split a list into consecutive batches of at most `batch_size` items.
+
+    :param items: list to split
+    :type items: list[Any]
+    :param batch_size: maximum number of items per batch
+    :type batch_size: int
+    :return: list of batches, in the same order as the input
+    :rtype: list[list[Any]]
+    """
+    return [items[i : i + batch_size] for i in range(0, len(items), batch_size)]
+
+
+def put_unless_stopped(results: queue.Queue, item: Any, stopped: threading.Event) -> bool:  # noqa: ANN401
+    """Add an item to a queue, waiting for space to become available unless `stopped` is set.
+
+    :param results: queue to add the item to
+    :type results: queue.Queue
+    :param item: item to add
+    :type item: Any
+    :param stopped: event that is set when nothing more will be read from the queue
+    :type stopped: threading.Event
+    :return: True if the item was added, False if `stopped` was set first
+    :rtype: bool
+    """
+    while not stopped.is_set():
+        try:
+            results.put(item, timeout=QUEUE_POLL_INTERVAL)
+        except queue.Full:
+            continue
+        return True
+    return False
+
+
+def iter_in_background(iterable: Iterable[Any], max_pending: int = 0) -> Iterator[Any]:
+    """Consume an iterable in a background thread, yielding its items as they are produced.
+
+    This allows each item to be processed while the next ones are still being produced.
+    Any exception raised by the iterable is re-raised in the calling thread.
+
+    :param iterable: iterable to consume
+    :type iterable: Iterable[Any]
+    :param max_pending: maximum number of items that can be produced before being yielded;
+        defaults to 0, which does not limit the number of items
+    :type max_pending: int
+    :yield: items from the iterable, in order
+    :rtype: Iterator[Any]
+    """
+    results = queue.Queue(maxsize=max_pending)
+    stopped = threading.Event()
+    done = object()
+
+    def produce() -> None:
+        try:
+            for item in iterable:
+                if not put_unless_stopped(results, (item, None), stopped):
+                    return
+        except Exception as e:  # noqa: BLE001
+            put_unless_stopped(results, (done, e), stopped)
+        else:
+            put_unless_stopped(results, (done, None), stopped)
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while True:
+            item, error = results.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
 def remove_special_chars(text: str) -> str:
     """Remove all special characters from a string and replace runs of spec chars with an underscore.
 
@@ -79,6 +190,17 @@ def resort_fieldnames(unsorted_fieldnames: list[str] | set[str]) -> list[str]:
     return fieldnames
 
 
+def resolve_path(path: str) -> str:
+    """Convert a path into an absolute path.
+
+    :param path: absolute or relative path
+    :type path: str
+    :return: absolute path
+    :rtype: str
+    """
+    return path if os.path.isabs(path) else os.path.abspath(path)
+
+
 def create_output_dir(config: dict[str, Any]) -> str:
     """Create a directory for the output from the combinatrix.
 
@@ -32,6 +32,7 @@ class KBaseReport(object):
         async_job_check_time_ms=100,
         async_job_check_time_scale_percent=150,
         async_job_check_max_time_ms=300000,
+        session=None,
     ):
         if url is None:
             raise ValueError("A url is required")
@@ -48,6 +49,7 @@ class KBaseReport(object):
             async_job_check_time_ms=async_job_check_time_ms,
             async_job_check_time_scale_percent=async_job_check_time_scale_percent,
             async_job_check_max_time_ms=async_job_check_max_time_ms,
+            session=session,
         )
 
     def create(self, params, context=None):
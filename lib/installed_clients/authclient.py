@@ -62,13 +62,16 @@ class KBaseAuth(object):
 
     _LOGIN_URL = 'https://kbase.us/services/auth/api/legacy/KBase/Sessions/Login'
 
-    def __init__(self, auth_url=None):
+    def __init__(self, auth_url=None, session=None):
         '''
         Constructor
+        session - optional requests.Session to use for calls to the auth
+            service.
         '''
         self._authurl = auth_url
         if not self._authurl:
             self._authurl = self._LOGIN_URL
+        self._session = _requests if session is None else session
         self._cache = TokenCache()
 
     def get_user(self, token):
@@ -79,7 +82,7 @@ class KBaseAuth(object):
             return user
 
         d = {'token': token, 'fields': 'user_id'}
-        ret = _requests.post(self._authurl, data=d)
+        ret = self._session.post(self._authurl, data=d)
         if not ret.ok:
             try:
                 err = ret.json()
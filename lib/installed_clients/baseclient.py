@@ -120,6 +120,9 @@ class BaseClient(object):
     lookup_url - set to true when contacting KBase dynamic services.
     async_job_check_time_ms - the wait time between checking job state for
         asynchronous jobs run with the run_job method.
+    session - a requests.Session to use for all calls, e.g. to share a pool
+        of keep-alive connections between clients. Defaults to a new
+        connection per call.
     '''
     def __init__(
             self, url=None, timeout=30 * 60, user_id=None,
@@ -129,7 +132,8 @@ class BaseClient(object):
             lookup_url=False,
             async_job_check_time_ms=100,
             async_job_check_time_scale_percent=150,
-            async_job_check_max_time_ms=300000):
+            async_job_check_max_time_ms=300000,
+            session=None):
         if url is None:
             raise ValueError('A url is required')
         scheme, _, _, _, _, _ = _urlparse(url)
@@ -144,6 +148,7 @@ class BaseClient(object):
         self.async_job_check_time_scale_percent = (
             async_job_check_time_scale_percent)
         self.async_job_check_max_time = async_job_check_max_time_ms / 1000.0
+        self._session = _requests if session is None else session
         # token overrides user_id and password
         if token is not None:
             self._headers['AUTHORIZATION'] = token
@@ -176,9 +181,9 @@ class BaseClient(object):
             arg_hash['context'] = context
 
         body = _json.dumps(arg_hash, cls=_JSONObjectEncoder)
-        ret = _requests.post(url, data=body, headers=self._headers,
-                             timeout=self.timeout,
-                             verify=not self.trust_all_ssl_certificates)
+        ret = self._session.post(url, data=body, headers=self._headers,
+                                 timeout=self.timeout,
+                                 verify=not self.trust_all_ssl_certificates)
         ret.encoding = 'utf-8'
         if ret.status_code == 500:
             if ret.headers.get(_CT) == _AJ:
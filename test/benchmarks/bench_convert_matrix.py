@@ -0,0 +1,110 @@
+"""Benchmark matrix conversion against the original loop-based implementation.
+
+Run from the repo root with `lib` on the PYTHONPATH:
+
+    PYTHONPATH=lib:. python -m test.benchmarks.bench_convert_matrix --rows 10000 --cols 100
+"""
+
+import argparse
+import random
+import sys
+import timeit
+from argparse import Namespace
+from typing import Any
+
+from combinatrix.constants import DATA, DATASET
+from combinatrix.converter import convert_matrix
+
+
+def convert_matrix_loop(object_data: dict[str, Any]) -> list[dict[str, Any]]:
+    """Convert a matrix to a list of dicts, cell by cell; the original implementation.
+
+    :param object_data: workspace object with keys 'row_ids', 'col_ids', and 'values' in data.data
+    :type object_data: dict[str, Any]
+    :return: the dataset as a list of dicts
+    :rtype: list[dict[str, Any]]
+    """
+    matrix_data = object_data[DATA][DATA]
+    matrix_as_dicts = []
+    for i, column_id in enumerate(matrix_data["col_ids"]):
+        for j, row_id in enumerate(matrix_data["row_ids"]):
+            value = matrix_data["values"][j][i]
+            matrix_as_dicts.append(
+                {
+                    "id": f"{column_id}___{row_id}___{value}",
+                    "column_id": column_id,
+                    "row_id": row_id,
+                    "value": value,
+                }
+            )
+    return matrix_as_dicts
+
+
+def generate_matrix(n_rows: int, n_cols: int) -> dict[str, Any]:
+    """Generate a sparse amplicon-style matrix workspace object.
+
+    :param n_rows: number of rows
+    :type n_rows: int
+    :param n_cols: number of columns
+    :type n_cols: int
+    :return: matrix workspace object
+    :rtype: dict[str, Any]
+    """
+    rng = random.Random(42)
+    return {
+        DATA: {
+            DATA: {
+                "row_ids": [f"{rng.getrandbits(128):032x}" for _ in range(n_rows)],
+                "col_ids": [f"16O.16C.{n}" for n in range(n_cols)],
+                "values": [
+                    [float(rng.choice([0, 0, 0, rng.randint(1, 500)])) for _ in range(n_cols)]
+                    for _ in range(n_rows)
+                ],
+            }
+        }
+    }
+
+
+def parse_args(args: list[str]) -> Namespace:
+    """Parse input arguments.
+
+    :param args: input argument list
+    :type args: list[str]
+    :return: parsed arguments
+    :rtype: Namespace
+    """
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--rows", type=int, default=5000, help="number of matrix rows")
+    p.add_argument("--cols", type=int, default=100, help="number of matrix columns")
+    p.add_argument("--repeat", type=int, default=3, help="number of timing runs")
+    return p.parse_args(args)
+
+
+def main(args: list[str]) -> None:
+    """Run the benchmark.
+
+    :param args: input args as a list
+    :type args: list[str]
+    """
+    parsed_args = parse_args(args)
+    matrix = generate_matrix(parsed_args.rows, parsed_args.cols)
+
+    if convert_matrix(matrix)[DATASET].to_records() != convert_matrix_loop(matrix):
+        err_msg = "convert_matrix output does not match the original implementation"
+        raise RuntimeError(err_msg)
+
+    timings = {}
+    for name, func in [("loop", convert_matrix_loop), ("convert_matrix", convert_matrix)]:
+        timings[name] = min(
+            timeit.repeat(lambda f=func: f(matrix), number=1, repeat=parsed_args.repeat)
+        )
+        print(f"{name:>16}: {timings[name]:.3f} s")  # noqa: T201
+
+    print(  # noqa: T201
+        f"{parsed_args.rows} x {parsed_args.cols} matrix: "
+        f"speedup {timings['loop'] / timings['convert_matrix']:.2f}x"
+    )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
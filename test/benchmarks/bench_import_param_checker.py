@@ -0,0 +1,148 @@
+"""Benchmark the import time of the param checker against that of networkx, which it used to need.
+
+Run from the repo root with `lib` on the PYTHONPATH:
+
+    PYTHONPATH=lib:. python -m test.benchmarks.bench_import_param_checker --repeat 10
+
+If networkx is installed, the longest paths found are also checked against the original
+networkx-based implementation.
+"""
+
+import argparse
+import random
+import subprocess
+import sys
+import time
+from argparse import Namespace
+from types import ModuleType
+from typing import Any
+
+from combinatrix.constants import REF, T1, T2
+from combinatrix.param_checker import find_longest_path_in_graph
+
+
+def time_import(module: str, repeat: int) -> float:
+    """Time the import of a module in a fresh interpreter, as when a job container starts.
+
+    :param module: name of the module
+    :type module: str
+    :param repeat: number of timing runs
+    :type repeat: int
+    :return: fastest time to start the interpreter and import the module, in seconds
+    :rtype: float
+    """
+    timings = []
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", f"import {module}"],  # noqa: S603
+            check=True,
+            capture_output=True,
+        )
+        timings.append(time.perf_counter() - start_time)
+    return min(timings)
+
+
+def find_longest_path_networkx(nx: ModuleType, join_list: list[dict[str, Any]]) -> list[str]:
+    """Find the longest path through the graph of joins; the original implementation.
+
+    :param nx: the networkx module
+    :type nx: ModuleType
+    :param join_list: list of joins
+    :type join_list: list[dict[str, Any]]
+    :return: node sequence in the longest path
+    :rtype: list[str]
+    """
+    join_graph = nx.Graph()
+    for join in join_list:
+        join_graph.add_edge(join[T1][REF], join[T2][REF])
+
+    discovered_refs = [ref for item in join_list for ref in [item[T1][REF], item[T2][REF]]]
+    leaves = [node for node, degree in join_graph.degree() if degree == 1]
+    start = leaves[0] if leaves else discovered_refs[0]
+    farthest_leaf, _ = max(
+        nx.single_source_shortest_path_length(join_graph, start).items(), key=lambda x: x[1]
+    )
+    longest_path = max(
+        nx.single_source_shortest_path(join_graph, farthest_leaf).values(), key=len
+    )
+    if discovered_refs.index(longest_path[-1]) < discovered_refs.index(longest_path[0]):
+        longest_path.reverse()
+    return longest_path
+
+
+def generate_join_list(rng: random.Random, n_refs: int) -> list[dict[str, Any]]:
+    """Generate a random connected graph of joins, which may contain cycles.
+
+    :param rng: random number generator
+    :type rng: random.Random
+    :param n_refs: number of datasets
+    :type n_refs: int
+    :return: list of joins
+    :rtype: list[dict[str, Any]]
+    """
+    refs = [f"1/{n}/1" for n in range(n_refs)]
+    pairs = [(refs[rng.randrange(ix)], ref) for ix, ref in enumerate(refs) if ix]
+    pairs.extend(tuple(rng.sample(refs, 2)) for _ in range(rng.randint(0, 2)))
+    rng.shuffle(pairs)
+    return [{T1: {REF: left}, T2: {REF: right}} for left, right in pairs]
+
+
+def check_longest_paths(n_graphs: int) -> None:
+    """Check that the longest paths match those found with networkx, if it is installed.
+
+    :param n_graphs: number of random graphs to check
+    :type n_graphs: int
+    :raises RuntimeError: if any longest path differs
+    """
+    try:
+        import networkx as nx
+    except ImportError:
+        print("networkx is not installed; skipping the comparison of longest paths")  # noqa: T201
+        return
+
+    rng = random.Random(42)
+    for _ in range(n_graphs):
+        join_list = generate_join_list(rng, rng.randint(2, 12))
+        if find_longest_path_in_graph(join_list) != find_longest_path_networkx(nx, join_list):
+            err_msg = f"longest path does not match the original implementation: {join_list}"
+            raise RuntimeError(err_msg)
+    print(f"longest paths of {n_graphs} random graphs match networkx")  # noqa: T201
+
+
+def parse_args(args: list[str]) -> Namespace:
+    """Parse input arguments.
+
+    :param args: input argument list
+    :type args: list[str]
+    :return: parsed arguments
+    :rtype: Namespace
+    """
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("--repeat", type=int, default=5, help="number of timing runs")
+    p.add_argument("--graphs", type=int, default=1000, help="number of random graphs to check")
+    return p.parse_args(args)
+
+
+def main(args: list[str]) -> None:
+    """Run the benchmark.
+
+    :param args: input args as a list
+    :type args: list[str]
+    """
+    parsed_args = parse_args(args)
+    check_longest_paths(parsed_args.graphs)
+
+    modules = ["combinatrix.param_checker", "networkx"]
+    timings = {"interpreter": time_import("sys", parsed_args.repeat)}
+    for module in modules:
+        try:
+            timings[module] = time_import(module, parsed_args.repeat)
+        except subprocess.CalledProcessError:
+            continue
+    for name, timing in timings.items():
+        print(f"{name:>26}: {timing:.3f} s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,93 @@
+"""Break down the time taken to import combinatrix modules, as when a job container starts.
+
+Run from the repo root with `lib` on the PYTHONPATH:
+
+    PYTHONPATH=lib:. python -m test.benchmarks.bench_import_time combinatrix.CombinatrixImpl
+
+Each module is imported in a fresh interpreter with `python -X importtime`; the modules that
+take longest to import, including the modules that they import, are listed.
+"""
+
+import argparse
+import subprocess
+import sys
+from argparse import Namespace
+
+# format of each line of `-X importtime` output: self and cumulative time in microseconds
+IMPORT_TIME_PREFIX = "import time:"
+
+
+def get_import_times(module: str) -> dict[str, tuple[int, int]]:
+    """Import a module in a fresh interpreter and time the import of every module loaded.
+
+    :param module: name of the module to import
+    :type module: str
+    :raises RuntimeError: if the module cannot be imported
+    :return: for `module` and each module imported by it, the time to import the module itself
+        and the time including the modules that it imports, in microseconds, indexed by module
+        name, in the order in which the imports finished
+    :rtype: dict[str, tuple[int, int]]
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],  # noqa: S603
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if result.returncode:
+        err_msg = f"Could not import {module}:\n{result.stderr}"
+        raise RuntimeError(err_msg)
+
+    import_times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith(IMPORT_TIME_PREFIX):
+            continue
+        self_time, cumulative_time, name = line.removeprefix(IMPORT_TIME_PREFIX).split("|")
+        # skip the header line
+        if not self_time.strip().isdigit():
+            continue
+        import_times[name.strip()] = (int(self_time), int(cumulative_time))
+        # nested imports are indented and listed before the module that imports them; other
+        # top-level imports are made when the interpreter starts, e.g. by `site`
+        if not name.removeprefix(" ").startswith(" ") and name.strip() != module:
+            import_times = {}
+    return import_times
+
+
+def parse_args(args: list[str]) -> Namespace:
+    """Parse input arguments.
+
+    :param args: input argument list
+    :type args: list[str]
+    :return: parsed arguments
+    :rtype: Namespace
+    """
+    p = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    p.add_argument("modules", nargs="+", help="modules to import")
+    p.add_argument("--top", type=int, default=15, help="number of modules to list")
+    p.add_argument("--repeat", type=int, default=5, help="number of timing runs")
+    return p.parse_args(args)
+
+
+def main(args: list[str]) -> None:
+    """Run the benchmark.
+
+    :param args: input args as a list
+    :type args: list[str]
+    """
+    parsed_args = parse_args(args)
+    for module in parsed_args.modules:
+        # use the fastest run, as the others are slowed down by whatever else is running
+        import_times = min(
+            (get_import_times(module) for _ in range(parsed_args.repeat)),
+            key=lambda times: times[module][1],
+        )
+        print(f"{module}: {import_times[module][1] / 1000:.1f} ms")  # noqa: T201
+        print(f"{'self (ms)':>10} {'total (ms)':>10}  module")  # noqa: T201
+        slowest = sorted(import_times.items(), key=lambda item: item[1][1], reverse=True)
+        for name, (self_time, cumulative_time) in slowest[: parsed_args.top]:
+            print(f"{self_time / 1000:>10.1f} {cumulative_time / 1000:>10.1f}  {name}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -3,16 +3,18 @@
 import json
 import os
 import shutil
-from collections.abc import Callable
+from collections.abc import Callable, Generator
 from configparser import ConfigParser
 from test import TEST_BASE_DIR
 from typing import Any
 
 import pytest
 import vcr
-from combinatrix.constants import DATA, DL, FN, KEYS
+from combinatrix.constants import DATA, DATASET, DL, FN, KEYS
 from combinatrix.core import AppCore
+from combinatrix.dataset import Dataset
 from combinatrix.fetcher import DataFetcher
+from combinatrix.http_session import reset_session
 
 CONFIG_FILE = os.environ.get(
     "KB_DEPLOYMENT_CONFIG", os.path.join(TEST_BASE_DIR, "./deploy.cfg")
@@ -102,8 +104,7 @@ def load_test_case(case_name: str) -> dict[str, Any]:
     if os.path.exists(os.path.join(TEST_BASE_DIR, DATA, output_file)):
         result["output"] = {}
         untyped_output = read_json_file(output_file)
-        result["output"][DL] = untyped_output[DL]
-        result["output"][FN] = set(untyped_output[FN])
+        result["output"][DATASET] = Dataset.from_records(untyped_output[DL], untyped_output[FN])
         result["output"][KEYS] = {}
         for k in ["user", "controlled"]:
             result["output"][KEYS][k] = set(untyped_output[KEYS][k])
@@ -153,6 +154,17 @@ def auto_generate_fixtures() -> None:
 auto_generate_fixtures()
 
 
+@pytest.fixture(autouse=True)
+def _reset_http_session() -> Generator[None, None, None]:
+    """Discard the shared HTTP session after each test.
+
+    Pooled connections are bound to the vcrpy cassette that was active when they were opened,
+    so they must not be reused by tests that play back a different cassette.
+    """
+    yield
+    reset_session()
+
+
 @pytest.fixture(scope="session")
 def config() -> dict[str, str]:
     """Parses the configuration file and retrieves the values under the Combinatrix header.
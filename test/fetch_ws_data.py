@@ -121,7 +121,7 @@ def main(args: list[str]) -> None:
     data_fetcher = DataFetcher(config, {"token": parsed_args.token})
     print(f"Fetching the following UPAs from {parsed_args.env}:")
     print(", ".join(parsed_args.upa))
-    output = data_fetcher.fetch_objects_by_ref(parsed_args.upa)
+    output = dict(data_fetcher.iter_objects_by_ref(parsed_args.upa))
     if parsed_args.format == "csv":
 
         for ref in output:
@@ -0,0 +1,140 @@
+"""Tests for the on-disk cache."""
+
+import hashlib
+import os
+import time
+from pathlib import Path
+
+import pytest
+from combinatrix.cache import DiskCache, get_cache_dir, is_versioned_upa
+
+
+def get_entry_path(cache_dir: Path, key: str) -> Path:
+    """Get the path of the file for a cache entry.
+
+    :param cache_dir: cache directory
+    :type cache_dir: Path
+    :param key: cache key
+    :type key: str
+    :return: path to the cache file
+    :rtype: Path
+    """
+    return cache_dir / (hashlib.sha256(key.encode()).hexdigest() + ".json")
+
+
+@pytest.mark.parametrize("ref", ["72724/4/1", "1/2/3"])
+def test_is_versioned_upa(ref: str) -> None:
+    """Check that fully-specified UPAs are considered immutable."""
+    assert is_versioned_upa(ref)
+
+
+@pytest.mark.parametrize(
+    "ref", ["72724/4", "72724/sampleset/1", "my_workspace/4/1", "72724/4/1;72724/5/1"]
+)
+def test_is_versioned_upa_fail(ref: str) -> None:
+    """Check that references that may change over time are not considered immutable."""
+    assert not is_versioned_upa(ref)
+
+
+@pytest.mark.parametrize(
+    ("config", "expected"),
+    [
+        ({"scratch": "/scratch"}, None),
+        ({"scratch": "/scratch", "cache-dir": ""}, None),
+        ({"scratch": "/scratch", "cache-dir": "   "}, None),
+        ({"scratch": "/scratch", "cache-dir": "cache"}, "/scratch/cache"),
+        ({"scratch": "/scratch", "cache-dir": "/some/other/dir"}, "/some/other/dir"),
+        ({"scratch": "./scratch", "cache-dir": "cache"}, os.path.abspath("scratch/cache")),
+    ],
+)
+def test_get_cache_dir(config: dict[str, str], expected: str | None) -> None:
+    """Check that the cache directory is resolved correctly."""
+    assert get_cache_dir(config) == expected
+
+
+def test_disk_cache_get_put(tmp_path: Path) -> None:
+    """Check that values can be stored and retrieved."""
+    cache = DiskCache(str(tmp_path / "cache"), 1024 * 1024)
+    assert cache.get("1/2/3") is None
+
+    value = {"data": {"row_ids": ["a", "b"], "values": [[1.0, 2.5]]}}
+    cache.put("1/2/3", value)
+    assert cache.get("1/2/3") == value
+
+    # values can be replaced
+    cache.put("1/2/3", {"data": None})
+    assert cache.get("1/2/3") == {"data": None}
+
+    cache.delete("1/2/3")
+    assert cache.get("1/2/3") is None
+    # deleting a missing key is not an error
+    cache.delete("1/2/3")
+
+    # no temporary files are left lying around
+    assert [f.name for f in (tmp_path / "cache").iterdir() if f.suffix == ".tmp"] == []
+
+
+@pytest.mark.parametrize(
+    ("key", "other_key"),
+    [("alice_b:c/1", "alice:b-c/1"), ("1/2/3", "1_2_3"), ("a b", "a_b")],
+)
+def test_disk_cache_keys_do_not_collide(key: str, other_key: str, tmp_path: Path) -> None:
+    """Check that keys that differ only in their special characters have separate entries."""
+    cache = DiskCache(str(tmp_path), 1024 * 1024)
+    cache.put(key, {"owner": key})
+    assert cache.get(other_key) is None
+    cache.put(other_key, {"owner": other_key})
+    assert cache.get(key) == {"owner": key}
+    assert cache.get(other_key) == {"owner": other_key}
+
+
+def test_disk_cache_corrupt_entry(tmp_path: Path) -> None:
+    """Check that an unreadable cache entry is treated as a miss and removed."""
+    cache = DiskCache(str(tmp_path), 1024 * 1024)
+    cache.put("1/2/3", {"a": "b"})
+    entry_path = get_entry_path(tmp_path, "1/2/3")
+    entry_path.write_text('{"a": "b', encoding="utf-8")
+
+    assert cache.get("1/2/3") is None
+    assert not entry_path.exists()
+
+
+def test_disk_cache_lru_eviction(tmp_path: Path) -> None:
+    """Check that the least recently used entries are evicted when the cache is full."""
+    value = {"data": "x" * 100}
+    entry_size = len('{"data":""}') + 100
+    cache = DiskCache(str(tmp_path), entry_size * 3)
+
+    for n in range(3):
+        cache.put(f"1/{n}/1", value)
+        # ensure that the entries have distinct modification times
+        os.utime(
+            get_entry_path(tmp_path, f"1/{n}/1"), (time.time() - 100 + n, time.time() - 100 + n)
+        )
+
+    # reading an entry marks it as recently used
+    assert cache.get("1/0/1") == value
+
+    cache.put("1/3/1", value)
+    assert cache.get("1/1/1") is None
+    for n in [0, 2, 3]:
+        assert cache.get(f"1/{n}/1") == value
+
+    # an entry larger than the cache is not kept
+    cache.put("1/4/1", {"data": "x" * entry_size * 4})
+    assert cache.get("1/4/1") is None
+
+
+def test_disk_cache_put_many(tmp_path: Path) -> None:
+    """Check that several values can be stored at once."""
+    value = {"data": "x" * 100}
+    entry_size = len('{"data":""}') + 100
+    cache = DiskCache(str(tmp_path), entry_size * 2)
+
+    cache.put_many({"sample_a/1": value, "sample_b/1": {"data": None}})
+    assert cache.get("sample_a/1") == value
+    assert cache.get("sample_b/1") == {"data": None}
+
+    # the cache is trimmed back to its size limit once all the values have been added
+    cache.put_many({f"sample_{n}/1": value for n in range(4)})
+    assert len([f for f in tmp_path.iterdir() if f.suffix == ".json"]) == 2  # noqa: PLR2004
@@ -1,20 +1,48 @@
 """Tests for combining data."""
 
+import random
+from collections import Counter
+from collections.abc import Callable
+from itertools import product
+from pathlib import Path
 from test.conftest import TEST_UPA, paramify
 from typing import Any
 
+import numpy as np
 import pytest
-from combinatrix.combination_harvester import combine_data
+from combinatrix import combination_harvester
+from combinatrix.combination_harvester import (
+    collect_key_statistics,
+    combine_data,
+    combine_data_partitioned,
+    count_combinations,
+    count_join_matches,
+    find_join_keys,
+    generate_combination_string,
+    generate_combinations,
+    get_dataset_order,
+    get_generic_join_variables,
+    get_join_plan,
+    get_join_tree,
+    get_join_variables,
+    iter_combination_rows,
+    merge_all,
+    merge_matched_ids,
+    semi_join,
+    semi_join_matched_ids,
+    write_combinations,
+)
 from combinatrix.constants import (
-    DL,
+    DATASET,
     FIELD,
-    FN,
     JOIN_LIST,
     REF,
     REQD_FIELDS,
     T1,
     T2,
 )
+from combinatrix.dataset import Dataset, MatrixDataset, to_column
+from pandas import DataFrame, Index
 
 REF_A = "ref_a"
 REF_B = "ref_b"
@@ -70,12 +98,12 @@ DATA_REF = {
     ],
 }
 FETCHED_DATA = {
-    REF_A: {FN: {A, B, C}, DL: DATA_REF["A"]},
-    REF_B: {FN: {X, Y, Z}, DL: DATA_REF["B"]},
-    REF_C: {FN: {L, M, N}, DL: DATA_REF["C"]},
-    REF_D: {FN: {A, B, C}, DL: DATA_REF["A"]},
-    REF_E: {FN: {X, Y, Z}, DL: DATA_REF["B"]},
-    REF_F: {FN: {L, M, N}, DL: DATA_REF["C"]},
+    REF_A: {DATASET: Dataset.from_records(DATA_REF["A"])},
+    REF_B: {DATASET: Dataset.from_records(DATA_REF["B"])},
+    REF_C: {DATASET: Dataset.from_records(DATA_REF["C"])},
+    REF_D: {DATASET: Dataset.from_records(DATA_REF["A"])},
+    REF_E: {DATASET: Dataset.from_records(DATA_REF["B"])},
+    REF_F: {DATASET: Dataset.from_records(DATA_REF["C"])},
 }
 
 
@@ -310,3 +338,733 @@ def test_combine_data_success(param: dict[str, Any]) -> None:
     """Ensure that intersecting datasets do not throw an error."""
     output = combine_data(param["input"], FETCHED_DATA)
     assert output == param["expected"]
+
+
+@pytest.mark.parametrize(
+    ("join_list", "expected"),
+    [
+        pytest.param(
+            [
+                {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+                {T1: {REF: REF_C, FIELD: L}, T2: {REF: REF_B, FIELD: Z}},
+            ],
+            [
+                {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+                {T1: {REF: REF_B, FIELD: Z}, T2: {REF: REF_C, FIELD: L}},
+            ],
+            id="chain",
+        ),
+        pytest.param(
+            [
+                {T1: {REF: REF_B, FIELD: X}, T2: {REF: REF_A, FIELD: A}},
+                {T1: {REF: REF_C, FIELD: L}, T2: {REF: REF_B, FIELD: Z}},
+                {T1: {REF: REF_D, FIELD: C}, T2: {REF: REF_B, FIELD: Y}},
+            ],
+            [
+                {T1: {REF: REF_B, FIELD: X}, T2: {REF: REF_A, FIELD: A}},
+                {T1: {REF: REF_B, FIELD: Z}, T2: {REF: REF_C, FIELD: L}},
+                {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_D, FIELD: C}},
+            ],
+            id="star",
+        ),
+        pytest.param(
+            [
+                {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+                {T1: {REF: REF_B, FIELD: Z}, T2: {REF: REF_C, FIELD: L}},
+                {T1: {REF: REF_C, FIELD: M}, T2: {REF: REF_A, FIELD: C}},
+            ],
+            None,
+            id="cycle",
+        ),
+        pytest.param(
+            [
+                {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+                {T1: {REF: REF_A, FIELD: B}, T2: {REF: REF_B, FIELD: Y}},
+            ],
+            None,
+            id="two_joins_between_the_same_datasets",
+        ),
+        pytest.param(
+            [
+                {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+                {T1: {REF: REF_C, FIELD: L}, T2: {REF: REF_D, FIELD: C}},
+                {T1: {REF: REF_D, FIELD: B}, T2: {REF: REF_E, FIELD: Y}},
+            ],
+            None,
+            id="disconnected",
+        ),
+    ],
+)
+def test_get_join_tree(
+    join_list: list[dict[str, Any]], expected: list[dict[str, Any]] | None
+) -> None:
+    """Ensure that joins are arranged as a tree rooted at the first dataset, if possible."""
+    assert get_join_tree(join_list) == expected
+
+
+@pytest.mark.parametrize(
+    ("left", "right", "expected"),
+    [
+        pytest.param(["x", "y", None, "z"], ["x", "z", "q"], [0, 3], id="no_nulls"),
+        pytest.param(["x", "y", None, np.nan], ["y", None], [1, 2, 3], id="none_matches_nan"),
+        pytest.param([1, 2, 3], [3.0, 1.0], [0, 2], id="int_and_float"),
+        pytest.param(["x"], [], [], id="empty"),
+    ],
+)
+def test_semi_join(left: list[Any], right: list[Any], expected: list[int]) -> None:
+    """Ensure that semi-joins select the same rows as an inner merge."""
+    left_df = DataFrame({"key": to_column(left), "pos": range(len(left))})
+    right_df = DataFrame({"key2": to_column(right)})
+    assert semi_join(left_df, "key", right_df["key2"])["pos"].tolist() == expected
+    merged = left_df.merge(right_df, left_on="key", right_on="key2", how="inner")
+    assert sorted(set(merged["pos"])) == expected
+
+
+def make_random_datasets(rng: random.Random, n_datasets: int) -> dict[str, Any]:
+    """Generate datasets with random tree-shaped joins between them.
+
+    :param rng: random number generator
+    :type rng: random.Random
+    :param n_datasets: number of datasets
+    :type n_datasets: int
+    :return: datasets, indexed by ref, and join params, with the joins in merge order
+    :rtype: dict[str, Any]
+    """
+    key_domains = [
+        [f"k{n}" for n in range(6)] + [None],
+        list(range(6)),
+        [f"k{n}" for n in range(3)] + [None, np.nan],
+    ]
+    # use the same kind of key throughout, as merging int and string columns raises an error
+    domain = rng.choice(key_domains)
+    datasets = {}
+    for ix in range(n_datasets):
+        ref = f"1/{ix + 1}/1"
+        n_rows = rng.randint(0, 12)
+        datasets[ref] = {
+            DATASET: Dataset(
+                {
+                    ID: [f"{ref}-{n}" for n in range(n_rows)],
+                    # object arrays, so that (e.g.) an all-NaN column has the same dtype
+                    A: np.array([rng.choice(domain) for _ in range(n_rows)], dtype=object),
+                    B: np.array([rng.choice(domain) for _ in range(n_rows)], dtype=object),
+                }
+            )
+        }
+
+    # random tree, with the joins in breadth-first order as for a sorted join list
+    refs = list(datasets)
+    join_list = []
+    for ix, ref in enumerate(refs[1:], start=1):
+        parent = refs[rng.randrange(ix)]
+        join_list.append(
+            {T1: {REF: parent, FIELD: rng.choice([A, B])}, T2: {REF: ref, FIELD: rng.choice([A, B])}}
+        )
+    join_list.sort(key=lambda join: refs.index(join[T1][REF]))
+
+    return {
+        "datasets": datasets,
+        JOIN_LIST: join_list,
+        REQD_FIELDS: {ref: {A, B} for ref in refs},
+    }
+
+
+def make_dataframes(datasets: dict[str, Any]) -> dict[str, DataFrame]:
+    """Convert datasets to dataframes with suffixed column names, as used in `combine_data`.
+
+    :param datasets: datasets, indexed by ref
+    :type datasets: dict[str, Any]
+    :return: dataframes, indexed by ref
+    :rtype: dict[str, DataFrame]
+    """
+    return {
+        ref: dataset[DATASET].to_dataframe().rename(columns=lambda x, ref=ref: f"{ref}__{x}")
+        for ref, dataset in datasets.items()
+    }
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_semi_join_matched_ids_equivalent_to_merge(seed: int) -> None:
+    """Ensure that the semi-join and merge implementations find the same matched IDs."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+    dataframes = make_dataframes(test_data["datasets"])
+
+    expected = merge_matched_ids(test_data[JOIN_LIST], dataframes)
+
+    # the semi-join result should not depend on how the joins are listed
+    join_list = [
+        {T1: join[T2], T2: join[T1]} if rng.random() < 0.5 else join  # noqa: PLR2004
+        for join in test_data[JOIN_LIST]
+    ]
+    rng.shuffle(join_list)
+    join_tree = get_join_tree(join_list)
+    assert join_tree is not None
+    assert semi_join_matched_ids(join_tree, dataframes) == expected
+
+
+def test_combine_data_matrix_ids() -> None:
+    """Ensure that matrix cells are matched by their integer keys."""
+    matrix = MatrixDataset(
+        {
+            ID: np.arange(4),
+            "column_id": ["pip", "pip", "pop", "pop"],
+            "row_id": ["r1", "r2", "r1", "r2"],
+            "value": [1, 0, 0, 3],
+        }
+    )
+    output = combine_data(
+        {
+            JOIN_LIST: [{T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_C, FIELD: "column_id"}}],
+            REQD_FIELDS: {REF_A: {A}, REF_C: {"column_id"}},
+        },
+        {**FETCHED_DATA, REF_C: {DATASET: matrix}},
+    )
+    assert output == {REF_A: {"a0", "a2"}, REF_C: {0, 1, 2, 3}}
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_combine_data_equivalent_to_merge(seed: int) -> None:
+    """Ensure that combine_data gives the same results as pairwise and cumulative merges."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+    dataframes = make_dataframes(test_data["datasets"])
+
+    no_overlap = [
+        join
+        for join in test_data[JOIN_LIST]
+        if not len(
+            dataframes[join[T1][REF]].merge(
+                dataframes[join[T2][REF]],
+                left_on=f"{join[T1][REF]}__{join[T1][FIELD]}",
+                right_on=f"{join[T2][REF]}__{join[T2][FIELD]}",
+            )
+        )
+    ]
+    if no_overlap:
+        with pytest.raises(
+            RuntimeError,
+            match="No matching values found between the following datasets:\n"
+            + "\n".join(generate_combination_string(join) for join in no_overlap)
+            + "$",
+        ):
+            combine_data(test_data, test_data["datasets"])
+    else:
+        assert combine_data(test_data, test_data["datasets"]) == merge_matched_ids(
+            test_data[JOIN_LIST], dataframes
+        )
+
+
+@pytest.mark.parametrize(
+    ("left", "right", "expected"),
+    [
+        pytest.param(["x", "x", "y", "z"], ["x", "x", "x", "z", "q"], 7, id="repeated_keys"),
+        pytest.param(["x", None, np.nan], [None, "x", None], 5, id="missing_values"),
+        pytest.param([1, 2, 2], [2.0, 2.0, 3.0], 4, id="int_and_float"),
+        pytest.param(["x"], [], 0, id="empty"),
+    ],
+)
+def test_count_join_matches(left: list[Any], right: list[Any], expected: int) -> None:
+    """Ensure that the number of matching pairs is the number of rows in an inner merge."""
+    left_df = DataFrame({"key": to_column(left)})
+    right_df = DataFrame({"key2": to_column(right)})
+    assert count_join_matches(left_df["key"], right_df["key2"]) == expected
+    assert len(left_df.merge(right_df, left_on="key", right_on="key2")) == expected
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_count_combinations_equivalent_to_merge(seed: int) -> None:
+    """Ensure that the combinations are counted without merging, and match the merged dataset."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+    dataframes = make_dataframes(test_data["datasets"])
+
+    expected_joins = [
+        len(
+            dataframes[join[T1][REF]].merge(
+                dataframes[join[T2][REF]],
+                left_on=f"{join[T1][REF]}__{join[T1][FIELD]}",
+                right_on=f"{join[T2][REF]}__{join[T2][FIELD]}",
+            )
+        )
+        for join in test_data[JOIN_LIST]
+    ]
+    assert count_combinations(test_data, test_data["datasets"]) == {
+        "joins": expected_joins,
+        "total": len(merge_all(test_data[JOIN_LIST], dataframes)),
+    }
+
+
+def test_count_combinations_above_int64() -> None:
+    """Ensure that counts too large for int64 are exact rather than wrapping around."""
+    n_rows = 10000
+    refs = [f"1/{n}/1" for n in range(1, 6)]
+    datasets = {
+        ref: {DATASET: Dataset({ID: [f"{ref}-{n}" for n in range(n_rows)], A: ["k"] * n_rows})}
+        for ref in refs
+    }
+    # a star of five datasets, all with the same join value in every row
+    join_params = {
+        JOIN_LIST: [{T1: {REF: refs[0], FIELD: A}, T2: {REF: ref, FIELD: A}} for ref in refs[1:]],
+        REQD_FIELDS: {ref: {A} for ref in refs},
+    }
+    combinations = count_combinations(join_params, datasets)
+    assert combinations == {"joins": [n_rows**2] * 4, "total": n_rows**5}
+    assert combinations["total"] > np.iinfo(np.int64).max
+
+
+def test_count_combinations_cycle() -> None:
+    """Ensure that every join must be satisfied if the joins are cyclic."""
+    datasets = {
+        REF_A: {DATASET: Dataset({ID: ["a0", "a1"], A: ["x", "y"], B: [1, 2]})},
+        REF_B: {DATASET: Dataset({ID: ["b0", "b1", "b2"], X: ["x", "x", "y"], Y: [1, 1, 1]})},
+    }
+    join_params = {
+        JOIN_LIST: [
+            {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+            {T1: {REF: REF_A, FIELD: B}, T2: {REF: REF_B, FIELD: Y}},
+        ],
+        REQD_FIELDS: {REF_A: {A, B}, REF_B: {X, Y}},
+    }
+    assert count_combinations(join_params, datasets) == {"joins": [3, 3], "total": 2}
+    assert sorted(generate_combinations(join_params, datasets)) == [("a0", "b0"), ("a0", "b1")]
+    assert combine_data(join_params, datasets) == {REF_A: {"a0"}, REF_B: {"b0", "b1"}}
+
+
+def test_get_join_variables() -> None:
+    """Ensure that fields joined directly or through other joins form a single variable."""
+    join_list = [
+        {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+        {T1: {REF: REF_C, FIELD: M}, T2: {REF: REF_D, FIELD: N}},
+        {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_C, FIELD: L}},
+        {T1: {REF: REF_D, FIELD: N}, T2: {REF: REF_A, FIELD: A}},
+    ]
+    assert get_join_variables(join_list) == [
+        [(REF_A, A), (REF_B, X), (REF_C, M), (REF_D, N)],
+        [(REF_B, Y), (REF_C, L)],
+    ]
+
+
+def make_random_cyclic_datasets(rng: random.Random, n_datasets: int) -> dict[str, Any]:
+    """Generate datasets with random tree-shaped joins between them, plus joins that form cycles.
+
+    :param rng: random number generator
+    :type rng: random.Random
+    :param n_datasets: number of datasets
+    :type n_datasets: int
+    :return: datasets, indexed by ref, and join params, with each join after the first
+        including a dataset from an earlier join
+    :rtype: dict[str, Any]
+    """
+    test_data = make_random_datasets(rng, n_datasets)
+    refs = list(test_data["datasets"])
+    for _ in range(rng.randint(1, 3)):
+        left, right = rng.sample(refs, 2)
+        test_data[JOIN_LIST].append(
+            {T1: {REF: left, FIELD: rng.choice([A, B])}, T2: {REF: right, FIELD: rng.choice([A, B])}}
+        )
+    return test_data
+
+
+def brute_force_combinations(test_data: dict[str, Any]) -> Counter:
+    """Find the combinations of IDs that satisfy every join by checking every combination of rows.
+
+    :param test_data: datasets and join params, from `make_random_cyclic_datasets`
+    :type test_data: dict[str, Any]
+    :return: count of each combination of IDs, in the order given by `get_dataset_order`
+    :rtype: Counter
+    """
+    dataset_order = get_dataset_order(test_data[JOIN_LIST])
+    datasets = [test_data["datasets"][ref][DATASET] for ref in dataset_order]
+
+    def value(row: tuple[int, ...], ref: str, field: str) -> Any:  # noqa: ANN401
+        value = datasets[dataset_order.index(ref)][field][row[dataset_order.index(ref)]]
+        # missing values match each other
+        return None if value is None or value != value else value  # noqa: PLR0124
+
+    return Counter(
+        tuple(dataset[ID][pos] for dataset, pos in zip(datasets, row, strict=True))
+        for row in product(*[range(len(dataset)) for dataset in datasets])
+        if all(
+            value(row, join[T1][REF], join[T1][FIELD]) == value(row, join[T2][REF], join[T2][FIELD])
+            for join in test_data[JOIN_LIST]
+        )
+    )
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_generic_join_equivalent_to_brute_force(seed: int) -> None:
+    """Ensure that the generic join finds the combinations that satisfy every join."""
+    rng = random.Random(seed)
+    test_data = make_random_cyclic_datasets(rng, rng.randint(2, 4))
+    expected = brute_force_combinations(test_data)
+
+    assert Counter(generate_combinations(test_data, test_data["datasets"])) == expected
+    assert count_combinations(test_data, test_data["datasets"])["total"] == expected.total()
+
+    dataset_order = get_dataset_order(test_data[JOIN_LIST])
+    if expected:
+        assert combine_data(test_data, test_data["datasets"]) == {
+            ref: {ids[ix] for ids in expected} for ix, ref in enumerate(dataset_order)
+        }
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_generate_combinations_equivalent_to_merge(seed: int) -> None:
+    """Ensure that the generated combinations are the rows of the merged dataset."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+    dataframes = make_dataframes(test_data["datasets"])
+
+    dataset_order = get_dataset_order(test_data[JOIN_LIST])
+    assert sorted(dataset_order) == sorted(test_data["datasets"])
+    merged = merge_all(test_data[JOIN_LIST], dataframes)
+    expected = Counter(
+        zip(*[merged[f"{ref}__{ID}"].tolist() for ref in dataset_order], strict=True)
+    )
+    assert Counter(generate_combinations(test_data, test_data["datasets"])) == expected
+
+
+def test_iter_combination_rows_fail_join_order() -> None:
+    """Ensure that each join must include a dataset from an earlier join."""
+    join_list = [
+        {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+        {T1: {REF: REF_C, FIELD: M}, T2: {REF: REF_D, FIELD: C}},
+    ]
+    with pytest.raises(
+        ValueError,
+        match="Each join must include a dataset from an earlier join: ref_c 'm' and ref_d 'c'",
+    ):
+        list(iter_combination_rows(join_list, make_dataframes(FETCHED_DATA)))
+
+
+def test_collect_key_statistics() -> None:
+    """Ensure that row counts, distinct values, and group sizes are collected for each join key."""
+    dataframes = {
+        REF_A: DataFrame({f"{REF_A}__{A}": [1, 1, 1, None, np.nan], f"{REF_A}__{B}": list("xyzxy")}),
+        REF_B: DataFrame({f"{REF_B}__{X}": [1, 2], f"{REF_B}__{Y}": ["x", "x"]}),
+    }
+    join_list = [
+        {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+        {T1: {REF: REF_A, FIELD: B}, T2: {REF: REF_B, FIELD: Y}},
+    ]
+    assert collect_key_statistics(join_list, dataframes) == {
+        REF_A: {
+            "rows": 5,
+            "fields": {A: {"distinct": 2, "max_group": 3}, B: {"distinct": 3, "max_group": 2}},
+        },
+        REF_B: {
+            "rows": 2,
+            "fields": {X: {"distinct": 2, "max_group": 1}, Y: {"distinct": 1, "max_group": 2}},
+        },
+    }
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_get_join_plan_orders_all_joins(seed: int) -> None:
+    """Ensure that a join plan for a tree includes every join once, adding each dataset once."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+    plan = get_join_plan(test_data[JOIN_LIST], make_dataframes(test_data["datasets"]))
+    if get_join_tree(test_data[JOIN_LIST]) is None:
+        # the generic join binds the join variables instead of adding the datasets in turn
+        assert plan == {"variables": get_generic_join_variables(test_data[JOIN_LIST])}
+        return
+    assert plan["root"] == plan["joins"][0][T1][REF]
+    assert Counter(
+        frozenset([tuple(join[T1].items()), tuple(join[T2].items())]) for join in plan["joins"]
+    ) == Counter(
+        frozenset([tuple(join[T1].items()), tuple(join[T2].items())])
+        for join in test_data[JOIN_LIST]
+    )
+    assert sorted(get_dataset_order(plan["joins"])) == sorted(test_data["datasets"])
+
+
+def test_write_combinations(tmp_path: Path) -> None:
+    """Ensure that the combined dataset is written in chunks of IDs, with matrix IDs for display."""
+    matrix = MatrixDataset(
+        {
+            ID: np.arange(4),
+            "column_id": ["pip", "pip", "pop", "pop"],
+            "row_id": ["r1", "r2", "r1", "r2"],
+            "value": [1, 0, 0, 3],
+        }
+    )
+    join_params = {
+        JOIN_LIST: [
+            {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_C, FIELD: "column_id"}},
+            {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_A, FIELD: C}},
+        ],
+        REQD_FIELDS: {REF_A: {A, C}, REF_B: {Y}, REF_C: {"column_id"}},
+    }
+    file_names = write_combinations(
+        join_params, {**FETCHED_DATA, REF_C: {DATASET: matrix}}, str(tmp_path), 3
+    )
+    assert file_names == ["combinations_00000.csv", "combinations_00001.csv"]
+
+    header = "ref_a__id,ref_c__id,ref_b__id"
+    assert (tmp_path / file_names[0]).read_text().splitlines() == [
+        header,
+        "a0,pip___r1___1,b1",
+        "a0,pip___r2___0,b1",
+        "a2,pop___r1___0,b0",
+    ]
+    assert (tmp_path / file_names[1]).read_text().splitlines() == [
+        header,
+        "a2,pop___r2___3,b0",
+    ]
+
+
+def read_combinations(directory: Path, file_names: list[str]) -> list[list[str]]:
+    """Read the rows in each of a series of combination files, without the header.
+
+    :param directory: directory holding the files
+    :type directory: Path
+    :param file_names: file names
+    :type file_names: list[str]
+    :return: lines in each file
+    :rtype: list[list[str]]
+    """
+    return [(directory / name).read_text().splitlines()[1:] for name in file_names]
+
+
+@pytest.mark.parametrize(
+    ("max_rows", "file_lengths"),
+    [(0, []), (1, [1]), (2, [2]), (3, [2, 1]), (100, [2, 1]), (None, [2, 1])],
+)
+def test_write_combinations_max_rows(
+    max_rows: int | None, file_lengths: list[int], tmp_path: Path
+) -> None:
+    """Ensure that only the first `max_rows` combinations are written."""
+    join_params = {
+        JOIN_LIST: [
+            {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}},
+            {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_C, FIELD: M}},
+        ],
+        REQD_FIELDS: {REF_A: {A}, REF_B: {X, Y}, REF_C: {M}},
+    }
+    (tmp_path / "all").mkdir()
+    (tmp_path / "limited").mkdir()
+    all_rows = [
+        row
+        for rows in read_combinations(
+            tmp_path / "all",
+            write_combinations(join_params, FETCHED_DATA, str(tmp_path / "all"), 2),
+        )
+        for row in rows
+    ]
+    assert len(all_rows) == 3  # noqa: PLR2004
+
+    limited = read_combinations(
+        tmp_path / "limited",
+        write_combinations(
+            join_params, FETCHED_DATA, str(tmp_path / "limited"), 2, max_rows=max_rows
+        ),
+    )
+    assert [len(rows) for rows in limited] == file_lengths
+    assert [row for rows in limited for row in rows] == all_rows[: sum(file_lengths)]
+
+
+def test_write_combinations_none_found(tmp_path: Path) -> None:
+    """Ensure that no files are written if there are no combinations."""
+    join_params = {
+        JOIN_LIST: [{T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: Z}}],
+        REQD_FIELDS: {REF_A: {A}, REF_B: {Z}},
+    }
+    assert write_combinations(join_params, FETCHED_DATA, str(tmp_path), 10) == []
+    assert list(tmp_path.iterdir()) == []
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_combine_data_on_disk_equivalent_to_in_memory(seed: int, tmp_path: Path) -> None:
+    """Ensure that joining on disk gives the same results and errors as joining in memory."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+
+    def run_combine_data(**kwargs: Any) -> Any:  # noqa: ANN401
+        try:
+            return combine_data(test_data, test_data["datasets"], **kwargs)
+        except RuntimeError as e:
+            return e.args
+
+    assert run_combine_data(
+        memory_budget=0, scratch_dir=str(tmp_path), data_size=1
+    ) == run_combine_data()
+
+    # the database is deleted once the joins are complete
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_combine_data_type_error(tmp_path: Path) -> None:
+    """Ensure that joins between columns that cannot be merged give the same error in each path."""
+    join_params = {
+        JOIN_LIST: [
+            {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_C, FIELD: L}},
+            {T1: {REF: REF_C, FIELD: M}, T2: {REF: REF_A, FIELD: B}},
+        ],
+        REQD_FIELDS: {REF_A: {A, B}, REF_C: {L, M}},
+    }
+    err_msg = (
+        "No matching values found between the following datasets:\n"
+        f"{REF_A} '{A}' and {REF_C} '{L}': You are trying to merge on object and int64 columns "
+        "for key 'ref_a__a'. If you wish to proceed you should use pd.concat\n"
+        f"{REF_C} '{M}' and {REF_A} '{B}'"
+    )
+    for kwargs in [{}, {"memory_budget": 0, "scratch_dir": str(tmp_path), "data_size": 1}]:
+        with pytest.raises(RuntimeError) as exc_info:
+            combine_data(join_params, FETCHED_DATA, **kwargs)
+        assert exc_info.value.args == (err_msg,)
+
+    with pytest.raises(RuntimeError) as exc_info:
+        combine_data_partitioned(join_params[JOIN_LIST], make_dataframes(FETCHED_DATA), 2)
+    assert exc_info.value.args == (err_msg,)
+
+
+@pytest.mark.parametrize("seed", range(100))
+def test_combine_data_partitioned_equivalent_to_in_memory(seed: int) -> None:
+    """Ensure that partitioned joins give the same results and errors as in-memory joins."""
+    rng = random.Random(seed)
+    test_data = make_random_datasets(rng, rng.randint(2, 6))
+    dataframes = make_dataframes(test_data["datasets"])
+
+    def run_combine_data(func: Callable[..., dict[str, set[Any]]], *args: object) -> Any:  # noqa: ANN401
+        try:
+            return func(*args)
+        except RuntimeError as e:
+            return e.args
+
+    assert run_combine_data(
+        combine_data_partitioned, test_data[JOIN_LIST], dataframes, rng.randint(2, 4)
+    ) == run_combine_data(combine_data, test_data, test_data["datasets"])
+
+
+def test_combine_data_partitioned_min_rows(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ensure that joins are only partitioned if there are enough rows and several workers."""
+    calls = []
+    original_combine_data_partitioned = combination_harvester.combine_data_partitioned
+
+    def combine_data_partitioned_wrapper(
+        join_list: list[dict[str, Any]], dataframes: dict[str, DataFrame], n_workers: int
+    ) -> dict[str, set[Any]]:
+        calls.append(n_workers)
+        return original_combine_data_partitioned(join_list, dataframes, n_workers)
+
+    monkeypatch.setattr(
+        combination_harvester, "combine_data_partitioned", combine_data_partitioned_wrapper
+    )
+    join_params = {
+        JOIN_LIST: [{T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}}],
+        REQD_FIELDS: {REF_A: {A}, REF_B: {X}},
+    }
+    expected = {REF_A: {"a0", "a2"}, REF_B: {"b0", "b1", "b2"}}
+    assert combine_data(join_params, FETCHED_DATA, n_workers=2) == expected
+    assert calls == []
+
+    monkeypatch.setattr(combination_harvester, "PARTITIONED_JOIN_MIN_ROWS", 6)
+    assert combine_data(join_params, FETCHED_DATA, n_workers=1) == expected
+    assert calls == []
+    assert combine_data(join_params, FETCHED_DATA, n_workers=2) == expected
+    assert calls == [2]
+
+
+@pytest.mark.parametrize(
+    ("memory_budget", "data_size", "on_disk"),
+    [
+        (None, None, False),
+        (None, 10**10, False),
+        (10**9, 10**9, False),
+        (10**9, 10**9 + 1, True),
+        (10**9, None, False),
+    ],
+)
+def test_combine_data_memory_budget(
+    memory_budget: int | None,
+    data_size: int | None,
+    on_disk: bool,  # noqa: FBT001
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Ensure that the datasets are only joined on disk if they exceed the memory budget."""
+    calls = []
+    original_combine_data_on_disk = combination_harvester.combine_data_on_disk
+
+    def combine_data_on_disk_wrapper(*args: Any) -> dict[str, set[Any]]:  # noqa: ANN401
+        calls.append(args[2])
+        return original_combine_data_on_disk(*args)
+
+    monkeypatch.setattr(combination_harvester, "combine_data_on_disk", combine_data_on_disk_wrapper)
+    join_params = {
+        JOIN_LIST: [{T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}}],
+        REQD_FIELDS: {REF_A: {A}, REF_B: {X}},
+    }
+    assert combine_data(
+        join_params, FETCHED_DATA, memory_budget, str(tmp_path), data_size=data_size
+    ) == {
+        REF_A: {"a0", "a2"},
+        REF_B: {"b0", "b1", "b2"},
+    }
+    assert calls == ([str(tmp_path)] if on_disk else [])
+
+
+def test_find_join_keys(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ensure that each join column is indexed once and the shared values are found."""
+    indexed = []
+    original_get_key_index = combination_harvester.get_key_index
+
+    def get_key_index(dataframe: DataFrame, column: str) -> Index:
+        """Record the columns that are indexed."""
+        indexed.append(column)
+        return original_get_key_index(dataframe, column)
+
+    monkeypatch.setattr(
+        "combinatrix.combination_harvester.get_key_index", get_key_index
+    )
+    join_list = [
+        {T1: {REF: REF_A, FIELD: C}, T2: {REF: REF_B, FIELD: Y}},
+        {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_C, FIELD: M}},
+        {T1: {REF: REF_C, FIELD: M}, T2: {REF: REF_A, FIELD: B}},
+        {T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_C, FIELD: L}},
+    ]
+    shared_keys, errors = find_join_keys(join_list, make_dataframes(FETCHED_DATA))
+    assert indexed == [
+        "ref_a__c",
+        "ref_b__y",
+        "ref_c__m",
+        "ref_a__b",
+        "ref_a__a",
+        "ref_c__l",
+    ]
+    assert [sorted(keys) for keys in shared_keys] == [["chimp", "chump"], ["chimp", "chump"], []]
+    assert errors == [
+        f"{REF_C} '{M}' and {REF_A} '{B}'",
+        f"{REF_A} '{A}' and {REF_C} '{L}': You are trying to merge on object and int64 columns "
+        "for key 'ref_a__a'. If you wish to proceed you should use pd.concat",
+    ]
+
+
+def test_combine_data_column_pruning(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ensure that only the IDs and join fields are used, and the datasets are unchanged."""
+    requested = {}
+    original_to_dataframe = Dataset.to_dataframe
+
+    def to_dataframe(self: Dataset, fieldnames: list[str] | None = None) -> DataFrame:
+        """Record the columns requested from each dataset."""
+        requested[tuple(self.fieldnames)] = fieldnames
+        return original_to_dataframe(self, fieldnames)
+
+    monkeypatch.setattr(Dataset, "to_dataframe", to_dataframe)
+    data = {
+        REF_A: {DATASET: Dataset.from_records(DATA_REF["A"])},
+        REF_B: {DATASET: Dataset.from_records(DATA_REF["B"])},
+    }
+    output = combine_data(
+        {
+            JOIN_LIST: [{T1: {REF: REF_A, FIELD: A}, T2: {REF: REF_B, FIELD: X}}],
+            REQD_FIELDS: {REF_A: {A}, REF_B: {X}},
+        },
+        data,
+    )
+    assert output == {REF_A: {"a0", "a2"}, REF_B: {"b0", "b1", "b2"}}
+    assert requested == {(ID, A, B, C): [ID, A], (ID, X, Y, Z): [ID, X]}
+    assert data[REF_A][DATASET] == Dataset.from_records(DATA_REF["A"])
+    assert data[REF_B][DATASET] == Dataset.from_records(DATA_REF["B"])
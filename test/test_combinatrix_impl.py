@@ -121,6 +121,8 @@ def test_run_combinatrix(
 
         return expected
 
+    original_render_template = renderer.render_template
+
     def render_template_wrapper(file_path: str, template_data: dict[str, Any]) -> str:
         """Perform checks on input before executing the template render function.
 
@@ -157,7 +159,7 @@ def test_run_combinatrix(
             assert f"{matrix_id[:9]}-unique-id" in sample_ids
 
         assert object_data[MATRIX]["display"][KEYS] is None
-        return renderer.render_template(file_path, template_data)
+        return original_render_template(file_path, template_data)
 
     # monkeypatch the `create_extended_report` method so that it doesn't get called
     monkeypatch.setattr(KBaseReport, "create_extended_report", mock_create_ext_report)
@@ -1,16 +1,21 @@
 """Tests for the converter."""
 
+import logging
+from copy import deepcopy
+from pathlib import Path
 from typing import Any
 
 import pytest
-from combinatrix.constants import DATA, DL, FN, INFO
+from combinatrix.constants import DATA, DATASET, DL, FN, INFO, KEYS
 from combinatrix.converter import (
-    convert_data,
     convert_list_of_dicts_to_list_of_lists,
     convert_matrix,
     convert_samples,
     convert_ws_object,
+    get_included_paths,
+    save_as_csv,
 )
+from combinatrix.dataset import Dataset, MatrixDataset
 from combinatrix.util import get_upa
 
 UPA_DATA = {
@@ -48,6 +53,20 @@ def test_convert_ws_object_fail(param: str) -> None:
         )
 
 
+@pytest.mark.parametrize(
+    ("data_type", "expected"),
+    [
+        ("KBaseSets.SampleSet-2.0", ["/samples"]),
+        ("KBaseMatrices.AmpliconMatrix-10.0", ["/data/row_ids", "/data/col_ids", "/data/values"]),
+        ("SomeRandomMadeUpType-6.66", None),
+        ("KBaseMatrix.SampleSet-1.1", None),
+    ],
+)
+def test_get_included_paths(data_type: str, expected: list[str] | None) -> None:
+    """Check that only the paths used by the converter are requested from the workspace."""
+    assert get_included_paths(data_type) == expected
+
+
 @pytest.mark.parametrize(
     (DL, FN, "expected"),
     [
@@ -123,6 +142,15 @@ EXPECTED_DICT_LIST = [
     {"column_id": "B", "row_id": "Y", "value": 4, "id": "B___Y___4"},
 ]
 
+EXPECTED_MATRIX_DATASET = MatrixDataset(
+    {
+        "id": [0, 1, 2, 3],
+        "column_id": ["A", "A", "B", "B"],
+        "row_id": ["X", "Y", "X", "Y"],
+        "value": [1, 3, 2, 4],
+    }
+)
+
 
 def test_convert_matrix() -> None:
     """Ensure that matrices are correctly converted."""
@@ -132,14 +160,16 @@ def test_convert_matrix() -> None:
         {INFO: {"type": "SuperCoolMatrix"}, DATA: {DATA: EXAMPLE_MATRIX}}
     )
 
-    # Check if the fieldnames set contains the expected fields
-    expected_fieldnames = {"id", "column_id", "row_id", "value"}
-    assert result[FN] == expected_fieldnames
-    assert data_result[FN] == result[FN]
+    # Check if the dataset contains the expected fields
+    assert result[DATASET].fieldnames == ["id", "column_id", "row_id", "value"]
 
-    # Check if the dict_list is generated correctly
-    assert result[DL] == EXPECTED_DICT_LIST
-    assert data_result[DL] == result[DL]
+    # Check if the dataset is generated correctly
+    assert result[DATASET] == EXPECTED_MATRIX_DATASET
+    assert data_result[DATASET] == result[DATASET]
+
+    # cells are keyed by position; readable IDs are generated for display
+    assert result[DATASET].to_records() == EXPECTED_DICT_LIST
+    assert result[DATASET].format_ids([3, 0]) == ["B___Y___4", "A___X___1"]
 
 
 @pytest.mark.parametrize(
@@ -247,55 +277,123 @@ def test_convert_sample_fail_no_node_trees(
         convert_samples(fixture_value["input"])
 
 
-def test_convert_data_all_ok(
+def test_convert_ws_object_all_ok(
     samples_b: dict[str, Any],
     samples_all_controlled: dict[str, Any],
     samples_no_fields: dict[str, Any],
     samples_node_tree_multiple_under_node: dict[str, Any],
 ) -> None:
-    """Ensure that all data is converted correctly."""
+    """Ensure that each data type is sent to the right converter."""
     matrix_data = {
         INFO: {"type": "AwesomeMatrix", "wsid": 12345, "objid": 67890, "version": 1},
         DATA: {DATA: EXAMPLE_MATRIX},
     }
-    function_input = {get_upa(matrix_data): matrix_data}
-    expected = {
-        get_upa(matrix_data): {
-            **matrix_data,
-            FN: {"id", "column_id", "row_id", "value"},
-            DL: EXPECTED_DICT_LIST,
+    assert convert_ws_object(matrix_data) == {DATASET: EXPECTED_MATRIX_DATASET}
+
+    for test_case in [
+        samples_all_controlled,
+        samples_b,
+        samples_no_fields,
+        samples_node_tree_multiple_under_node,
+    ]:
+        assert {**test_case["input"], **convert_ws_object(test_case["input"])} == {
+            **test_case["input"],
+            **test_case["output"],
         }
-    }
 
-    files_by_ref = {
-        "12345/100/1": samples_all_controlled,
-        "12345/1/1": samples_b,
-        "12345/9/1": samples_no_fields,
-        "12345/6/1": samples_node_tree_multiple_under_node,
-    }
 
-    for ref in files_by_ref:
-        test_case = files_by_ref[ref]
-        function_input[ref] = test_case["input"]
-        expected[ref] = {**test_case["input"], **test_case["output"]}
+@pytest.mark.parametrize("test_file", ["samples_node_tree_0", "samples_node_tree_multiple"])
+def test_convert_ws_object_fail_no_node_trees(
+    request: pytest.FixtureRequest, test_file: str
+) -> None:
+    """Incorrect number of node trees for a given sample ID."""
+    fixture_value = request.getfixturevalue(test_file)
+    with pytest.raises(ValueError, match=fixture_value["error"]):
+        convert_ws_object(fixture_value["input"])
 
-    assert expected == convert_data(function_input)
 
+@pytest.mark.parametrize(
+    "values",
+    [
+        pytest.param([[1, 2], [3]], id="ragged"),
+        pytest.param([[1, 2]], id="too_few_rows"),
+        pytest.param([[1, 2, 5], [3, 4, 6]], id="too_many_cols"),
+        pytest.param([[[1], [2]], [[3], [4]]], id="too_many_dimensions"),
+    ],
+)
+def test_convert_matrix_fail_wrong_dimensions(values: list[Any]) -> None:
+    """Ensure that the values must match the row and column IDs."""
+    with pytest.raises(
+        ValueError,
+        match="12345/89/67: 'data.data.values' does not match the dimensions given by "
+        "'data.data.row_ids' and 'data.data.col_ids'",
+    ):
+        convert_matrix({**UPA_DATA, DATA: {DATA: {**EXAMPLE_MATRIX, "values": values}}})
+
+
+def test_convert_matrix_value_types() -> None:
+    """Ensure that values are passed through unchanged, whatever their type."""
+    matrix = {"col_ids": ["A", 2], "row_ids": ["X"], "values": [[1.0, "two"]]}
+    assert convert_matrix({DATA: {DATA: matrix}})[DATASET].to_records() == [
+        {"column_id": "A", "row_id": "X", "value": 1.0, "id": "A___X___1.0"},
+        {"column_id": 2, "row_id": "X", "value": "two", "id": "2___X___two"},
+    ]
+
+
+def test_save_as_csv(tmp_path: Path) -> None:
+    """Ensure that datasets are written out with the fields in display order."""
+    dataset = Dataset.from_records(
+        [
+            {"a": 1, "b": 2.5, "name": "blah", "id": 12345},
+            {"a": 3, "id": 12365},
+            {"b": "", "name": "blob, blobby"},
+        ]
+    )
+    csv_file = save_as_csv({DATASET: dataset}, str(tmp_path / "output.csv"))
+    assert csv_file == str(tmp_path / "output.csv")
+    with open(csv_file, newline="") as fh:
+        assert fh.read() == (
+            "id,name,a,b\r\n"
+            "12345,blah,1,2.5\r\n"
+            "12365,,3,\r\n"
+            ',"blob, blobby",,\r\n'
+        )
 
-def test_convert_data_fail_no_node_trees(
-    samples_node_tree_0: dict[str, Any], samples_node_tree_multiple: dict[str, Any]
-) -> None:
-    """Incorrect number of node trees for a given sample ID."""
-    function_input = {
-        "samples_node_tree_0": samples_node_tree_0["input"],
-        "samples_node_tree_multiple": samples_node_tree_multiple["input"],
-    }
 
+def test_save_as_csv_fail_empty(tmp_path: Path) -> None:
+    """Ensure that an error is thrown if there is no data to save."""
     with pytest.raises(
-        RuntimeError,
-        match="Errors running data conversion for the Combinatrix:",
-    ) as e:
-        convert_data(function_input)
-    error_msg = e.value.args[0]
-    assert samples_node_tree_multiple["error"] in error_msg
-    assert samples_node_tree_0["error"] in error_msg
+        ValueError,
+        match="Must supply a dataset with at least one row and one field for conversion to CSV",
+    ):
+        save_as_csv({DATASET: Dataset({"a": []})}, str(tmp_path / "output.csv"))
+
+
+def test_convert_samples_unrecognised_metadata(
+    samples_b: dict[str, Any], caplog: pytest.LogCaptureFixture
+) -> None:
+    """Ensure that metadata in an unrecognised format is saved as JSON and reported once."""
+    input_data = deepcopy(samples_b["input"])
+    for sample in input_data[DATA]["sample_data"]:
+        node_tree = sample["node_tree"][0]
+        node_tree["meta_user"]["odd_value"] = {"value": 1, "units": "m", "extra": "x"}
+        node_tree["meta_user"]["no_value"] = {"units": "m"}
+    original_input = deepcopy(input_data)
+
+    with caplog.at_level(logging.WARNING, logger="combinatrix.converter"):
+        output = convert_samples(input_data)
+
+    # the input data is not altered
+    assert input_data == original_input
+    n_samples = len(input_data[DATA]["sample_data"])
+    assert output[DATASET]["odd_value"].tolist() == [
+        '{\n"value": 1,\n"units": "m",\n"extra": "x"\n}'
+    ] * n_samples
+    assert output[DATASET]["no_value"].tolist() == ['{\n"units": "m"\n}'] * n_samples
+    assert {"odd_value", "no_value"} <= output[KEYS]["user"]
+
+    assert len(caplog.records) == 1
+    assert caplog.records[0].getMessage() == (
+        f"{get_upa(input_data)}: metadata values in an unrecognised format were saved as JSON: "
+        f"keys value, units, extra ({n_samples} values); keys units ({n_samples} values)"
+    )
@@ -1,10 +1,17 @@
 """Tests for the combinatrix core."""
 
+import os
+import time
+from collections.abc import Iterator
+from pathlib import Path
 from test.test_data_fetcher import INVALID_DATA_FETCHER_PARAMS
 from typing import Any
 
 import pytest
+from combinatrix import converter
+from combinatrix.constants import DATA, DATASET, INFO, PLAN, PLAN_IN_MEMORY
 from combinatrix.core import AppCore
+from combinatrix.fetcher import DataFetcher
 
 
 @pytest.mark.parametrize("param", INVALID_DATA_FETCHER_PARAMS)
@@ -36,3 +43,90 @@ def test_run_fail_cannot_init_report_client(
     err_msg = param.get("err", f"{param["input"]} isn't a valid http url")
     with pytest.raises(ValueError, match=err_msg):
         core.run({})
+
+
+def make_matrix(objid: int) -> dict[str, Any]:
+    """Generate a small matrix workspace object."""
+    return {
+        INFO: {"wsid": 1, "objid": objid, "version": 1, "type": "KBaseMatrices.AmpliconMatrix-1.0"},
+        DATA: {DATA: {"row_ids": ["r1"], "col_ids": ["c1", "c2"], "values": [[1.0, 2.0]]}},
+    }
+
+
+def test_fetch_and_convert_pipelined(
+    config: dict[str, Any],
+    context: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Ensure that datasets are converted and saved while later datasets are still being fetched."""
+    events = []
+    original_save_as_csv = converter.save_as_csv
+
+    def iter_objects_by_ref(
+        _: DataFetcher, ref_list: list[str], __: dict[str, Any]
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Yield the objects in reverse order, with a delay before each one."""
+        for ref in reversed(ref_list):
+            time.sleep(0.05)
+            events.append(f"fetched {ref}")
+            yield ref, make_matrix(int(ref.split("/")[1]))
+
+    def save_as_csv(data: dict[str, Any], csv_file: str) -> str:
+        """Record when each file is saved."""
+        events.append(f"saved {os.path.basename(csv_file)}")
+        return original_save_as_csv(data, csv_file)
+
+    monkeypatch.setattr(DataFetcher, "iter_objects_by_ref", iter_objects_by_ref)
+    monkeypatch.setattr(converter, "save_as_csv", save_as_csv)
+
+    app_core = AppCore(config, context, "None")
+    fetcher = DataFetcher(config, context)
+    timing = {}
+    ref_list = ["1/1/1", "1/2/1", "1/3/1"]
+    preflight = {INFO: {ref: {} for ref in ref_list}, PLAN: PLAN_IN_MEMORY}
+    output = app_core.fetch_and_convert(fetcher, preflight, str(tmp_path), timing)
+
+    # the first object is saved before the last one is fetched
+    assert events.index("saved 1_3_1.csv") < events.index("fetched 1/1/1")
+    # output is in the same order as the input
+    assert list(output) == ref_list
+    for ref in ref_list:
+        assert output[ref]["csv_file"] == f"{ref.replace('/', '_')}.csv"
+        assert os.path.isfile(tmp_path / output[ref]["csv_file"])
+        assert len(output[ref][DATASET]) == 2  # noqa: PLR2004
+    assert set(timing) == {"fetch_objs", "convert", "save_csv"}
+
+
+def test_fetch_and_convert_errors(
+    config: dict[str, Any],
+    context: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Ensure that conversion errors are collected and reported in input order."""
+
+    def iter_objects_by_ref(
+        _: DataFetcher, ref_list: list[str], __: dict[str, Any]
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Yield the objects in reverse order; the first and last have no matrix data."""
+        for ref in reversed(ref_list):
+            matrix = make_matrix(int(ref.split("/")[1]))
+            if ref != "1/2/1":
+                matrix[DATA] = {}
+            yield ref, matrix
+
+    monkeypatch.setattr(DataFetcher, "iter_objects_by_ref", iter_objects_by_ref)
+    app_core = AppCore(config, context, "None")
+    fetcher = DataFetcher(config, context)
+    with pytest.raises(
+        RuntimeError,
+        match="^Errors running data conversion for the Combinatrix:\n"
+        "1/1/1: no 'data.data' field found\n1/3/1: no 'data.data' field found$",
+    ):
+        app_core.fetch_and_convert(
+            fetcher,
+            {INFO: {ref: {} for ref in ["1/1/1", "1/2/1", "1/3/1"]}, PLAN: PLAN_IN_MEMORY},
+            str(tmp_path),
+            {},
+        )
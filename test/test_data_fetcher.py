@@ -1,12 +1,40 @@
 """Tests for the data fetching code."""
+import io
+import json
 import logging
+import re
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import Future, wait
+from pathlib import Path
 from test.conftest import TEST_UPA, paramify
 from test.conftest import body_match_vcr as vcr
 from typing import Any
 
 import pytest
-from combinatrix.constants import DATA, INFO
-from combinatrix.fetcher import DataFetcher
+import requests
+from combinatrix.constants import (
+    DATA,
+    DEFAULT_SAMPLE_FETCH_WORKERS,
+    HTTP_TIMEOUT,
+    INFO,
+    MB,
+    PLAN,
+    PLAN_CHUNKED,
+    PLAN_IN_MEMORY,
+)
+from combinatrix.converter import get_included_paths
+from combinatrix.fetcher import (
+    DataFetcher,
+    get_object_cache_key,
+    get_sample_cache_key,
+    get_sample_key,
+)
+from installed_clients.WorkspaceClient import Workspace
+
+MATRIX_TYPE = "KBaseMatrices.AmpliconMatrix-10.0"
+SAMPLESET_TYPE = "KBaseSets.SampleSet-2.0"
 
 INVALID_DATA_FETCHER_PARAMS = [
     pytest.param([None, None], id="two_nones"),
@@ -51,7 +79,7 @@ def test_init(param: list[Any]) -> None:
         },
     ])
 )
-def test_fetch_objects_by_ref_missing_items(
+def test_iter_objects_by_ref_missing_items(
     param: dict[str, Any], data_fetcher: DataFetcher
 ) -> None:
     """Check that missing refs are reported correctly."""
@@ -61,7 +89,7 @@ def test_fetch_objects_by_ref_missing_items(
             ValueError,
             match=f"The following KBase objects could not be retrieved: {param['missing']}",
         ):
-            data_fetcher.fetch_objects_by_ref(param["ref_list"])
+            dict(data_fetcher.iter_objects_by_ref(param["ref_list"]))
 
 
 @pytest.mark.parametrize(
@@ -79,14 +107,14 @@ def test_fetch_objects_by_ref_missing_items(
         }
     ])
 )
-def test_fetch_objects_by_ref_with_samples(
+def test_iter_objects_by_ref_with_samples(
     param: dict[str, Any], data_fetcher: DataFetcher
 ) -> None:
     """Ensure that samples are fetched from the sampleset."""
     with vcr.use_cassette(
         f"test/data/cassettes/{param["id"]}.yaml",
     ):
-        output = data_fetcher.fetch_objects_by_ref(param["ref_list"])
+        output = dict(data_fetcher.iter_objects_by_ref(param["ref_list"]))
 
     for ref in param["ref_list"]:
         assert ref in output
@@ -101,3 +129,499 @@ def test_fetch_objects_by_ref_with_samples(
             }
         else:
             assert "sample_data" not in output[ref][DATA]
+
+
+@pytest.mark.parametrize(
+    "param",
+    [
+        pytest.param({}, id="absent"),
+        pytest.param({"sample-fetch-workers": ""}, id="empty"),
+        pytest.param({"sample-fetch-workers": "12"}, id="set"),
+    ],
+)
+def test_init_sample_fetch_workers(
+    param: dict[str, str], config: dict[str, str], context: dict[str, Any]
+) -> None:
+    """Check that the sample fetch concurrency limit is read from the config."""
+    cfg = {k: v for k, v in config.items() if k != "sample-fetch-workers"}
+    fetcher = DataFetcher({**cfg, **param}, context)
+    assert fetcher.sample_fetch_workers == int(
+        param.get("sample-fetch-workers") or DEFAULT_SAMPLE_FETCH_WORKERS
+    )
+
+
+@pytest.mark.parametrize("value", ["0", "-3", "lots"])
+def test_init_sample_fetch_workers_invalid(
+    value: str, config: dict[str, str], context: dict[str, Any]
+) -> None:
+    """Check that an invalid sample fetch concurrency limit is rejected."""
+    with pytest.raises(
+        ValueError,
+        match=f"Config setting 'sample-fetch-workers' must be a positive integer; got '{value}'",
+    ):
+        DataFetcher({**config, "sample-fetch-workers": value}, context)
+
+
+def test_iter_objects_by_ref_sample_errors(
+    data_fetcher: DataFetcher, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Ensure that SampleService errors are reported for each SampleSet that failed."""
+    failing_upa = TEST_UPA["SAMPLESET_B"]
+    # one of the samples in SAMPLESET_B
+    failing_sample = "e2114bfa-5716-4e70-ad17-e97c35120b5a"
+
+    original_fetch_sample_batch = DataFetcher.fetch_sample_batch
+
+    def fetch_sample_batch_wrapper(
+        fetcher: DataFetcher, sample_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Raise an error for the samples from one of the SampleSets."""
+        if failing_sample in {sample["id"] for sample in sample_list}:
+            err_msg = "Error from SampleService - it broke"
+            raise RuntimeError(err_msg)
+        return original_fetch_sample_batch(fetcher, sample_list)
+
+    monkeypatch.setattr(DataFetcher, "fetch_sample_batch", fetch_sample_batch_wrapper)
+
+    with vcr.use_cassette(
+        "test/data/cassettes/multi_sampleset.yaml",
+    ), pytest.raises(
+        RuntimeError,
+        match=f"^Errors retrieving sample data:\n{failing_upa}: Error from SampleService - it broke$",
+    ):
+        dict(
+            data_fetcher.iter_objects_by_ref(
+                [TEST_UPA["AMPLICON"], TEST_UPA["SAMPLESET_A"], failing_upa]
+            )
+        )
+
+
+def fetch_samplesets(
+    fetcher: DataFetcher, samplesets: dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> dict[str, Any]:
+    """Retrieve the samples for a set of SampleSets, as in a run of the app.
+
+    The SampleSets are returned by a fake workspace; the info for each is added in place.
+
+    :param fetcher: data fetcher
+    :type fetcher: DataFetcher
+    :param samplesets: SampleSet workspace objects, without the object info, indexed by UPA
+    :type samplesets: dict[str, Any]
+    :param monkeypatch: pytest monkeypatch fixture
+    :type monkeypatch: pytest.MonkeyPatch
+    :return: SampleSets, including the sample data, indexed by UPA
+    :rtype: dict[str, Any]
+    """
+    for upa, sampleset in samplesets.items():
+        wsid, objid, version = upa.split("/")
+        sampleset[INFO] = {"wsid": wsid, "objid": objid, "version": version, "type": SAMPLESET_TYPE}
+
+    def iter_ws_objects_by_ref(
+        _: DataFetcher, ref_list: list[str], __: dict[str, Any]
+    ) -> Iterator[tuple[str, dict[str, Any]]]:
+        """Return the SampleSets."""
+        for ref in ref_list:
+            yield ref, samplesets[ref]
+
+    monkeypatch.setattr(DataFetcher, "iter_ws_objects_by_ref", iter_ws_objects_by_ref)
+    return dict(fetcher.iter_objects_by_ref(list(samplesets), {INFO: {}, PLAN: PLAN_IN_MEMORY}))
+
+
+@pytest.mark.parametrize("workers", [1, 2, 4])
+def test_fetch_samples_concurrency(
+    workers: int, config: dict[str, str], context: dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Ensure that SampleService requests run concurrently, up to the configured limit."""
+    lock = threading.Lock()
+    in_flight = {"now": 0, "max": 0}
+
+    def fake_fetch_sample_batch(
+        _: DataFetcher, sample_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Record the number of simultaneous requests."""
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(0.05)
+        with lock:
+            in_flight["now"] -= 1
+        return [{"id": sample["id"], "name": sample["id"]} for sample in sample_list]
+
+    monkeypatch.setattr(DataFetcher, "fetch_sample_batch", fake_fetch_sample_batch)
+    fetcher = DataFetcher({**config, "sample-fetch-workers": str(workers)}, context)
+
+    samplesets = {
+        f"1/{n}/1": {DATA: {"samples": [{"id": f"sample_{n}", "version": 1}]}}
+        for n in range(6)
+    }
+    fetch_samplesets(fetcher, samplesets, monkeypatch)
+
+    assert in_flight["max"] == workers
+    for n in range(6):
+        assert samplesets[f"1/{n}/1"][DATA]["sample_data"] == [
+            {"id": f"sample_{n}", "name": f"sample_{n}"}
+        ]
+
+
+def test_fetch_samples_waits_for_running_batches(
+    config: dict[str, str], context: dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Ensure that only the sample batches still running are waited on."""
+    waited = []
+
+    def record_wait(futures: set[Future], **kwargs: Any) -> Any:  # noqa: ANN401
+        """Record whether any of the futures had already finished."""
+        waited.append(any(future.done() for future in futures))
+        return wait(futures, **kwargs)
+
+    def slow_first_batch(
+        fetcher: DataFetcher, sample_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Make the first batch take longer than the others."""
+        if sample_list[0]["id"] == "sample_0":
+            time.sleep(0.2)
+        return fake_sample_batch(fetcher, sample_list)
+
+    monkeypatch.setattr("combinatrix.fetcher.wait", record_wait)
+    monkeypatch.setattr(DataFetcher, "fetch_sample_batch", slow_first_batch)
+    fetcher = DataFetcher(
+        {**config, "sample-fetch-workers": "2", "sample-batch-size": "1"}, context
+    )
+    sample_list = [{"id": f"sample_{n}", "version": 1} for n in range(5)]
+    samplesets = {"1/1/1": {DATA: {"samples": sample_list}}}
+    fetch_samplesets(fetcher, samplesets, monkeypatch)
+
+    assert samplesets["1/1/1"][DATA]["sample_data"] == sample_list
+    # one wait per batch at most, none of them including a finished batch
+    assert 0 < len(waited) <= len(sample_list)
+    assert not any(waited)
+
+
+def fake_sample_batch(
+    _: DataFetcher, sample_list: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """Return fake sample data; earlier batches take longer to arrive than later ones."""
+    time.sleep(0.01 * (10 - int(sample_list[0]["id"].split("_")[1]) // 3))
+    return [{"id": sample["id"], "version": sample["version"]} for sample in sample_list]
+
+
+@pytest.mark.parametrize("batch_size", [1, 3, 7, 30, 1000])
+def test_fetch_samples_in_batches(
+    batch_size: int,
+    config: dict[str, str],
+    context: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Ensure that large SampleSets are split into batches and reassembled in order."""
+    batch_sizes = []
+
+    def record_batch(fetcher: DataFetcher, sample_list: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Record the size of each batch requested."""
+        batch_sizes.append(len(sample_list))
+        return fake_sample_batch(fetcher, sample_list)
+
+    monkeypatch.setattr(DataFetcher, "fetch_sample_batch", record_batch)
+    fetcher = DataFetcher(
+        {**config, "sample-fetch-workers": "4", "sample-batch-size": str(batch_size)}, context
+    )
+    sample_list = [{"id": f"sample_{n}", "version": 1} for n in range(30)]
+
+    samplesets = {
+        "1/1/1": {DATA: {"samples": sample_list}},
+        "1/2/1": {DATA: {"samples": sample_list[:5]}},
+    }
+    fetch_samplesets(fetcher, samplesets, monkeypatch)
+    assert samplesets["1/1/1"][DATA]["sample_data"] == sample_list
+    assert samplesets["1/2/1"][DATA]["sample_data"] == sample_list[:5]
+    # samples shared between SampleSets are only requested once
+    assert sum(batch_sizes) == len(sample_list)
+    assert max(batch_sizes) == min(batch_size, len(sample_list))
+
+
+def test_iter_objects_by_ref_cached(
+    config: dict[str, str],
+    context: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Ensure that cached objects are only returned if the user can access them."""
+    ref = TEST_UPA["AMPLICON"]
+    fetcher = DataFetcher({**config, "cache-dir": str(tmp_path)}, context)
+
+    with vcr.use_cassette("test/data/cassettes/no_sampleset.yaml"):
+        output = dict(fetcher.iter_objects_by_ref([ref]))
+    assert fetcher.object_cache is not None
+    cache_key = get_object_cache_key(ref, get_included_paths(output[ref][INFO]["type"]))
+    assert fetcher.object_cache.get(cache_key) == output[ref][DATA]
+    # only the projected data is cached
+    assert fetcher.object_cache.get(ref) is None
+
+    info_params = []
+
+    def get_object_info3(_: Workspace, params: dict[str, Any]) -> dict[str, Any]:
+        """Return the object info if the object is accessible."""
+        info_params.append(params)
+        return {"infostructs": [output[ref][INFO] if accessible else None]}
+
+    def iter_ws_objects(*_: Any) -> None:  # noqa: ANN401
+        """The object should not be fetched from the workspace."""
+        err_msg = "iter_ws_objects should not be called"
+        raise AssertionError(err_msg)
+
+    monkeypatch.setattr(Workspace, "get_object_info3", get_object_info3)
+    monkeypatch.setattr(DataFetcher, "iter_ws_objects", iter_ws_objects)
+    accessible = True
+    cached_output = dict(fetcher.iter_objects_by_ref([ref]))
+    assert cached_output == {ref: {INFO: output[ref][INFO], DATA: output[ref][DATA]}}
+    assert info_params[0]["objects"] == [{"ref": ref}]
+    # only the type and size are needed, so the object metadata is not requested
+    assert "includeMetadata" not in info_params[0]
+
+    # if the user can no longer see the object, the cached copy is not returned
+    accessible = False
+    with pytest.raises(
+        ValueError, match=f"The following KBase objects could not be retrieved: {ref}"
+    ):
+        dict(fetcher.iter_objects_by_ref([ref]))
+    assert len(info_params) == 2  # noqa: PLR2004
+
+
+def test_fetch_samples_shared_and_cached(
+    config: dict[str, str],
+    context: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Ensure that samples are fetched once per run and not re-fetched if they are cached."""
+    requested = []
+
+    def record_batch(fetcher: DataFetcher, sample_list: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """Record the samples requested."""
+        requested.extend(get_sample_key(sample) for sample in sample_list)
+        return fake_sample_batch(fetcher, sample_list)
+
+    monkeypatch.setattr(DataFetcher, "fetch_sample_batch", record_batch)
+    fetcher = DataFetcher(
+        {**config, "cache-dir": str(tmp_path)}, {**context, "user_id": "some_user"}
+    )
+    sample_list = [{"id": f"sample_{n}", "version": 1} for n in range(10)]
+
+    def make_samplesets() -> dict[str, Any]:
+        """Generate SampleSets that share some of their samples."""
+        return {
+            "1/1/1": {DATA: {"samples": sample_list[:6]}},
+            "1/2/1": {DATA: {"samples": sample_list[3:]}},
+            "1/3/1": {DATA: {"samples": [*sample_list[8:], {"id": "sample_1", "version": 2}]}},
+        }
+
+    samplesets = make_samplesets()
+    fetch_samplesets(fetcher, samplesets, monkeypatch)
+    assert sorted(requested) == sorted(
+        [get_sample_key(sample) for sample in sample_list] + ["sample_1/2"]
+    )
+    for upa in samplesets:
+        assert samplesets[upa][DATA]["sample_data"] == samplesets[upa][DATA]["samples"]
+
+    # second run: everything comes from the cache
+    requested.clear()
+    samplesets = make_samplesets()
+    fetch_samplesets(fetcher, samplesets, monkeypatch)
+    assert requested == []
+    for upa in samplesets:
+        assert samplesets[upa][DATA]["sample_data"] == samplesets[upa][DATA]["samples"]
+
+    # only the evicted sample is fetched again
+    assert fetcher.sample_cache is not None
+    fetcher.sample_cache.delete(get_sample_cache_key("some_user", {"id": "sample_4", "version": 1}))
+    samplesets = make_samplesets()
+    fetch_samplesets(fetcher, samplesets, monkeypatch)
+    assert requested == ["sample_4/1"]
+    assert samplesets["1/1/1"][DATA]["sample_data"] == sample_list[:6]
+
+
+def test_fetch_samples_cached_access(
+    config: dict[str, str],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: Path,
+) -> None:
+    """Ensure that cached samples are not returned to users who cannot access them."""
+    sample_list = [{"id": f"sample_{n}", "version": 1} for n in range(3)]
+
+    def check_access(
+        fetcher: DataFetcher, sample_list: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """Only return samples to the user who owns them."""
+        if fetcher.token != owner.token:
+            err_msg = "Error from SampleService - Sample service error code 20000 Unauthorized"
+            raise RuntimeError(err_msg)
+        return fake_sample_batch(fetcher, sample_list)
+
+    monkeypatch.setattr(DataFetcher, "fetch_sample_batch", check_access)
+    cache_config = {**config, "cache-dir": str(tmp_path)}
+    owner = DataFetcher(cache_config, {"token": "owner_token", "user_id": "owner"})
+    fetch_samplesets(owner, {"1/1/1": {DATA: {"samples": sample_list}}}, monkeypatch)
+    assert owner.sample_cache is not None
+    assert owner.sample_cache.get(get_sample_cache_key("owner", sample_list[0])) is not None
+
+    for context in [{"token": "other_token", "user_id": "other"}, {"token": "other_token"}]:
+        other = DataFetcher(cache_config, context)
+        with pytest.raises(
+            RuntimeError, match="^Errors retrieving sample data:\n1/1/1: .*Unauthorized$"
+        ):
+            fetch_samplesets(other, {"1/1/1": {DATA: {"samples": sample_list}}}, monkeypatch)
+
+
+def make_response(status_code: int, body: str) -> requests.Response:
+    """Generate a streamable response with the given status code and body."""
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.raw = io.BytesIO(body.encode())
+    return resp
+
+
+def test_iter_ws_objects(data_fetcher: DataFetcher, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ensure that workspace objects are decoded correctly from the response stream."""
+    objects = [
+        {DATA: {DATA: {"row_ids": ["r1", "r2"], "col_ids": ["c1"], "values": [[1.5], [2.0]]}}},
+        None,
+    ]
+    body = json.dumps({"version": "1.1", "result": [{DATA: objects}]})
+    sent = {}
+
+    def post(**kwargs: Any) -> requests.Response:  # noqa: ANN401
+        """Record the request and return the workspace response."""
+        sent.update(kwargs)
+        return make_response(200, body)
+
+    monkeypatch.setattr(data_fetcher.session, "post", post)
+    params = {"objects": [{"ref": "1/2/3"}, {"ref": "4/5/6"}]}
+    results = list(data_fetcher.iter_ws_objects(params))
+    assert results == objects
+    # numbers are decoded as floats, not Decimals
+    assert isinstance(results[0][DATA][DATA]["values"][1][0], float)
+    assert sent["stream"] is True
+    assert sent["timeout"] == HTTP_TIMEOUT
+    assert json.loads(sent["data"])["params"] == [params]
+
+
+@pytest.mark.parametrize(
+    ("status_code", "body", "error"),
+    [
+        (
+            500,
+            '{"version": "1.1", "error": {"name": "JSONRPCError", "message": "Oh no!"}}',
+            "Error from Workspace - {'name': 'JSONRPCError', 'message': 'Oh no!'}",
+        ),
+        (502, "Bad Gateway", "Error from Workspace - Bad Gateway"),
+        (200, '{"version": "1.1", "result": [{"data": [', "could not parse response"),
+        (200, '{"version": "1.1", "result": [{"data": [null]}]}', "expected 2 objects, got 1"),
+    ],
+)
+def test_iter_ws_objects_errors(
+    status_code: int,
+    body: str,
+    error: str,
+    data_fetcher: DataFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Ensure that errors from the workspace are reported."""
+    monkeypatch.setattr(
+        data_fetcher.session, "post", lambda **_: make_response(status_code, body)
+    )
+    with pytest.raises(RuntimeError, match=re.escape(error)):
+        list(data_fetcher.iter_ws_objects({"objects": [{"ref": "1/2/3"}, {"ref": "4/5/6"}]}))
+
+
+def make_info(objid: int, data_type: str, size: int) -> dict[str, Any]:
+    """Generate a workspace object info structure."""
+    return {"wsid": 1, "objid": objid, "version": 1, "type": data_type, "size": size}
+
+
+@pytest.mark.parametrize(
+    ("sizes", "plan"),
+    [
+        ([1, 2, 3], PLAN_IN_MEMORY),
+        ([MB, 2 * MB], PLAN_IN_MEMORY),
+        ([MB, 2 * MB + 1], PLAN_CHUNKED),
+        ([4 * MB], PLAN_CHUNKED),
+    ],
+)
+def test_preflight_plan(
+    sizes: list[int],
+    plan: str,
+    config: dict[str, str],
+    context: dict[str, Any],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Ensure that the fetch plan is chosen according to the total size of the objects."""
+    infos = [make_info(n, MATRIX_TYPE, size) for n, size in enumerate(sizes)]
+    monkeypatch.setattr(Workspace, "get_object_info3", lambda *_: {"infostructs": infos})
+    fetcher = DataFetcher(
+        {**config, "chunked-fetch-threshold-mb": "3", "max-object-size-mb": "5"}, context
+    )
+    ref_list = [f"1/{n}/1" for n in range(len(sizes))]
+    assert fetcher.preflight(ref_list) == {INFO: dict(zip(ref_list, infos, strict=True)), PLAN: plan}
+
+
+def test_preflight_errors(
+    config: dict[str, str], context: dict[str, Any], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Ensure that objects without a converter and objects that are too large are rejected."""
+    infos = [
+        make_info(1, MATRIX_TYPE, 100),
+        make_info(2, "KBaseGenomes.Genome-17.0", 100),
+        make_info(3, SAMPLESET_TYPE, 3 * MB),
+        make_info(4, "SomeRandomMadeUpType-6.66", 5 * MB),
+    ]
+    monkeypatch.setattr(Workspace, "get_object_info3", lambda *_: {"infostructs": infos})
+    fetcher = DataFetcher({**config, "max-object-size-mb": "2"}, context)
+    err_msg = (
+        "The following KBase objects cannot be processed by the Combinatrix:\n"
+        "1/2/1: no dedicated converter found for KBaseGenomes.Genome-17.0\n"
+        "1/3/1: object size (3.0 MB) is larger than the maximum of 2 MB\n"
+        "1/4/1: no dedicated converter found for SomeRandomMadeUpType-6.66\n"
+        "1/4/1: object size (5.0 MB) is larger than the maximum of 2 MB"
+    )
+    with pytest.raises(ValueError, match=f"^{re.escape(err_msg)}$"):
+        fetcher.preflight([f"1/{n}/1" for n in range(1, 5)])
+
+
+@pytest.mark.parametrize(("plan", "n_requests"), [(PLAN_IN_MEMORY, 1), (PLAN_CHUNKED, 3)])
+def test_iter_objects_by_ref_plan(
+    plan: str,
+    n_requests: int,
+    data_fetcher: DataFetcher,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Ensure that objects are fetched all at once or one at a time, according to the plan."""
+    ref_list = ["1/1/1", "1/2/1", "1/3/1"]
+    infos = {ref: make_info(n + 1, MATRIX_TYPE, 100) for n, ref in enumerate(ref_list)}
+    requests_made = []
+
+    def iter_ws_objects(_: DataFetcher, params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """Record the objects requested and return fake objects."""
+        requests_made.append([obj["ref"] for obj in params["objects"]])
+        for obj in params["objects"]:
+            yield {INFO: infos[obj["ref"]], DATA: {}}
+
+    monkeypatch.setattr(DataFetcher, "iter_ws_objects", iter_ws_objects)
+    output = dict(data_fetcher.iter_objects_by_ref(ref_list, {INFO: infos, PLAN: plan}))
+    assert list(output) == ref_list
+    assert len(requests_made) == n_requests
+    assert [ref for request in requests_made for ref in request] == ref_list
+
+
+def test_iter_objects_by_ref_missing_results(
+    data_fetcher: DataFetcher, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """Ensure that a response without a result for every object is not silently truncated."""
+    ref_list = ["1/1/1", "1/2/1"]
+    infos = {ref: make_info(n + 1, MATRIX_TYPE, 100) for n, ref in enumerate(ref_list)}
+
+    def iter_ws_objects(_: DataFetcher, params: dict[str, Any]) -> Iterator[dict[str, Any]]:
+        """Return a result for the first object only."""
+        yield {INFO: infos[params["objects"][0]["ref"]], DATA: {}}
+
+    monkeypatch.setattr(DataFetcher, "iter_ws_objects", iter_ws_objects)
+    with pytest.raises(ValueError, match="zip"):
+        dict(data_fetcher.iter_objects_by_ref(ref_list, {INFO: infos, PLAN: PLAN_IN_MEMORY}))
@@ -0,0 +1,116 @@
+"""Tests for the columnar dataset."""
+
+from typing import Any
+
+import numpy as np
+import pytest
+from combinatrix.dataset import Dataset, MatrixDataset, to_column
+
+RECORDS = [
+    {"a": 1, "b": 2.5, "name": "blah", "id": 12345},
+    {"a": 3, "id": 12365},
+    {"b": 4.5, "name": "blob"},
+]
+
+
+@pytest.mark.parametrize(
+    ("values", "dtype"),
+    [
+        pytest.param([1, 2, 3], np.int64, id="int"),
+        pytest.param([1.0, 2.5], np.float64, id="float"),
+        pytest.param([True, False], np.bool_, id="bool"),
+        pytest.param(["a", "b"], object, id="str"),
+        pytest.param([1, 2.5], object, id="int_and_float"),
+        pytest.param([1, None], object, id="missing_values"),
+        pytest.param([True, 1], object, id="bool_and_int"),
+        pytest.param([2**70, 1], object, id="int_too_large"),
+        pytest.param([], object, id="empty"),
+    ],
+)
+def test_to_column(values: list[Any], dtype: type) -> None:
+    """Ensure that columns are only given a typed array if the values are unchanged by it."""
+    column = to_column(values)
+    assert column.dtype == dtype
+    assert column.tolist() == values
+    assert [type(v) for v in column.tolist()] == [type(v) for v in values]
+
+
+def test_to_column_nested_values() -> None:
+    """Ensure that list values are stored as single values."""
+    values = [[1, 2], [3, 4]]
+    column = to_column(values)
+    assert column.shape == (2,)
+    assert column.tolist() == values
+
+
+def test_to_column_array() -> None:
+    """Ensure that existing arrays are used as they are."""
+    array = np.arange(5)
+    assert to_column(array) is array
+
+
+def test_dataset() -> None:
+    """Check the basic properties of a dataset."""
+    dataset = Dataset({"value": [1.0, 2.0], "name": ["x", "y"], "id": np.array([1, 2])})
+    assert dataset.fieldnames == ["id", "name", "value"]
+    assert len(dataset) == 2  # noqa: PLR2004
+    assert "name" in dataset
+    assert "blah" not in dataset
+    assert dataset["value"].dtype == np.float64
+    assert list(dataset.iter_rows()) == [(1, "x", 1.0), (2, "y", 2.0)]
+
+
+def test_dataset_fail_column_lengths() -> None:
+    """Ensure that all columns must be the same length."""
+    with pytest.raises(ValueError, match="All columns in a dataset must be the same length"):
+        Dataset({"a": [1, 2], "b": [1]})
+
+
+def test_from_records() -> None:
+    """Ensure that a dataset can be created from a list of dicts and converted back."""
+    dataset = Dataset.from_records(RECORDS)
+    assert dataset.fieldnames == ["id", "name", "a", "b"]
+    assert dataset.to_records() == [
+        {"id": 12345, "name": "blah", "a": 1, "b": 2.5},
+        {"id": 12365, "name": None, "a": 3, "b": None},
+        {"id": None, "name": "blob", "a": None, "b": 4.5},
+    ]
+    assert dataset == Dataset.from_records(RECORDS, ["a", "b", "id", "name"])
+    assert dataset != Dataset.from_records(RECORDS, ["a", "b", "id"])
+    assert dataset != Dataset.from_records(RECORDS[:2])
+
+
+def test_to_dataframe() -> None:
+    """Ensure that the dataframe shares the column arrays with the dataset."""
+    dataset = Dataset({"id": ["a", "b"], "value": [1.0, 2.0]})
+    dataframe = dataset.to_dataframe()
+    assert list(dataframe.columns) == dataset.fieldnames
+    assert dataframe["value"].tolist() == [1.0, 2.0]
+    assert np.shares_memory(dataframe["value"].to_numpy(), dataset["value"])
+
+
+def test_to_dataframe_fieldnames() -> None:
+    """Ensure that a dataframe can be created from a subset of the columns."""
+    dataset = Dataset.from_records(RECORDS)
+    dataframe = dataset.to_dataframe(["id", "b"])
+    assert list(dataframe.columns) == ["id", "b"]
+    assert np.shares_memory(dataframe["b"].to_numpy(), dataset["b"])
+
+
+def test_matrix_dataset_ids() -> None:
+    """Ensure that matrix cells are keyed by position, with readable IDs only for display."""
+    dataset = MatrixDataset(
+        {
+            "id": np.arange(3),
+            "column_id": ["A", "A", "B"],
+            "row_id": ["X", "Y", "X"],
+            "value": [1.5, None, 2.0],
+        }
+    )
+    assert dataset["id"].dtype == np.int64
+    assert dataset.format_ids(np.array([2, 0])) == ["B___X___2.0", "A___X___1.5"]
+    assert dataset.format_ids({1}) == ["A___Y___None"]
+    assert dataset.format_ids([]) == []
+    assert [row[0] for row in dataset.iter_rows()] == ["A___X___1.5", "A___Y___None", "B___X___2.0"]
+    # datasets of different types are never equal
+    assert dataset != Dataset(dataset.columns)
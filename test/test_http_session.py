@@ -0,0 +1,97 @@
+"""Tests for the shared HTTP session."""
+
+from test.conftest import TOKEN
+from typing import Any
+
+import pytest
+import requests
+from combinatrix import http_session
+from combinatrix.constants import (
+    DEFAULT_HTTP_MAX_RETRIES,
+    DEFAULT_HTTP_POOL_SIZE,
+)
+from combinatrix.fetcher import DataFetcher
+from combinatrix.http_session import create_session, get_session, reset_session
+from installed_clients.authclient import KBaseAuth
+from installed_clients.KBaseReportClient import KBaseReport
+from installed_clients.WorkspaceClient import Workspace
+from urllib3.exceptions import ConnectTimeoutError
+
+
+@pytest.mark.parametrize(
+    ("settings", "pool_size", "max_retries"),
+    [
+        pytest.param({}, DEFAULT_HTTP_POOL_SIZE, DEFAULT_HTTP_MAX_RETRIES, id="defaults"),
+        pytest.param(
+            {"http-pool-size": "25", "http-max-retries": "0"}, 25, 0, id="configured"
+        ),
+    ],
+)
+def test_create_session(settings: dict[str, str], pool_size: int, max_retries: int) -> None:
+    """Check that the connection pool and retry policy are set from the config."""
+    session = create_session(settings)
+    for prefix in ["http://", "https://"]:
+        adapter = session.get_adapter(f"{prefix}kbase.us")
+        assert adapter._pool_maxsize == pool_size  # noqa: SLF001
+        assert adapter._pool_connections == pool_size  # noqa: SLF001
+        assert adapter.max_retries.total == max_retries
+        assert adapter.max_retries.read == 0
+        assert adapter.max_retries.status == 0
+
+
+@pytest.mark.parametrize("status_code", [500, 502, 503, 504])
+def test_create_session_no_status_retries(status_code: int) -> None:
+    """Ensure that JSON-RPC calls that reached the server are never sent again."""
+    retry = create_session({}).get_adapter("https://kbase.us").max_retries
+    assert not retry.is_retry("POST", status_code)
+    # connection errors happen before the request is sent, so they can safely be retried
+    assert retry.increment("POST", "/", error=ConnectTimeoutError()).connect == (
+        DEFAULT_HTTP_MAX_RETRIES - 1
+    )
+
+
+@pytest.mark.parametrize(
+    ("settings", "err_msg"),
+    [
+        ({"http-pool-size": "0"}, "'http-pool-size' must be a positive integer; got '0'"),
+        ({"http-max-retries": "-1"}, "'http-max-retries' must be an integer >= 0; got '-1'"),
+    ],
+)
+def test_create_session_invalid_config(settings: dict[str, str], err_msg: str) -> None:
+    """Check that invalid pool and retry settings are rejected."""
+    with pytest.raises(ValueError, match=err_msg):
+        create_session(settings)
+
+
+def test_get_session_shared() -> None:
+    """Ensure that one session is shared until it is reset."""
+    session = get_session({})
+    assert isinstance(session, requests.Session)
+    assert get_session({"http-pool-size": "3"}) is session
+
+    reset_session()
+    assert get_session({}) is not session
+
+
+def test_get_session_after_fork(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ensure that a forked process does not reuse its parent's connections."""
+    session = get_session({})
+    monkeypatch.setattr(http_session.os, "getpid", lambda: -1)
+    assert get_session({}) is not session
+
+
+def test_clients_share_session(config: dict[str, str], context: dict[str, Any]) -> None:
+    """Ensure that the KBase clients use the shared session when it is supplied."""
+    session = get_session(config)
+    fetcher = DataFetcher(config, context)
+    assert fetcher.session is session
+
+    ws = Workspace("https://kbase.us/services/ws", token=TOKEN, session=session)
+    assert ws._client._session is session  # noqa: SLF001
+    report = KBaseReport("https://kbase.us/callback", token=TOKEN, session=session)
+    assert report._client._session is session  # noqa: SLF001
+    auth = KBaseAuth("https://kbase.us/services/auth", session=session)
+    assert auth._session is session  # noqa: SLF001
+
+    # without a session, the clients fall back to making a new connection per request
+    assert Workspace("https://kbase.us/services/ws", token=TOKEN)._client._session is requests  # noqa: SLF001
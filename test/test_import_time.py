@@ -0,0 +1,68 @@
+"""Tests for the time taken to start up, which every job container pays."""
+
+from test.benchmarks.bench_import_time import get_import_times
+
+import pytest
+
+# modules whose imports are deferred until the stage of a run that needs them
+HEAVY_MODULES = [
+    "combinatrix.core",
+    "installed_clients.WorkspaceClient",
+    "ijson",
+    "jinja2",
+    "networkx",
+    "numpy",
+    "pandas",
+    "requests",
+]
+
+# standard library module whose import time is measured alongside that of each module, so that
+# the budgets do not depend on the speed of the machine
+BASELINE_MODULE = "asyncio"
+
+# maximum import time of each module, including the modules that it imports, as a multiple of
+# the import time of BASELINE_MODULE; a few times the ratio measured, to allow for noise.
+# Importing pandas alone takes about eight times as long as the baseline.
+IMPORT_TIME_BUDGETS = {
+    "combinatrix.CombinatrixImpl": 0.75,
+    "combinatrix.core": 1.5,
+    "combinatrix.param_checker": 1.0,
+}
+
+
+def get_import_time(module: str, repeat: int = 3) -> int:
+    """Time the import of a module, including the modules that it imports.
+
+    The fastest of a few runs is used, to reduce the effect of whatever else is running.
+
+    :param module: name of the module to import
+    :type module: str
+    :param repeat: number of runs, defaults to 3
+    :type repeat: int
+    :return: import time, in microseconds
+    :rtype: int
+    """
+    return min(get_import_times(module)[module][1] for _ in range(repeat))
+
+
+def test_impl_import_is_light() -> None:
+    """Ensure that importing the implementation does not load the dependencies of a run."""
+    import_times = get_import_times("combinatrix.CombinatrixImpl")
+    assert [module for module in HEAVY_MODULES if module in import_times] == []
+
+
+def test_core_import_is_light() -> None:
+    """Ensure that the modules for each stage of a run are imported by the stage that needs them."""
+    import_times = get_import_times("combinatrix.core")
+    assert [module for module in HEAVY_MODULES[1:] if module in import_times] == []
+
+
+@pytest.mark.parametrize(("module", "budget"), IMPORT_TIME_BUDGETS.items())
+def test_import_time_budget(module: str, budget: float) -> None:
+    """Ensure that the import time of each module, relative to the baseline, stays within budget."""
+    baseline_time = get_import_time(BASELINE_MODULE)
+    import_time = get_import_time(module)
+    assert import_time < budget * baseline_time, (
+        f"importing {module} took {import_time / 1000:.1f} ms, {import_time / baseline_time:.2f} "
+        f"times as long as {BASELINE_MODULE} ({baseline_time / 1000:.1f} ms); budget {budget}"
+    )
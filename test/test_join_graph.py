@@ -0,0 +1,69 @@
+"""Tests for the join graph."""
+
+import pytest
+from combinatrix.join_graph import JoinGraph
+
+
+def make_graph(edges: list[tuple[str, str]]) -> JoinGraph:
+    """Create a graph from a list of edges.
+
+    :param edges: pairs of nodes
+    :type edges: list[tuple[str, str]]
+    :return: graph
+    :rtype: JoinGraph
+    """
+    graph = JoinGraph()
+    for u, v in edges:
+        graph.add_edge(u, v)
+    return graph
+
+
+def test_join_graph() -> None:
+    """Check the nodes, edges, and degrees of a graph."""
+    graph = make_graph([("b", "a"), ("a", "c"), ("c", "a"), ("c", "d")])
+    assert graph.nodes == ["b", "a", "c", "d"]
+    # parallel edges are merged
+    assert graph.edges == [("b", "a"), ("a", "c"), ("c", "d")]
+    assert list(graph.degree()) == [("b", 1), ("a", 2), ("c", 2), ("d", 1)]
+
+
+def test_shortest_paths() -> None:
+    """Ensure that paths are found breadth-first, with ties broken by the order of discovery."""
+    graph = make_graph([("a", "b"), ("a", "c"), ("b", "d"), ("c", "d"), ("d", "e"), ("x", "y")])
+    assert graph.shortest_paths("a") == {
+        "a": ["a"],
+        "b": ["a", "b"],
+        "c": ["a", "c"],
+        "d": ["a", "b", "d"],
+        "e": ["a", "b", "d", "e"],
+    }
+    assert list(graph.shortest_paths("a")) == ["a", "b", "c", "d", "e"]
+    assert graph.shortest_path_lengths("e") == {"e": 0, "d": 1, "b": 2, "c": 2, "a": 3}
+    assert list(graph.shortest_path_lengths("e")) == ["e", "d", "b", "c", "a"]
+
+
+@pytest.mark.parametrize(
+    ("edges", "connected"),
+    [
+        pytest.param([("a", "b")], True, id="single_edge"),
+        pytest.param([("a", "b"), ("c", "b"), ("b", "d")], True, id="star"),
+        pytest.param([("a", "b"), ("b", "c"), ("c", "a")], True, id="cycle"),
+        pytest.param([("a", "b"), ("c", "d")], False, id="disconnected"),
+        pytest.param(
+            [("a", "b"), ("b", "c"), ("c", "a"), ("d", "e")], False, id="disconnected_cycle"
+        ),
+    ],
+)
+def test_is_connected(edges: list[tuple[str, str]], connected: bool) -> None:  # noqa: FBT001
+    """Check whether graphs are connected."""
+    graph = make_graph(edges)
+    assert graph.is_connected() is connected
+
+
+def test_empty_graph() -> None:
+    """Ensure that connectivity is undefined for an empty graph."""
+    graph = JoinGraph()
+    assert graph.nodes == []
+    assert graph.edges == []
+    with pytest.raises(ValueError, match="Connectivity is undefined for a graph without nodes"):
+        graph.is_connected()
@@ -0,0 +1,142 @@
+"""Tests for the join planner."""
+
+from typing import Any
+
+import pytest
+from combinatrix.constants import FIELD, REF, T1, T2
+from combinatrix.join_planner import (
+    estimate_join_rows,
+    estimate_plan,
+    format_join_plan,
+    plan_join_order,
+)
+
+
+def make_stats(rows: int, **fields: tuple[int, int]) -> dict[str, Any]:
+    """Create the statistics for one dataset.
+
+    :param rows: number of rows
+    :type rows: int
+    :param fields: number of distinct values and largest group size of each join field
+    :type fields: tuple[int, int]
+    :return: statistics, in the form returned by `collect_key_statistics`
+    :rtype: dict[str, Any]
+    """
+    return {
+        "rows": rows,
+        "fields": {
+            field: {"distinct": distinct, "max_group": max_group}
+            for field, (distinct, max_group) in fields.items()
+        },
+    }
+
+
+def make_join(left: str, left_field: str, right: str, right_field: str) -> dict[str, Any]:
+    """Create a join between two datasets.
+
+    :param left: first dataset
+    :type left: str
+    :param left_field: join field of the first dataset
+    :type left_field: str
+    :param right: second dataset
+    :type right: str
+    :param right_field: join field of the second dataset
+    :type right_field: str
+    :return: join
+    :rtype: dict[str, Any]
+    """
+    return {T1: {REF: left, FIELD: left_field}, T2: {REF: right, FIELD: right_field}}
+
+
+# a hub dataset joined to a dataset with many rows per join value, a dataset with one row per
+# join value, and a small dataset
+STAR_STATS = {
+    "hub": make_stats(4, a=(4, 1), b=(2, 2), c=(4, 1)),
+    "wide": make_stats(10, a=(2, 5)),
+    "narrow": make_stats(6, b=(6, 1)),
+    "small": make_stats(2, c=(2, 1)),
+}
+STAR_JOINS = [
+    make_join("hub", "a", "wide", "a"),
+    make_join("hub", "b", "narrow", "b"),
+    make_join("small", "c", "hub", "c"),
+]
+
+
+@pytest.mark.parametrize(
+    ("rows", "parent_stats", "child_rows", "child_stats", "expected"),
+    [
+        pytest.param(10, (10, 1), 20, (10, 2), 20, id="one_to_two"),
+        pytest.param(10, (5, 2), 20, (20, 1), 10, id="child_more_distinct"),
+        pytest.param(10, (10, 1), 100, (10, 2), 20, id="capped_by_max_group"),
+        pytest.param(3, (10, 1), 10, (2, 5), 10, id="parent_distinct_capped_by_rows"),
+        pytest.param(0, (0, 0), 10, (0, 0), 0, id="empty"),
+    ],
+)
+def test_estimate_join_rows(
+    rows: int,
+    parent_stats: tuple[int, int],
+    child_rows: int,
+    child_stats: tuple[int, int],
+    expected: int,
+) -> None:
+    """Check the estimated size of a join."""
+    assert (
+        estimate_join_rows(
+            rows,
+            {"distinct": parent_stats[0], "max_group": parent_stats[1]},
+            child_rows,
+            {"distinct": child_stats[0], "max_group": child_stats[1]},
+        )
+        == expected
+    )
+
+
+def test_estimate_plan() -> None:
+    """Ensure that joins are oriented and the size after each is estimated."""
+    plan = estimate_plan(STAR_JOINS, STAR_STATS)
+    assert plan["root"] == "hub"
+    assert plan["rows"] == 4  # noqa: PLR2004
+    assert [join["estimated_rows"] for join in plan["joins"]] == [10, 10, 5]
+    assert plan["cost"] == 29  # noqa: PLR2004
+    # the last join is reversed so that the dataset already in the combination is first
+    assert plan["joins"][2][T1] == {REF: "hub", FIELD: "c"}
+    assert plan["joins"][2][T2] == {REF: "small", FIELD: "c"}
+
+
+def test_estimate_plan_cycle() -> None:
+    """Ensure that a join between datasets already in the combination reduces the estimate."""
+    stats = {"x": make_stats(10, k=(5, 2), m=(10, 1)), "y": make_stats(10, k=(5, 2), m=(10, 1))}
+    plan = estimate_plan([make_join("x", "k", "y", "k"), make_join("y", "m", "x", "m")], stats)
+    assert [join["estimated_rows"] for join in plan["joins"]] == [20, 2]
+
+
+def test_plan_join_order() -> None:
+    """Ensure that the plan with the smallest partial combinations is chosen."""
+    plan = plan_join_order(STAR_JOINS, STAR_STATS)
+    assert [(join[T1][REF], join[T2][REF]) for join in plan["joins"]] == [
+        ("small", "hub"),
+        ("hub", "narrow"),
+        ("hub", "wide"),
+    ]
+    assert [join["estimated_rows"] for join in plan["joins"]] == [2, 2, 10]
+    assert plan["cost"] == 16  # noqa: PLR2004
+    assert plan["cost"] < estimate_plan(STAR_JOINS, STAR_STATS)["cost"]
+
+
+def test_format_join_plan() -> None:
+    """Check the description of a plan."""
+    assert format_join_plan(plan_join_order(STAR_JOINS, STAR_STATS)).splitlines() == [
+        "start from small: 2 rows",
+        "join small 'c' to hub 'c': ~2 rows",
+        "join hub 'b' to narrow 'b': ~2 rows",
+        "join hub 'a' to wide 'a': ~10 rows",
+    ]
+
+
+def test_format_join_plan_generic() -> None:
+    """Check the description of a plan for joins that contain cycles."""
+    plan = {"variables": [[("hub", "a"), ("wide", "a")], [("hub", "b"), ("narrow", "b")]]}
+    assert format_join_plan(plan) == (
+        "generic join (variable order: hub 'a' = wide 'a'; hub 'b' = narrow 'b')"
+    )
@@ -7,6 +7,7 @@ import pytest
 from combinatrix.constants import (
     FIELD,
     JOIN_LIST,
+    MAX_REFS,
     PARAM_ERROR_MESSAGE,
     REF,
     REFS,
@@ -149,29 +150,17 @@ def test_check_params_none(params: dict[str, Any]) -> None:
             {
                 "input": {
                     JOIN_LIST: [
-                        VALID_JOIN_DICT_A,
                         {
-                            f"{T1}_{REF}": "1/2/4",
+                            f"{T1}_{REF}": f"1/{ix}/1",
                             f"{T1}_{FIELD}": "blah",
-                            f"{T2}_{REF}": "1/2/5",
+                            f"{T2}_{REF}": f"1/{ix}/2",
                             f"{T2}_{FIELD}": "blob",
-                        },
-                        {
-                            f"{T1}_{REF}": "1/2/6",
-                            f"{T1}_{FIELD}": "blah",
-                            f"{T2}_{REF}": "1/2/7",
-                            f"{T2}_{FIELD}": "blob",
-                        },
-                        {
-                            f"{T1}_{REF}": "1/2/8",
-                            f"{T1}_{FIELD}": "blah",
-                            f"{T2}_{REF}": "1/2/9",
-                            f"{T2}_{FIELD}": "blob",
-                        },
+                        }
+                        for ix in range(MAX_REFS // 2 + 1)
                     ],
                 },
                 "err": [
-                    "The Combinatrix is currently limited to combining 3 datasets."
+                    f"The Combinatrix is currently limited to combining {MAX_REFS} datasets."
                 ],
                 "id": "too_many_joins",
             },
@@ -361,11 +350,7 @@ def test_validate_params_with_max_refs() -> None:
         validate_params(input_params, 5)
 
     # default value
-    with pytest.raises(
-        RuntimeError,
-        match="The Combinatrix is currently limited to combining 3 datasets.",
-    ):
-        validate_params(input_params)
+    assert validate_params(input_params)[REFS] == ref_set
 
 
 def test_construct_graph_valid_minimal() -> None:
@@ -405,7 +390,10 @@ def test_construct_graph_fail_too_many_connections() -> None:
         RuntimeError,
         match=f"The following refs are connected to too many other refs:\n{REF_A}, {REF_D}",
     ):
-        construct_graph(input_params)
+        construct_graph(input_params, 2)
+
+    # no limit by default
+    assert len(construct_graph(input_params).edges) == len(input_params)
 
 
 @pytest.mark.parametrize(
@@ -425,21 +413,62 @@ def test_construct_graph_fail_too_many_connections() -> None:
                 "input": [
                     {T1: {REF: REF_A}, T2: {REF: REF_B}},
                     {T1: {REF: REF_B}, T2: {REF: REF_C}},
-                    {T1: {REF: REF_C}, T2: {REF: REF_A}},  # cycle
+                    {T1: {REF: REF_C}, T2: {REF: REF_A}},
+                    {T1: {REF: REF_E}, T2: {REF: REF_F}},  # Disconnected component
                 ]
             },
-            id="cycle",
+            id="disconnected_cycle",
         ),
     ],
 )
 def test_sort_params_fail(param: dict[str, Any]) -> None:
-    """Ensure that a disconnected or cyclical graph raises an error."""
+    """Ensure that a disconnected graph raises an error."""
     with pytest.raises(
         RuntimeError, match="Error: the joins specified do not create a single dataset"
     ):
         sort_params(param["input"])
 
 
+@pytest.mark.parametrize(
+    "param",
+    [
+        pytest.param(
+            {
+                "input": [
+                    {T1: {REF: REF_A}, T2: {REF: REF_B}},
+                    {T1: {REF: REF_B}, T2: {REF: REF_C}},
+                    {T1: {REF: REF_C}, T2: {REF: REF_A}},
+                ],
+                "output": [
+                    {T1: {REF: REF_A}, T2: {REF: REF_B}},
+                    {T1: {REF: REF_A}, T2: {REF: REF_C}},
+                    {T1: {REF: REF_B}, T2: {REF: REF_C}},
+                ],
+            },
+            id="triangle",
+        ),
+        pytest.param(
+            {
+                "input": [
+                    {T1: {REF: REF_C}, T2: {REF: REF_B}},
+                    {T1: {REF: REF_B, FIELD: X}, T2: {REF: REF_A, FIELD: X}},
+                    {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_A, FIELD: Y}},
+                ],
+                "output": [
+                    {T1: {REF: REF_C}, T2: {REF: REF_B}},
+                    {T1: {REF: REF_B, FIELD: X}, T2: {REF: REF_A, FIELD: X}},
+                    {T1: {REF: REF_B, FIELD: Y}, T2: {REF: REF_A, FIELD: Y}},
+                ],
+            },
+            id="two_joins_between_datasets",
+        ),
+    ],
+)
+def test_sort_params_cycle(param: dict[str, Any]) -> None:
+    """Ensure that cyclic graphs are accepted, with every join listed once."""
+    assert sort_params(param["input"]) == param["output"]
+
+
 EXPECTED_OUTPUT = [
     {T1: {REF: REF_A}, T2: {REF: REF_B}},
     {T1: {REF: REF_B}, T2: {REF: REF_C}},
@@ -527,6 +556,27 @@ def test_sort_params_incorrect_list_pair_order(param: dict[str, Any]) -> None:
     assert sort_params(param["input"]) == expected
 
 
+def test_sort_params_tree() -> None:
+    """Ensure that any tree of joins is listed breadth-first from one end of the longest path."""
+    input_params = [
+        {T1: {REF: REF_B}, T2: {REF: REF_A}},
+        {T1: {REF: REF_B}, T2: {REF: REF_C}},
+        {T1: {REF: REF_D}, T2: {REF: REF_B}},
+        {T1: {REF: REF_D}, T2: {REF: REF_E}},
+        {T1: {REF: REF_F}, T2: {REF: REF_E}},
+        *[{T1: {REF: REF_D}, T2: {REF: f"ref_{ix}"}} for ix in range(5)],
+    ]
+    # the longest path is A - B - D - E - F
+    assert sort_params(input_params) == [
+        {T1: {REF: REF_A}, T2: {REF: REF_B}},
+        {T1: {REF: REF_B}, T2: {REF: REF_C}},
+        {T1: {REF: REF_B}, T2: {REF: REF_D}},
+        {T1: {REF: REF_D}, T2: {REF: REF_E}},
+        *[{T1: {REF: REF_D}, T2: {REF: f"ref_{ix}"}} for ix in range(5)],
+        {T1: {REF: REF_E}, T2: {REF: REF_F}},
+    ]
+
+
 @pytest.mark.parametrize(
     "param",
     [
@@ -0,0 +1,82 @@
+"""Tests for the partitioned join."""
+
+from typing import Any
+
+import numpy as np
+import pytest
+from combinatrix.dataset import to_column
+from combinatrix.partitioned_join import (
+    PartitionedJoiner,
+    get_partitions,
+    index_partitions,
+    match_keys,
+)
+from pandas import Series
+
+
+def test_get_partitions() -> None:
+    """Ensure that equal values are assigned to the same partition."""
+    keys = Series(to_column(["x", 1, None, "x", 1.0, np.nan, True, "y"]))
+    partitions = get_partitions(keys, 5)
+    assert partitions.min() >= 0
+    assert partitions.max() < 5  # noqa: PLR2004
+    assert partitions[0] == partitions[3]
+    # 1, 1.0, and True are all equal
+    assert partitions[1] == partitions[4] == partitions[6]
+    assert partitions[2] == partitions[5] == 0
+
+
+def test_index_partitions() -> None:
+    """Ensure that the rows of each partition are found in ascending order."""
+    partitions = np.array([2, 0, 2, 3, 0, 2])
+    rows, offsets = index_partitions(partitions, 4)
+    assert [rows[offsets[p] : offsets[p + 1]].tolist() for p in range(4)] == [
+        [1, 4],
+        [],
+        [0, 2, 5],
+        [3],
+    ]
+
+
+@pytest.mark.parametrize(
+    ("keys", "values", "expected"),
+    [
+        pytest.param(["x", "y", None, "z"], ["x", "z", "q"], [True, False, False, True], id="no_nulls"),
+        pytest.param(["x", None, np.nan], ["y", None], [False, True, True], id="none_matches_nan"),
+        pytest.param([1, 2, 3], [3.0, 1.0], [True, False, True], id="int_and_float"),
+        pytest.param(["x"], [], [False], id="empty"),
+    ],
+)
+def test_match_keys(keys: list[Any], values: list[Any], expected: list[bool]) -> None:
+    """Ensure that keys are matched in the same way as in a pandas merge."""
+    assert match_keys(Series(to_column(keys)), Series(to_column(values))).tolist() == expected
+
+
+def test_partitioned_joiner() -> None:
+    """Check that rows are matched across partitions in the same way as in a pandas merge."""
+    with PartitionedJoiner(3) as joiner:
+        joiner.add_table(
+            "1/1/1",
+            {
+                "key": Series(to_column(["x", None, "y", 1, 2.0])),
+                "other": Series(to_column([1, 2, 3, 4, 5])),
+            },
+        )
+        joiner.add_table("1/2/1", {"key": Series(to_column([np.nan, "x", "x", 1.0, 2, "z"]))})
+        joiner.add_table("1/3/1", {"other": Series(to_column([5, 6]))})
+
+        assert joiner.has_match(("1/1/1", "key"), ("1/2/1", "key"))
+        assert not joiner.has_match(("1/2/1", "key"), ("1/3/1", "other"))
+
+        joiner.semi_join(("1/1/1", "key"), ("1/2/1", "key"))
+        assert joiner.get_positions("1/1/1").tolist() == [0, 1, 3, 4]
+        joiner.semi_join(("1/2/1", "key"), ("1/1/1", "other"))
+        assert joiner.get_positions("1/2/1").tolist() == [3, 4]
+        # only the remaining rows are matched
+        joiner.semi_join(("1/3/1", "other"), ("1/1/1", "other"))
+        assert joiner.get_positions("1/3/1").tolist() == [0]
+
+        with pytest.raises(RuntimeError, match="Tables cannot be added once the join has started"):
+            joiner.add_table("1/4/1", {"key": Series(to_column([1]))})
+
+    assert joiner.pool is None
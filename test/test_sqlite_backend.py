@@ -0,0 +1,55 @@
+"""Tests for the on-disk join store."""
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+from combinatrix.sqlite_backend import SqliteJoinStore, quote_identifier
+
+
+@pytest.mark.parametrize(
+    ("name", "expected"),
+    [
+        ("1/2/3", '"1/2/3"'),
+        ('1/2/3__a "quoted" field', '"1/2/3__a ""quoted"" field"'),
+    ],
+)
+def test_quote_identifier(name: str, expected: str) -> None:
+    """Ensure that table and column names are quoted."""
+    assert quote_identifier(name) == expected
+
+
+def test_sqlite_join_store(tmp_path: Path) -> None:
+    """Check that rows are matched in the same way as in a pandas merge."""
+    with SqliteJoinStore(str(tmp_path)) as store:
+        assert [f.suffix for f in tmp_path.iterdir()] == [".sqlite"]
+        store.add_table("1/1/1", {"key": ["x", None, "y", 1, 2.0], "other": [1, 2, 3, 4, 5]})
+        store.add_table("1/2/1", {"key": [np.nan, "x", "x", 1.0, 2, "z"]})
+        store.add_table("1/3/1", {"other": [5, 6]})
+
+        assert store.has_match(("1/1/1", "key"), ("1/2/1", "key"))
+        assert not store.has_match(("1/2/1", "key"), ("1/3/1", "other"))
+
+        # None and NaN match each other; ints and floats with the same value match
+        conditions = [(("1/1/1", "key"), ("1/2/1", "key"))]
+        positions = store.get_joined_positions(conditions)
+        assert {table: p.tolist() for table, p in positions.items()} == {
+            "1/1/1": [0, 1, 3, 4],
+            "1/2/1": [0, 1, 2, 3, 4],
+        }
+
+        conditions.append((("1/1/1", "other"), ("1/3/1", "other")))
+        positions = store.get_joined_positions(conditions)
+        assert {table: p.tolist() for table, p in positions.items()} == {
+            "1/1/1": [4],
+            "1/2/1": [4],
+            "1/3/1": [0],
+        }
+
+        store.semi_join(("1/1/1", "key"), ("1/2/1", "key"))
+        assert store.get_positions("1/1/1").tolist() == [0, 1, 3, 4]
+        store.semi_join(("1/2/1", "key"), ("1/1/1", "other"))
+        assert store.get_positions("1/2/1").tolist() == [3, 4]
+
+    # the database is deleted once the store is closed
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,57 @@
+"""Tests for the utility functions."""
+
+import threading
+import time
+from collections.abc import Iterator
+
+import pytest
+from combinatrix.util import iter_in_background
+
+
+def test_iter_in_background() -> None:
+    """Check that items are produced in a separate thread and yielded in order."""
+    threads = set()
+
+    def produce() -> Iterator[int]:
+        for n in range(5):
+            threads.add(threading.get_ident())
+            yield n
+
+    assert list(iter_in_background(produce())) == [0, 1, 2, 3, 4]
+    assert threads
+    assert threading.get_ident() not in threads
+
+
+def test_iter_in_background_error() -> None:
+    """Check that errors raised by the iterable are re-raised in the calling thread."""
+
+    def produce() -> Iterator[int]:
+        yield 1
+        err_msg = "something went wrong"
+        raise RuntimeError(err_msg)
+
+    items = []
+    with pytest.raises(RuntimeError, match="something went wrong"):
+        items.extend(iter_in_background(produce()))
+    assert items == [1]
+
+
+def test_iter_in_background_max_pending() -> None:
+    """Check that the producer only runs ahead of the consumer by `max_pending` items."""
+    produced = []
+
+    def produce() -> Iterator[int]:
+        for n in range(10):
+            produced.append(n)
+            yield n
+
+    items = iter_in_background(produce(), max_pending=1)
+    assert next(items) == 0
+    time.sleep(0.1)
+    # one item waiting in the queue and one waiting to be added to it
+    assert produced == [0, 1, 2]
+
+    # the producer stops once the consumer has gone away
+    items.close()
+    time.sleep(0.3)
+    assert produced == [0, 1, 2]